@@ -0,0 +1,59 @@
+"""
+AQI Module
+ตารางระดับ AQI ของ PM2.5 (ใช้ร่วมกันทั้ง backend, script และ seed ของตาราง aqi_bands ใน schema.sql)
+พร้อมตัวจำแนกแบบทีละค่าและแบบทั้ง array ด้วย np.searchsorted
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+# (ขอบบน µg/m³ แบบรวมค่าขอบ, level, color) เรียงจากน้อยไปมาก ระดับสุดท้ายไม่มีขอบบน
+# ถ้าแก้ไขต้องแก้ seed ของตาราง aqi_bands ใน database/schema.sql ให้ตรงกัน
+AQI_BANDS = (
+    (15.0, 'ดีมาก', '#28b4d8'),
+    (25.0, 'ดี', '#2ecc71'),
+    (37.5, 'ปานกลาง', '#f1c40f'),
+    (75.0, 'เริ่มมีผลกระทบ', '#e67e22'),
+    (None, 'มีผลกระทบต่อสุขภาพ', '#e74c3c'),
+)
+
+AQI_BREAKPOINTS = np.array([upper for upper, _, _ in AQI_BANDS[:-1]])
+AQI_LEVELS = np.array([level for _, level, _ in AQI_BANDS])
+AQI_COLORS = np.array([color for _, _, color in AQI_BANDS])
+
+
+def band_index(values) -> np.ndarray:
+    """
+    Index ของระดับ AQI ใน AQI_BANDS ของทุกค่าในครั้งเดียว
+    (side='left' ทำให้ค่าที่เท่ากับขอบบนอยู่ในระดับนั้น เหมือน <= ใน SQL)
+    """
+    return np.searchsorted(AQI_BREAKPOINTS, np.asarray(values, dtype=float), side='left')
+
+
+def classify_pm25_array(values) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    คำนวณระดับ AQI ของทั้ง array ในครั้งเดียว
+
+    Args:
+        values: array ของค่า PM2.5 (ค่าต้องเป็นตัวเลขจำกัด NaN จะถูกจัดเป็นระดับสุดท้าย)
+
+    Returns:
+        (array ของ level, array ของ color)
+    """
+    index = band_index(values)
+    return AQI_LEVELS[index], AQI_COLORS[index]
+
+
+def classify_pm25(pm25_value: float) -> Tuple[str, str]:
+    """
+    คำนวณระดับ AQI จากค่า PM2.5 1 ค่า
+
+    Returns:
+        Tuple (level, color)
+    """
+    for upper, level, color in AQI_BANDS[:-1]:
+        if pm25_value <= upper:
+            return level, color
+    _, level, color = AQI_BANDS[-1]
+    return level, color
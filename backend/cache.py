@@ -0,0 +1,95 @@
+"""
+In-process Cache Module
+LRU cache ที่มีอายุ (TTL) พร้อมตัวนับ hit/miss สำหรับใช้ภายใน process
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+# ค่าที่ lookup() คืนเมื่อไม่พบ key
+MISSING = object()
+
+
+class LRUCache:
+    """LRU cache แบบ thread-safe ที่จำกัดขนาดและหมดอายุตาม TTL"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        """
+        Args:
+            maxsize: จำนวน entry สูงสุด (0 = ปิด cache)
+            ttl: อายุของ entry (วินาที)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """ดึงค่าจาก cache (คืน default ถ้าไม่มีหรือหมดอายุ)"""
+        value = self.lookup(key)
+        return default if value is MISSING else value
+
+    def lookup(self, key: Hashable) -> Any:
+        """ดึงค่าจาก cache คืน MISSING ถ้าไม่มี (ใช้เมื่อค่าที่เก็บอาจเป็น None)"""
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is MISSING:
+                self.misses += 1
+                return MISSING
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return MISSING
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """เก็บค่าลง cache และลบ entry ที่ใช้น้อยที่สุดเมื่อเต็ม"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """ลบ entry ที่ key ตรงกับ predicate คืนจำนวนที่ลบ"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """ลบทุก entry (ตัวนับสถิติยังคงอยู่)"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """สถิติการใช้งาน cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
@@ -1,35 +1,600 @@
 """
 Supabase Database Connection Module
-เชื่อมต่อและจัดการข้อมูลกับ Supabase
+เชื่อมต่อและจัดการข้อมูลกับ Supabase (หรือ SQLite ในเครื่องเมื่อ DB_BACKEND=sqlite)
 """
 
+import base64
+import json
+import logging
 import os
-from datetime import datetime, date
-from typing import Optional, List, Dict, Any
-from supabase import create_client, Client
+import math
+import pickle
+from datetime import datetime, date, timedelta
+from itertools import islice
+from typing import Optional, List, Dict, Any, Iterable, Tuple
 from dotenv import load_dotenv
 
+try:
+    from supabase import create_client, Client
+except ImportError:  # ใช้ DB_BACKEND=sqlite ได้โดยไม่ต้องติดตั้ง supabase
+    create_client = None
+    Client = Any
+
+from backend.aqi import classify_pm25
+from backend.cache import LRUCache, MISSING
+from backend.metrics import timed_db_call, db_failure, db_fallback
+
+logger = logging.getLogger(__name__)
+
 # โหลด environment variables
 load_dotenv()
 
-class SupabaseDB:
-    """Class สำหรับจัดการ Supabase database"""
+# จำนวนแถวต่อ 1 request ของ bulk insert/upsert
+BULK_BATCH_SIZE = int(os.getenv('DB_BULK_BATCH_SIZE', '500'))
+
+# จำนวนแถวต่อ 1 query ตอน export ทั้งตาราง (iter_predictions / iter_actual_readings)
+EXPORT_PAGE_SIZE = int(os.getenv('DB_EXPORT_PAGE_SIZE', '1000'))
+
+# จำนวนแถวต่อหน้าเมื่อดึง prediction_accuracy_log มาคำนวณสถิติเอง
+ACCURACY_PAGE_SIZE = int(os.getenv('DB_ACCURACY_PAGE_SIZE', '1000'))
+
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int):
+    """แบ่ง iterable เป็น list ละ size แถว (ไม่ต้องโหลดทั้งหมดเข้า memory)"""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def encode_cursor(row: Dict[str, Any], date_column: str) -> str:
+    """
+    สร้าง cursor ของหน้าถัดไปจากแถวสุดท้ายของหน้าปัจจุบัน
+    (base64 ของ [วันที่, id] เพื่อให้ client ส่งกลับมาตรงๆ โดยไม่ต้องแปลความหมาย)
+    """
+    payload = json.dumps([str(row[date_column]), str(row['id'])])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    แปลง cursor กลับเป็น (วันที่, id)
+
+    Raises:
+        ValueError ถ้า cursor ไม่ถูกต้อง
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key_date, key_id = json.loads(base64.urlsafe_b64decode(padded))
+        return date.fromisoformat(key_date).isoformat(), str(key_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def next_cursor(rows: List[Dict[str, Any]], limit: int, date_column: str) -> Optional[str]:
+    """Cursor ของหน้าถัดไป (None เมื่อเป็นหน้าสุดท้าย)"""
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(rows[-1], date_column)
+
+
+def _is_loaded_version(row: Dict[str, Any]) -> bool:
+    """model ที่ registry ต้องโหลดไว้ใน memory"""
+    return bool(row.get('is_active') or row.get('is_production') or row.get('is_shadow'))
+
+
+class AccuracyAccumulator:
+    """สะสมสถิติความแม่นยำทีละแถว (ใช้ memory คงที่ไม่ว่าข้อมูลจะมีกี่แถว)"""
+
+    def __init__(self):
+        self.count = 0
+        self.error_count = 0
+        self.error_sum = 0.0
+        self.squared_error_sum = 0.0
+        self.percentage_count = 0
+        self.percentage_sum = 0.0
+        self.accurate = 0
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """เพิ่ม 1 แถวของ prediction_accuracy_log"""
+        self.count += 1
+        error = row.get('error_value')
+        if error is not None:
+            self.error_count += 1
+            self.error_sum += error
+            squared = row.get('squared_error')
+            self.squared_error_sum += squared if squared is not None else error * error
+        if row.get('error_percentage') is not None:
+            self.percentage_count += 1
+            self.percentage_sum += row['error_percentage']
+        if row.get('is_accurate'):
+            self.accurate += 1
+
+    def add_daily(self, row: Dict[str, Any]) -> None:
+        """เพิ่ม 1 แถวของ daily_accuracy_rollup (ผลรวมของทั้งวัน)"""
+        total = row['total_predictions']
+        self.count += total
+        self.error_count += total
+        self.error_sum += row['error_sum']
+        self.squared_error_sum += row['squared_error_sum']
+        self.percentage_count += row['error_percentage_count']
+        self.percentage_sum += row['error_percentage_sum']
+        self.accurate += row['accurate_count']
+
+    def result(self) -> Dict[str, Any]:
+        """สรุปสถิติ (รูปแบบเดียวกับ RPC get_accuracy_stats)"""
+        if not self.count:
+            return {}
+        return {
+            'total_predictions': self.count,
+            'avg_error': self.error_sum / self.error_count if self.error_count else 0,
+            'rmse': math.sqrt(self.squared_error_sum / self.error_count) if self.error_count else 0,
+            'mape': self.percentage_sum / self.percentage_count if self.percentage_count else None,
+            'accuracy_rate': self.accurate / self.count * 100
+        }
+
+
+class BaseDB:
+    """
+    ส่วนที่ใช้ร่วมกันของทุก storage backend (Supabase, SQLite)
+    
+    Backend ต้อง implement method อ่าน/เขียนข้อมูล, _load_accuracy_stats และ _write_chunk
+    """
     
     def __init__(self):
-        """Initialize Supabase client"""
+        # Read-through cache ของ get_predictions / get_actual_readings / get_accuracy_stats
+        # (ล้างเมื่อมีการเขียน, DB_CACHE_SIZE=0 เพื่อปิด)
+        self.read_cache = LRUCache(
+            maxsize=int(os.getenv('DB_CACHE_SIZE', '256')),
+            ttl=float(os.getenv('DB_CACHE_TTL', '300'))
+        )
+        self._cache_generation = 0
+    
+    # ==========================================
+    # Row Builders
+    # ==========================================
+    
+    def prediction_row(
+        self,
+        prediction_date: date,
+        target_date: date,
+        predicted_value: float,
+        input_values: Dict[str, float],
+        model_version: str = "v1.0",
+        location: str = "Nakhon Phanom",
+        confidence_score: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        สร้างข้อมูล 1 แถวของตาราง pm25_predictions (arguments เหมือน save_prediction)
+        
+        days_ahead คำนวณจาก target_date - prediction_date: trigger ความแม่นยำนับเฉพาะแถวที่ days_ahead = 1
+        """
+        data = {
+            "prediction_date": str(prediction_date),
+            "target_date": str(target_date),
+            "days_ahead": (date.fromisoformat(str(target_date)[:10]) - date.fromisoformat(str(prediction_date)[:10])).days,
+            "predicted_value": predicted_value,
+            "input_values": input_values,
+            "model_version": model_version,
+            "location": location,
+            "data_source": "LSTM Model",
+        }
+        
+        if confidence_score is not None:
+            data["confidence_score"] = confidence_score
+        
+        return data
+    
+    def reading_row(
+        self,
+        reading_date: date,
+        pm25_value: float,
+        aqi_level: Optional[str] = None,
+        aqi_color: Optional[str] = None,
+        location: str = "Nakhon Phanom",
+        temperature: Optional[float] = None,
+        humidity: Optional[float] = None,
+        wind_speed: Optional[float] = None,
+        data_source: str = "WAQI API",
+        raw_data: Optional[Dict] = None,
+        reading_time: Optional[str] = None,
+        station_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        สร้างข้อมูล 1 แถวของตาราง pm25_actual_readings (arguments เหมือน save_actual_reading)
+        
+        ถ้าไม่ระบุ aqi_level/aqi_color จะคำนวณจาก pm25_value
+        """
+        if aqi_level is None or aqi_color is None:
+            aqi_level, aqi_color = self.calculate_aqi_level(pm25_value)
+        
+        data = {
+            "reading_date": str(reading_date),
+            "reading_time": reading_time or datetime.now().isoformat(),
+            "pm25_value": pm25_value,
+            "aqi_level": aqi_level,
+            "aqi_color": aqi_color,
+            "location": location,
+            "data_source": data_source,
+        }
+        
+        if temperature is not None:
+            data["temperature"] = temperature
+        if humidity is not None:
+            data["humidity"] = humidity
+        if wind_speed is not None:
+            data["wind_speed"] = wind_speed
+        if station_id is not None:
+            data["station_id"] = station_id
+        if raw_data is not None:
+            data["raw_data"] = raw_data
+        
+        return data
+    
+    def alert_row(
+        self,
+        alert_type: str,
+        severity: str,
+        title: str,
+        message: str,
+        pm25_value: Optional[float] = None,
+        threshold_value: Optional[float] = None,
+        location: str = "Nakhon Phanom"
+    ) -> Dict[str, Any]:
+        """สร้างข้อมูล 1 แถวของตาราง alert_logs (arguments เหมือน save_alert)"""
+        data = {
+            "alert_type": alert_type,
+            "severity": severity,
+            "title": title,
+            "message": message,
+            "location": location,
+        }
+        
+        if pm25_value is not None:
+            data["pm25_value"] = pm25_value
+        if threshold_value is not None:
+            data["threshold_value"] = threshold_value
+        
+        return data
+    
+    # ==========================================
+    # Bulk Writes
+    # ==========================================
+    
+    def insert_predictions(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        บันทึกการพยากรณ์หลายแถวใน request เดียว (ใช้โดย background writer)
+        
+        แถวที่ซ้ำกับข้อมูลเดิม (prediction_date, target_date, location) จะถูกข้าม
+        เหมือน save_prediction ที่ insert ไม่สำเร็จเมื่อข้อมูลซ้ำ
+        
+        Args:
+            rows: List ของแถวจาก prediction_row()
+        
+        Returns:
+            จำนวนแถวที่ insert จริง (ไม่นับแถวซ้ำที่ถูกข้าม)
+        
+        Raises:
+            Exception เมื่อบันทึกไม่สำเร็จ (เพื่อให้ผู้เรียกตัดสินใจ retry/spool)
+        """
+        if not rows:
+            return 0
+        
+        inserted = self._write_chunk(
+            'pm25_predictions',
+            rows,
+            on_conflict='prediction_date,target_date,location',
+            ignore_duplicates=True
+        )
+        self._invalidate_reads('get_predictions')
+        return inserted
+    
+    def save_predictions_bulk(
+        self,
+        predictions: Iterable[Dict[str, Any]],
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        บันทึกการพยากรณ์หลายแถว โดยแบ่งเป็น chunk ละ 1 request
+        
+        Args:
+            predictions: Iterable ของ dict ที่มี arguments เดียวกับ save_prediction
+            batch_size: จำนวนแถวต่อ chunk (ค่าเริ่มต้น DB_BULK_BATCH_SIZE)
+        
+        Returns:
+            Dict สรุปจำนวนแถวที่สำเร็จ/ล้มเหลวของแต่ละ chunk
+        """
+        rows = (self.prediction_row(**p) for p in predictions)
+        try:
+            return self._bulk_write(
+                'pm25_predictions',
+                rows,
+                batch_size,
+                on_conflict='prediction_date,target_date,location',
+                ignore_duplicates=True
+            )
+        finally:
+            self._invalidate_reads('get_predictions')
+    
+    def save_actual_readings_bulk(
+        self,
+        readings: Iterable[Dict[str, Any]],
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        บันทึกค่า PM2.5 จริงหลายแถว (upsert ตาม reading_date + location) แบ่งเป็น chunk ละ 1 request
+        
+        Args:
+            readings: Iterable ของ dict ที่มี arguments เดียวกับ save_actual_reading
+                      (aqi_level/aqi_color ไม่ระบุก็ได้)
+            batch_size: จำนวนแถวต่อ chunk (ค่าเริ่มต้น DB_BULK_BATCH_SIZE)
+        
+        Returns:
+            Dict สรุปจำนวนแถวที่สำเร็จ/ล้มเหลวของแต่ละ chunk
+        """
+        rows = (self.reading_row(**r) for r in readings)
+        try:
+            return self._bulk_write(
+                'pm25_actual_readings',
+                rows,
+                batch_size,
+                on_conflict='reading_date,location'
+            )
+        finally:
+            self._invalidate_reads('get_actual_readings')
+    
+    def save_alerts_bulk(
+        self,
+        alerts: Iterable[Dict[str, Any]],
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        บันทึก alert หลายรายการ แบ่งเป็น chunk ละ 1 request
+        
+        Args:
+            alerts: Iterable ของ dict ที่มี arguments เดียวกับ save_alert
+            batch_size: จำนวนแถวต่อ chunk (ค่าเริ่มต้น DB_BULK_BATCH_SIZE)
+        
+        Returns:
+            Dict สรุปจำนวนแถวที่สำเร็จ/ล้มเหลวของแต่ละ chunk
+        """
+        rows = (self.alert_row(**a) for a in alerts)
+        return self._bulk_write('alert_logs', rows, batch_size)
+    
+    def _write_chunk(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False
+    ) -> int:
+        """
+        เขียน 1 chunk ด้วย request/transaction เดียว (แต่ละ backend ต้อง implement)
+        
+        Returns:
+            จำนวนแถวที่ insert/update จริง (แถวซ้ำที่ถูกข้ามด้วย ignore_duplicates ไม่นับ)
+        """
+        raise NotImplementedError
+    
+    def _bulk_write(
+        self,
+        table: str,
+        rows: Iterable[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False
+    ) -> Dict[str, Any]:
+        """
+        เขียนแถวทั้งหมดเป็น chunk ละ batch_size แถว (chunk ที่ล้มเหลวไม่ทำให้ chunk อื่นหยุด)
+        
+        Returns:
+            {'total', 'succeeded', 'ignored', 'failed', 'chunks': [{'index', 'rows', 'written', 'status', 'error'}]}
+            succeeded = แถวที่เขียนจริง, ignored = แถวซ้ำที่ถูกข้าม (ignore_duplicates)
+        """
+        summary = {'total': 0, 'succeeded': 0, 'ignored': 0, 'failed': 0, 'chunks': []}
+        
+        for index, chunk in enumerate(_chunks(rows, batch_size or BULK_BATCH_SIZE)):
+            summary['total'] += len(chunk)
+            try:
+                written = self._write_chunk(table, chunk, on_conflict, ignore_duplicates)
+                summary['succeeded'] += written
+                summary['ignored'] += len(chunk) - written
+                summary['chunks'].append({'index': index, 'rows': len(chunk), 'written': written, 'status': 'ok'})
+            except Exception as e:
+                summary['failed'] += len(chunk)
+                summary['chunks'].append({
+                    'index': index,
+                    'rows': len(chunk),
+                    'status': 'failed',
+                    'error': str(e)
+                })
+                logger.error("❌ Error writing chunk %s (%s rows) to %s: %s", index, len(chunk), table, e)
+        
+        logger.debug("✅ Bulk write to %s: %s/%s rows in %s chunks (%s duplicates ignored)",
+                     table, summary['succeeded'], summary['total'], len(summary['chunks']), summary['ignored'])
+        return summary
+    
+    # ==========================================
+    # Accuracy & Analytics
+    # ==========================================
+    
+    def get_accuracy_stats(
+        self,
+        days: int = 30,
+        location: str = "Nakhon Phanom"
+    ) -> Dict[str, Any]:
+        """
+        ดึงสถิติความแม่นยำ
+        
+        Args:
+            days: จำนวนวันย้อนหลัง
+            location: สถานที่
+        
+        Returns:
+            Dict ของสถิติ (dict ว่างถ้าอ่านไม่สำเร็จ ซึ่งจะไม่ถูก cache)
+        """
+        try:
+            return self._cached_read(
+                ('get_accuracy_stats', location, days),
+                lambda: self._load_accuracy_stats(days, location)
+            )
+        except Exception as e:
+            db_failure(self, 'get_accuracy_stats')
+            logger.error("❌ Error loading accuracy stats: %s", e)
+            return {}
+    
+    # ==========================================
+    # Export
+    # ==========================================
+    
+    def iter_predictions(
+        self,
+        location: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        page_size: int = EXPORT_PAGE_SIZE
+    ) -> Iterable[Dict[str, Any]]:
+        """
+        อ่านการพยากรณ์ทั้งหมด (ใหม่ไปเก่าตาม target_date) ทีละหน้าแบบ keyset
+        ใช้ memory ไม่เกิน 1 หน้าไม่ว่าตารางจะใหญ่แค่ไหน (ไม่ผ่าน read cache)
+        
+        Args:
+            location: สถานที่ (None = ทุกสถานที่)
+            date_from: target_date ตั้งแต่วันที่ (รวม)
+            date_to: target_date ถึงวันที่ (รวม)
+            page_size: จำนวนแถวต่อ 1 query
+        
+        Raises:
+            Exception เมื่ออ่านจาก database ไม่สำเร็จ
+        """
+        return self._iter_pages('pm25_predictions', 'target_date', location, date_from, date_to, page_size)
+    
+    def iter_actual_readings(
+        self,
+        location: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        page_size: int = EXPORT_PAGE_SIZE
+    ) -> Iterable[Dict[str, Any]]:
+        """อ่านค่าจริงทั้งหมด (ใหม่ไปเก่าตาม reading_date) ทีละหน้า (ดู iter_predictions)"""
+        return self._iter_pages('pm25_actual_readings', 'reading_date', location, date_from, date_to, page_size)
+    
+    def _iter_pages(self, table, date_column, location, date_from, date_to, page_size):
+        after = None
+        while True:
+            rows = self._page_query(table, date_column, page_size, location, date_from, date_to, after)
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = (str(rows[-1][date_column]), str(rows[-1]['id']))
+    
+    def _page_query(
+        self,
+        table: str,
+        date_column: str,
+        limit: int,
+        location: Optional[str],
+        date_from: Optional[date],
+        date_to: Optional[date],
+        after: Optional[Tuple[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """ดึง 1 หน้าเรียงตาม (date_column, id) จากใหม่ไปเก่า (location=None = ทุกสถานที่)"""
+        raise NotImplementedError
+    
+    # ==========================================
+    # Read Cache
+    # ==========================================
+    
+    def _cached_read(self, key: tuple, loader):
+        """
+        อ่านผ่าน cache: คืนค่าจาก cache ถ้ามี ไม่งั้นเรียก loader แล้วเก็บผลไว้
+        (exception จาก loader จะไม่ถูก cache)
+        
+        เก็บเป็น pickle ทุกครั้งที่อ่านจึงได้ list/dict ชุดใหม่ ผู้เรียกที่แก้ไขผลลัพธ์ไม่กระทบ cache
+        """
+        cached = self.read_cache.lookup(key)
+        if cached is not MISSING:
+            return pickle.loads(cached)
+        
+        generation = self._cache_generation
+        value = loader()
+        # ไม่เก็บผลที่อ่านมาก่อนมีการเขียนระหว่างทาง
+        if generation == self._cache_generation:
+            self.read_cache.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        return value
+    
+    def _invalidate_reads(self, *methods: str, location: Optional[str] = None) -> None:
+        """ล้าง cache ของ methods ที่ระบุ (เฉพาะ location ถ้าระบุ)"""
+        self._cache_generation += 1
+        self.read_cache.invalidate(
+            lambda key: key[0] in methods and (location is None or key[1] == location)
+        )
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """สถิติของ read cache"""
+        return self.read_cache.stats()
+    
+    # ==========================================
+    # Utility Functions
+    # ==========================================
+    
+    def calculate_aqi_level(self, pm25_value: float) -> tuple[str, str]:
+        """
+        คำนวณระดับ AQI จากค่า PM2.5 (ตาราง AQI_BANDS ใน backend/aqi.py)
+        
+        Args:
+            pm25_value: ค่า PM2.5
+        
+        Returns:
+            Tuple (level, color)
+        """
+        return classify_pm25(pm25_value)
+
+
+class SupabaseDB(BaseDB):
+    """Class สำหรับจัดการ Supabase database"""
+    
+    def __init__(self, client: Optional[Client] = None):
+        """
+        Initialize Supabase client
+        
+        Args:
+            client: client ที่สร้างไว้แล้ว (เช่น fake client ใน benchmark) ถ้าไม่ระบุจะสร้างจาก environment
+        """
         self.url = os.getenv('SUPABASE_URL')
         self.key = os.getenv('SUPABASE_SERVICE_KEY') or os.getenv('SUPABASE_KEY')
         
+        if client is not None:
+            super().__init__()
+            self._client = client
+            self._client_pid = None
+            return
+        
         if not self.url or not self.key:
             raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY in environment variables")
+        if create_client is None:
+            raise ImportError("supabase package is not installed")
         
-        self.client: Client = create_client(self.url, self.key)
-        print(f"✅ Connected to Supabase: {self.url}")
+        super().__init__()
+        self._client: Client = create_client(self.url, self.key)
+        self._client_pid = os.getpid()
+        logger.info("✅ Connected to Supabase: %s", self.url)
+    
+    @property
+    def client(self) -> Client:
+        """Client ของ process ปัจจุบัน (connection pool ของ httpx ใช้ข้าม fork ไม่ได้ จึงสร้างใหม่หลัง fork)"""
+        if self._client_pid is not None and self._client_pid != os.getpid():
+            self._client = create_client(self.url, self.key)
+            self._client_pid = os.getpid()
+        return self._client
     
     # ==========================================
     # PM2.5 Predictions
     # ==========================================
     
+    @timed_db_call
     def save_prediction(
         self,
         prediction_date: date,
@@ -56,56 +621,67 @@ class SupabaseDB:
             Dict ของข้อมูลที่บันทึก
         """
         try:
-            data = {
-                "prediction_date": str(prediction_date),
-                "target_date": str(target_date),
-                "predicted_value": predicted_value,
-                "input_values": input_values,
-                "model_version": model_version,
-                "location": location,
-                "data_source": "LSTM Model",
-            }
-            
-            if confidence_score is not None:
-                data["confidence_score"] = confidence_score
+            data = self.prediction_row(
+                prediction_date=prediction_date,
+                target_date=target_date,
+                predicted_value=predicted_value,
+                input_values=input_values,
+                model_version=model_version,
+                location=location,
+                confidence_score=confidence_score
+            )
             
             result = self.client.table('pm25_predictions').insert(data).execute()
-            print(f"✅ Saved prediction: {predicted_value} for {target_date}")
+            self._invalidate_reads('get_predictions', location=location)
+            logger.debug("✅ Saved prediction: %s for %s", predicted_value, target_date)
             return result.data[0] if result.data else {}
         
         except Exception as e:
-            print(f"❌ Error saving prediction: {e}")
+            db_failure(self, 'save_prediction')
+            logger.error("❌ Error saving prediction: %s", e,
+                         extra={'location': location, 'target_date': target_date})
             return {}
     
+    @timed_db_call
     def get_predictions(
         self,
         limit: int = 10,
-        location: str = "Nakhon Phanom"
+        location: str = "Nakhon Phanom",
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        cursor: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
-        ดึงข้อมูลการพยากรณ์
+        ดึงข้อมูลการพยากรณ์ (ใหม่ไปเก่าตาม target_date)
         
         Args:
             limit: จำนวนข้อมูลที่ต้องการ
             location: สถานที่
+            date_from: target_date ตั้งแต่วันที่ (รวม)
+            date_to: target_date ถึงวันที่ (รวม)
+            cursor: cursor จาก next_cursor() ของหน้าก่อน (keyset pagination)
         
         Returns:
             List ของการพยากรณ์
+
+        Raises:
+            ValueError ถ้า cursor ไม่ถูกต้อง
         """
+        after = decode_cursor(cursor) if cursor else None
         try:
-            result = self.client.table('pm25_predictions')\
-                .select('*')\
-                .eq('location', location)\
-                .order('target_date', desc=True)\
-                .limit(limit)\
-                .execute()
-            
-            return result.data
+            return self._cached_read(
+                ('get_predictions', location, limit, date_from, date_to, after),
+                lambda: self._page_query(
+                    'pm25_predictions', 'target_date', limit, location, date_from, date_to, after
+                )
+            )
         
         except Exception as e:
-            print(f"❌ Error getting predictions: {e}")
+            db_failure(self, 'get_predictions')
+            logger.error("❌ Error getting predictions: %s", e)
             return []
     
+    @timed_db_call
     def update_actual_value(
         self,
         target_date: date,
@@ -130,17 +706,22 @@ class SupabaseDB:
                 .eq('location', location)\
                 .execute()
             
-            print(f"✅ Updated actual value: {actual_value} for {target_date}")
+            # trigger ใน database จะบันทึก accuracy log ด้วย
+            self._invalidate_reads('get_predictions', 'get_accuracy_stats', location=location)
+            logger.debug("✅ Updated actual value: %s for %s", actual_value, target_date)
             return True
         
         except Exception as e:
-            print(f"❌ Error updating actual value: {e}")
+            db_failure(self, 'update_actual_value')
+            logger.error("❌ Error updating actual value: %s", e,
+                         extra={'location': location, 'target_date': target_date})
             return False
     
     # ==========================================
     # PM2.5 Actual Readings
     # ==========================================
     
+    @timed_db_call
     def save_actual_reading(
         self,
         reading_date: date,
@@ -173,87 +754,122 @@ class SupabaseDB:
             Dict ของข้อมูลที่บันทึก
         """
         try:
-            data = {
-                "reading_date": str(reading_date),
-                "reading_time": datetime.now().isoformat(),
-                "pm25_value": pm25_value,
-                "aqi_level": aqi_level,
-                "aqi_color": aqi_color,
-                "location": location,
-                "data_source": data_source,
-            }
-            
-            if temperature is not None:
-                data["temperature"] = temperature
-            if humidity is not None:
-                data["humidity"] = humidity
-            if wind_speed is not None:
-                data["wind_speed"] = wind_speed
-            if raw_data is not None:
-                data["raw_data"] = raw_data
+            data = self.reading_row(
+                reading_date=reading_date,
+                pm25_value=pm25_value,
+                aqi_level=aqi_level,
+                aqi_color=aqi_color,
+                location=location,
+                temperature=temperature,
+                humidity=humidity,
+                wind_speed=wind_speed,
+                data_source=data_source,
+                raw_data=raw_data
+            )
             
             # ใช้ upsert เพื่อ update ถ้ามีข้อมูลวันนั้นแล้ว
             result = self.client.table('pm25_actual_readings')\
                 .upsert(data, on_conflict='reading_date,location')\
                 .execute()
             
-            print(f"✅ Saved actual reading: {pm25_value} for {reading_date}")
+            self._invalidate_reads('get_actual_readings', location=location)
+            logger.debug("✅ Saved actual reading: %s for %s", pm25_value, reading_date)
             return result.data[0] if result.data else {}
         
         except Exception as e:
-            print(f"❌ Error saving actual reading: {e}")
+            db_failure(self, 'save_actual_reading')
+            logger.error("❌ Error saving actual reading: %s", e,
+                         extra={'location': location, 'reading_date': reading_date})
             return {}
     
+    @timed_db_call
     def get_actual_readings(
         self,
         limit: int = 10,
-        location: str = "Nakhon Phanom"
+        location: str = "Nakhon Phanom",
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        cursor: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
-        ดึงข้อมูลค่าจริง
+        ดึงข้อมูลค่าจริง (ใหม่ไปเก่าตาม reading_date)
         
         Args:
             limit: จำนวนข้อมูล
             location: สถานที่
+            date_from: reading_date ตั้งแต่วันที่ (รวม)
+            date_to: reading_date ถึงวันที่ (รวม)
+            cursor: cursor จาก next_cursor() ของหน้าก่อน (keyset pagination)
         
         Returns:
             List ของค่าจริง
+
+        Raises:
+            ValueError ถ้า cursor ไม่ถูกต้อง
         """
+        after = decode_cursor(cursor) if cursor else None
         try:
-            result = self.client.table('pm25_actual_readings')\
-                .select('*')\
-                .eq('location', location)\
-                .order('reading_date', desc=True)\
-                .limit(limit)\
-                .execute()
-            
-            return result.data
+            return self._cached_read(
+                ('get_actual_readings', location, limit, date_from, date_to, after),
+                lambda: self._page_query(
+                    'pm25_actual_readings', 'reading_date', limit, location, date_from, date_to, after
+                )
+            )
         
         except Exception as e:
-            print(f"❌ Error getting actual readings: {e}")
+            db_failure(self, 'get_actual_readings')
+            logger.error("❌ Error getting actual readings: %s", e)
             return []
     
+    def _page_query(
+        self,
+        table: str,
+        date_column: str,
+        limit: int,
+        location: Optional[str],
+        date_from: Optional[date],
+        date_to: Optional[date],
+        after: Optional[Tuple[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """
+        ดึง 1 หน้าเรียงตาม (date_column, id) จากใหม่ไปเก่า
+        หน้าถัดไปใช้ WHERE (date, id) < cursor แทน OFFSET ทำให้ทุกหน้าใช้เวลาเท่ากัน
+        """
+        query = self.client.table(table).select('*')
+        if location:
+            query = query.eq('location', location)
+        if date_from:
+            query = query.gte(date_column, date_from.isoformat())
+        if date_to:
+            query = query.lte(date_column, date_to.isoformat())
+        if after:
+            key_date, key_id = after
+            query = query.or_(
+                f'{date_column}.lt.{key_date},'
+                f'and({date_column}.eq.{key_date},id.lt.{key_id})'
+            )
+        return (
+            query
+            .order(date_column, desc=True)
+            .order('id', desc=True)
+            .limit(limit)
+            .execute()
+            .data
+        )
+    
     # ==========================================
     # Accuracy & Analytics
     # ==========================================
     
-    def get_accuracy_stats(
+    @timed_db_call
+    def _load_accuracy_stats(
         self,
-        days: int = 30,
-        location: str = "Nakhon Phanom"
+        days: int,
+        location: str
     ) -> Dict[str, Any]:
-        """
-        ดึงสถิติความแม่นยำ
-        
-        Args:
-            days: จำนวนวันย้อนหลัง
-            location: สถานที่
-        
-        Returns:
-            Dict ของสถิติ
-        """
+        """ดึงสถิติจาก RPC (ถ้าไม่สำเร็จอ่าน rollup ตรงๆ และสุดท้ายใช้ fallback จาก accuracy log)"""
         try:
-            # ใช้ view ที่สร้างไว้
+            # function ใน schema.sql รวมผลจาก daily_accuracy_rollup
             result = self.client.rpc(
                 'get_accuracy_stats',
                 {'days_back': days, 'loc': location}
@@ -262,37 +878,82 @@ class SupabaseDB:
             return result.data[0] if result.data else {}
         
         except Exception as e:
-            print(f"❌ Error getting accuracy stats: {e}")
+            db_fallback(self, 'accuracy_stats')
+            logger.error("❌ Error getting accuracy stats: %s", e)
+        
+        try:
+            return self._get_accuracy_stats_rollup(days, location)
+        except Exception as e:
+            db_fallback(self, 'accuracy_stats_rollup')
+            logger.error("❌ Error reading accuracy rollup: %s", e)
             # Fallback: query ธรรมดา
             return self._get_accuracy_stats_fallback(days, location)
     
+    @timed_db_call
+    def _get_accuracy_stats_rollup(
+        self,
+        days: int,
+        location: str
+    ) -> Dict[str, Any]:
+        """
+        รวมสถิติจาก daily_accuracy_rollup (1 แถวต่อวัน ดึงไม่เกิน days แถว)
+        
+        Raises:
+            Exception เมื่อไม่มีตาราง rollup หรือ query ไม่สำเร็จ
+        """
+        since = (date.today() - timedelta(days=days)).isoformat()
+        rows = self.client.table('daily_accuracy_rollup')\
+            .select('total_predictions, accurate_count, error_sum, squared_error_sum, '
+                    'error_percentage_sum, error_percentage_count')\
+            .eq('location', location)\
+            .gte('stat_date', since)\
+            .execute()\
+            .data
+        
+        stats = AccuracyAccumulator()
+        for row in rows:
+            stats.add_daily(row)
+        return stats.result()
+    
+    @timed_db_call
     def _get_accuracy_stats_fallback(
         self,
         days: int,
         location: str
     ) -> Dict[str, Any]:
-        """Fallback method สำหรับดึงสถิติ"""
-        try:
-            result = self.client.table('prediction_accuracy_log')\
-                .select('error_value, error_percentage, is_accurate')\
-                .execute()
-            
-            if not result.data:
-                return {}
-            
-            errors = [r['error_value'] for r in result.data if r.get('error_value')]
-            accurate = [r for r in result.data if r.get('is_accurate')]
+        """
+        Fallback เมื่อไม่มี RPC และตาราง rollup: กรองตามวันและสถานที่ใน query แล้วดึงทีละหน้า (keyset ตาม id)
+        คำนวณสถิติแบบสะสม จึงใช้ memory คงที่ไม่ว่าตารางจะใหญ่แค่ไหน
+        
+        Raises:
+            Exception เมื่อ query ไม่สำเร็จ (get_accuracy_stats จะไม่ cache ผลนี้)
+        """
+        since = (date.today() - timedelta(days=days)).isoformat()
+        stats = AccuracyAccumulator()
+        last_id = None
+        
+        while True:
+            query = self.client.table('prediction_accuracy_log')\
+                .select('id, error_value, error_percentage, squared_error, is_accurate, '
+                        'pm25_predictions!inner(location, target_date, days_ahead)')\
+                .eq('pm25_predictions.location', location)\
+                .eq('pm25_predictions.days_ahead', 1)\
+                .gte('pm25_predictions.target_date', since)\
+                .order('id')\
+                .limit(ACCURACY_PAGE_SIZE)
+            if last_id is not None:
+                query = query.gt('id', last_id)
             
-            return {
-                'total_predictions': len(result.data),
-                'avg_error': sum(errors) / len(errors) if errors else 0,
-                'accuracy_rate': len(accurate) / len(result.data) * 100 if result.data else 0
-            }
+            page = query.execute().data
+            for row in page:
+                stats.add(row)
+            if len(page) < ACCURACY_PAGE_SIZE:
+                break
+            last_id = page[-1]['id']
         
-        except Exception as e:
-            print(f"❌ Error in fallback stats: {e}")
-            return {}
+        return stats.result()
     
+    @timed_db_call
     def get_recent_predictions_with_actual(
         self,
         days: int = 7,
@@ -319,13 +980,111 @@ class SupabaseDB:
             return result.data
         
         except Exception as e:
-            print(f"❌ Error getting predictions with actual: {e}")
+            db_failure(self, 'get_recent_predictions_with_actual')
+            logger.error("❌ Error getting predictions with actual: %s", e)
             return []
     
+    # ==========================================
+    # Model Versions (ใช้โดย backend/model_registry.py)
+    # ==========================================
+    
+    @timed_db_call
+    def get_model_versions(self, active_only: bool = True) -> List[Dict[str, Any]]:
+        """
+        ดึงรายการ model จากตาราง model_versions
+        
+        Args:
+            active_only: True = เฉพาะ model ที่ต้องโหลด (is_active, is_production หรือ is_shadow)
+        
+        Returns:
+            List ของ model versions (ว่างถ้าอ่านไม่สำเร็จ)
+        """
+        try:
+            # ตารางมีไม่กี่แถว ดึงทั้งหมดแล้วกรองเอง
+            rows = self.client.table('model_versions').select('*').order('version').execute().data
+            return [r for r in rows if not active_only or _is_loaded_version(r)]
+        
+        except Exception as e:
+            db_failure(self, 'get_model_versions')
+            logger.error("❌ Error getting model versions: %s", e)
+            return []
+    
+    @timed_db_call
+    def set_production_model(self, version: str) -> bool:
+        """
+        ตั้ง model ที่ตอบ request (ตัวเดิมยังโหลดอยู่ถ้า is_active)
+        
+        Args:
+            version: version ใน model_versions
+        
+        Returns:
+            True ถ้าสำเร็จ, False ถ้าไม่มี version นี้หรือเขียนไม่สำเร็จ
+        """
+        return self._set_model_flag('set_production_model', 'is_production', version)
+    
+    @timed_db_call
+    def set_shadow_model(self, version: Optional[str]) -> bool:
+        """
+        ตั้ง model ที่รันเทียบกับ production บน input เดียวกัน (None = ยกเลิก shadow)
+        
+        Returns:
+            True ถ้าสำเร็จ, False ถ้าไม่มี version นี้หรือเขียนไม่สำเร็จ
+        """
+        return self._set_model_flag('set_shadow_model', 'is_shadow', version)
+    
+    @timed_db_call
+    def set_model_active(self, version: str, active: bool) -> bool:
+        """
+        โหลด (True) หรือเลิกโหลด (False) model ไว้ใน memory ของทุก worker
+        
+        Returns:
+            True ถ้าสำเร็จ
+        """
+        try:
+            self.client.table('model_versions').update({'is_active': active}).eq('version', version).execute()
+            return True
+        
+        except Exception as e:
+            db_failure(self, 'set_model_active')
+            logger.error("❌ Error updating model versions: %s", e, extra={'version': version})
+            return False
+    
+    def _set_model_flag(self, function: str, flag: str, version: Optional[str]) -> bool:
+        try:
+            # function ใน schema.sql เปลี่ยนทุกแถวใน UPDATE เดียว
+            result = self.client.rpc(function, {'p_version': version}).execute()
+            return bool(result.data)
+        
+        except Exception as e:
+            db_fallback(self, function)
+            logger.error("❌ Error calling %s: %s", function, e)
+        
+        try:
+            table = self.client.table('model_versions')
+            if version is not None and not table.select('version').eq('version', version).execute().data:
+                return False
+            # ล้างตัวเดิมก่อน: ระหว่างนั้น registry เห็นว่าไม่มี model จึงใช้ตัวเดิมต่อ
+            query = self.client.table('model_versions').update({flag: False}).eq(flag, True)
+            if version is not None:
+                query = query.neq('version', version)
+            query.execute()
+            if version is not None:
+                update = {flag: True, 'is_active': True}
+                if flag == 'is_production':
+                    update['is_shadow'] = False
+                self.client.table('model_versions').update(update).eq('version', version).execute()
+            return True
+        
+        except Exception as e:
+            db_failure(self, function)
+            logger.error("❌ Error updating model versions: %s", e, extra={'version': version})
+            return False
+    
     # ==========================================
     # Alert Logs
     # ==========================================
     
+    @timed_db_call
     def save_alert(
         self,
         alert_type: str,
@@ -352,71 +1111,101 @@ class SupabaseDB:
             Dict ของ alert ที่บันทึก
         """
         try:
-            data = {
-                "alert_type": alert_type,
-                "severity": severity,
-                "title": title,
-                "message": message,
-                "location": location,
-            }
-            
-            if pm25_value is not None:
-                data["pm25_value"] = pm25_value
-            if threshold_value is not None:
-                data["threshold_value"] = threshold_value
+            data = self.alert_row(
+                alert_type=alert_type,
+                severity=severity,
+                title=title,
+                message=message,
+                pm25_value=pm25_value,
+                threshold_value=threshold_value,
+                location=location
+            )
             
             result = self.client.table('alert_logs').insert(data).execute()
-            print(f"✅ Saved alert: {title}")
+            logger.debug("✅ Saved alert: %s", title)
             return result.data[0] if result.data else {}
         
         except Exception as e:
-            print(f"❌ Error saving alert: {e}")
+            db_failure(self, 'save_alert')
+            logger.error("❌ Error saving alert: %s", e,
+                         extra={'location': location, 'alert_type': alert_type})
             return {}
     
     # ==========================================
-    # Utility Functions
+    # Bulk Helpers
     # ==========================================
     
-    def calculate_aqi_level(self, pm25_value: float) -> tuple[str, str]:
+    @timed_db_call
+    def _write_chunk(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False
+    ) -> int:
         """
-        คำนวณระดับ AQI จากค่า PM2.5
-        
-        Args:
-            pm25_value: ค่า PM2.5
+        เขียน 1 chunk ด้วย request เดียว (upsert ถ้ากำหนด on_conflict, ไม่งั้น insert)
         
         Returns:
-            Tuple (level, color)
+            จำนวนแถวที่ insert/update จริง (ignore_duplicates: นับจาก count ที่ PostgREST ส่งกลับ)
+        
+        Raises:
+            Exception เมื่อเขียนไม่สำเร็จ
         """
-        if pm25_value <= 15.0:
-            return ('ดีมาก', '#28b4d8')
-        elif pm25_value <= 25.0:
-            return ('ดี', '#2ecc71')
-        elif pm25_value <= 37.5:
-            return ('ปานกลาง', '#f1c40f')
-        elif pm25_value <= 75.0:
-            return ('เริ่มมีผลกระทบ', '#e67e22')
-        else:
-            return ('มีผลกระทบต่อสุขภาพ', '#e74c3c')
+        query = self.client.table(table)
+        if on_conflict:
+            # แถวที่ key ซ้ำกันใน chunk เดียวกัน upsert ไม่ได้ เก็บเฉพาะแถวสุดท้าย
+            keys = on_conflict.split(',')
+            unique_rows = list({tuple(row.get(k) for k in keys): row for row in rows}.values())
+            query = query.upsert(
+                unique_rows,
+                on_conflict=on_conflict,
+                ignore_duplicates=ignore_duplicates,
+                returning='minimal',
+                count='exact' if ignore_duplicates else None
+            )
+            response = query.execute()
+            if ignore_duplicates and response.count is not None:
+                return response.count
+            return len(unique_rows)
+        query.insert(rows, returning='minimal').execute()
+        return len(rows)
+    
+    # ==========================================
+    # Utility Functions
+    # ==========================================
     
+    @timed_db_call
     def test_connection(self) -> bool:
         """ทดสอบการเชื่อมต่อ"""
         try:
             result = self.client.table('pm25_predictions').select('id').limit(1).execute()
-            print("✅ Database connection test: SUCCESS")
+            logger.info("✅ Database connection test: SUCCESS")
             return True
         except Exception as e:
-            print(f"❌ Database connection test: FAILED - {e}")
+            logger.error("❌ Database connection test: FAILED - %s", e)
             return False
 
 
 # Singleton instance
 _db_instance = None
 
-def get_db() -> SupabaseDB:
-    """Get database instance (singleton)"""
+def get_db() -> BaseDB:
+    """
+    Get database instance (singleton)
+    
+    เลือก backend จาก DB_BACKEND: 'supabase' (ค่าเริ่มต้น) หรือ 'sqlite' (ไฟล์ในเครื่อง ตาม SQLITE_PATH)
+    """
     global _db_instance
     if _db_instance is None:
-        _db_instance = SupabaseDB()
+        backend = os.getenv('DB_BACKEND', 'supabase').lower()
+        if backend == 'sqlite':
+            from backend.sqlite_database import SQLiteDB
+            _db_instance = SQLiteDB(os.getenv('SQLITE_PATH', 'pm25.db'))
+        elif backend == 'supabase':
+            _db_instance = SupabaseDB()
+        else:
+            raise ValueError(f"Unknown DB_BACKEND: {backend}")
     return _db_instance
 
 
@@ -0,0 +1,66 @@
+"""
+Export Module
+แปลงแถวจาก database เป็น NDJSON หรือ CSV แบบ generator เพื่อ stream ให้ client
+ทีละ batch โดยไม่ต้องสร้างทั้งไฟล์ใน memory
+"""
+
+import csv
+import io
+import json
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator
+
+# จำนวนแถวที่รวมเป็น 1 chunk ของ response (ลดจำนวนครั้งที่เขียนลง socket)
+ROWS_PER_CHUNK = 200
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _batches(rows: Iterable[Dict[str, Any]]) -> Iterator[list]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, ROWS_PER_CHUNK))
+        if not batch:
+            return
+        yield batch
+
+
+def ndjson_chunks(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """แถวละ 1 JSON object ต่อ 1 บรรทัด"""
+    for batch in _batches(rows):
+        yield ''.join(json.dumps(row, ensure_ascii=False, default=str) + '\n' for row in batch)
+
+
+def _csv_value(value: Any) -> Any:
+    # คอลัมน์ JSON (input_values, raw_data) เขียนเป็น JSON string ในช่องเดียว
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def csv_chunks(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """CSV ที่มี header จากคอลัมน์ของแถวแรก (ไม่มีข้อมูล = ไฟล์ว่าง)"""
+    buffer = io.StringIO()
+    writer = None
+    for batch in _batches(rows):
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(batch[0]), extrasaction='ignore')
+            writer.writeheader()
+        writer.writerows({k: _csv_value(v) for k, v in row.items()} for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export_chunks(rows: Iterable[Dict[str, Any]], fmt: str) -> Iterator[str]:
+    """
+    Args:
+        rows: iterable ของแถว (เช่น db.iter_actual_readings())
+        fmt: 'ndjson' หรือ 'csv'
+    """
+    if fmt == 'csv':
+        return csv_chunks(rows)
+    return ndjson_chunks(rows)
@@ -0,0 +1,91 @@
+"""
+HTTP Cache Module
+Conditional GET (ETag / Last-Modified → 304) และ gzip สำหรับ read API
+ข้อมูลเปลี่ยนวันละครั้ง client จึงไม่ต้องดาวน์โหลด payload เดิมซ้ำ
+"""
+
+import gzip
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from flask import Response, jsonify, request
+
+# Cache-Control ของ read API (ค่าเริ่มต้น no-cache = เก็บได้แต่ต้องตรวจ ETag กับ server ทุกครั้ง)
+API_CACHE_CONTROL = os.getenv('API_CACHE_CONTROL', 'no-cache')
+
+# บีบอัดเฉพาะ response ที่ใหญ่กว่านี้ (bytes) เล็กกว่านี้ไม่คุ้ม CPU
+GZIP_MIN_SIZE = int(os.getenv('GZIP_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        # Supabase: 2025-01-01T00:00:00.123456+00:00, SQLite: 2025-01-01T00:00:00.123Z
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def rows_last_modified(rows: Iterable[Dict[str, Any]]) -> Optional[datetime]:
+    """เวลาแก้ไขล่าสุดของชุดข้อมูล (updated_at หรือ created_at ที่ใหม่ที่สุด)"""
+    timestamps = [
+        _parse_timestamp(row.get('updated_at') or row.get('created_at'))
+        for row in rows
+    ]
+    timestamps = [t for t in timestamps if t is not None]
+    return max(timestamps) if timestamps else None
+
+
+def conditional_json(payload: Any, last_modified: Optional[datetime] = None) -> Response:
+    """
+    สร้าง JSON response ที่มี ETag (hash ของ body), Last-Modified และ Cache-Control
+    ถ้า If-None-Match / If-Modified-Since ของ request ตรงกัน จะคืน 304 ที่ไม่มี body
+
+    Args:
+        payload: ข้อมูลที่จะส่งเป็น JSON
+        last_modified: เวลาแก้ไขล่าสุดของข้อมูล (ดู rows_last_modified)
+    """
+    response = jsonify(payload)
+    # weak ETag: body เดียวกันอาจถูกส่งแบบ gzip หรือไม่ก็ได้
+    digest = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+    response.set_etag(digest, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = API_CACHE_CONTROL
+    return response.make_conditional(request)
+
+
+def compress_response(response: Response) -> Response:
+    """
+    บีบอัด response ด้วย gzip เมื่อ client รองรับ (ใช้เป็น after_request hook)
+    ข้าม response ที่เล็ก, เป็น stream/ไฟล์ หรือบีบอัดแล้ว
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.accept_encodings:
+        return response
+
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
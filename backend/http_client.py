@@ -0,0 +1,151 @@
+"""
+HTTP Client Module
+HTTP client ที่ใช้ connection pool ร่วมกัน (keep-alive) พร้อม retry แบบ exponential backoff + jitter
+ใช้กับการเรียก WAQI API และ prediction API จาก script
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# HTTP status ที่ลองเรียกซ้ำได้ (ปัญหาชั่วคราวของ server)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _parse_timeouts(spec: str) -> Dict[str, float]:
+    """แปลง "host=seconds,host=seconds" เป็น dict"""
+    timeouts = {}
+    for item in spec.split(','):
+        host, _, seconds = item.strip().partition('=')
+        if host and seconds:
+            timeouts[host.strip()] = float(seconds)
+    return timeouts
+
+
+class HTTPClient:
+    """requests.Session ที่ใช้ร่วมกันทุก thread พร้อม retry และ timeout แยกตาม host"""
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        default_timeout: float = 10.0,
+        host_timeouts: Optional[Dict[str, float]] = None
+    ):
+        """
+        Args:
+            pool_size: จำนวน connection ที่เก็บไว้ต่อ host (ควร >= จำนวน thread)
+            max_retries: จำนวนครั้งที่ลองซ้ำสูงสุด (ไม่รวมครั้งแรก)
+            backoff_base: เวลารอก่อนลองซ้ำครั้งแรก (วินาที) แล้วเพิ่มเป็น 2 เท่าทุกครั้ง
+            backoff_max: เวลารอสูงสุดต่อครั้ง (วินาที)
+            default_timeout: timeout ของ host ที่ไม่ได้กำหนดไว้ (วินาที)
+            host_timeouts: timeout แยกตาม host เช่น {'api.waqi.info': 10}
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.default_timeout = default_timeout
+        self.host_timeouts = host_timeouts or {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self.stats_counters = {'requests': 0, 'retries': 0, 'failures': 0}
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        ส่ง request โดยลองซ้ำเมื่อเชื่อมต่อไม่ได้, timeout หรือได้ status ใน RETRY_STATUSES
+
+        Returns:
+            requests.Response ของครั้งสุดท้าย (status อื่นจะไม่ลองซ้ำ)
+
+        Raises:
+            requests.RequestException เมื่อลองครบแล้วยังเชื่อมต่อไม่ได้
+        """
+        parts = urlsplit(url)
+        # ไม่ log query string เพราะอาจมี token
+        label = f"{method} {parts.netloc}{parts.path}"
+        kwargs.setdefault('timeout', self.host_timeouts.get(parts.hostname, self.default_timeout))
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            error = None
+            response = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self._lock:
+                self.stats_counters['requests'] += 1
+
+            status = response.status_code if response is not None else type(error).__name__
+            logger.debug("🌐 %s → %s in %.0f ms (attempt %s)", label, status, elapsed_ms, attempt + 1)
+
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            if not retryable:
+                return response
+            if attempt == self.max_retries:
+                break
+
+            with self._lock:
+                self.stats_counters['retries'] += 1
+            time.sleep(self._backoff(attempt, response))
+
+        with self._lock:
+            self.stats_counters['failures'] += 1
+        if error is not None:
+            raise error
+        return response
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """เวลารอก่อนลองซ้ำ: ใช้ Retry-After ถ้ามี ไม่งั้นเป็น exponential backoff แบบ full jitter"""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def stats(self) -> Dict[str, int]:
+        """จำนวน request / retry / ที่ล้มเหลว"""
+        with self._lock:
+            return dict(self.stats_counters)
+
+
+# Singleton instance
+_client_instance = None
+
+def get_http_client() -> HTTPClient:
+    """Get HTTP client instance (singleton)"""
+    global _client_instance
+    if _client_instance is None:
+        _client_instance = HTTPClient(
+            pool_size=int(os.getenv('HTTP_POOL_SIZE', '10')),
+            max_retries=int(os.getenv('HTTP_MAX_RETRIES', '3')),
+            backoff_base=float(os.getenv('HTTP_BACKOFF_BASE', '0.5')),
+            default_timeout=float(os.getenv('HTTP_TIMEOUT', '10')),
+            host_timeouts=_parse_timeouts(
+                os.getenv('HTTP_HOST_TIMEOUTS', 'api.waqi.info=10,project-pm25-1.onrender.com=30')
+            )
+        )
+    return _client_instance
@@ -0,0 +1,211 @@
+"""
+Inference Module
+โหลด model/scaler และพยากรณ์ PM2.5 ใช้ร่วมกันระหว่าง Flask server และ script (เช่น daily_update.py)
+"""
+
+import os
+from datetime import date, timedelta
+
+import joblib
+import numpy as np
+
+from backend.cache import MISSING
+from backend.metrics import INFERENCE_BATCH_SIZE, INFERENCE_PHASE_LATENCY
+
+# ปิด TensorFlow logging
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(base_dir, 'lstm_pm25_model (2).h5')
+SCALER_PATH = os.path.join(base_dir, 'scaler (2).pkl')
+
+# จำนวนวันที่ใช้เป็น input ของ model
+WINDOW_SIZE = 3
+
+# ความละเอียดที่ใช้คำนวณ: float32 (ค่าเดิม) หรือ float16 (NumPy backend เก็บ weights และคำนวณเป็น float16)
+PRECISIONS = ('float32', 'float16')
+
+def load_keras_model(path):
+    """โหลด model ด้วย TensorFlow/Keras (import TensorFlow เฉพาะตอนเรียกใช้)"""
+    from tensorflow import keras
+    # สร้าง custom objects สำหรับ compatibility
+    from tensorflow.keras.layers import InputLayer
+
+    # Custom InputLayer ที่รองรับ batch_shape
+    class CustomInputLayer(InputLayer):
+        def __init__(self, batch_shape=None, **kwargs):
+            if batch_shape is not None:
+                kwargs['batch_input_shape'] = batch_shape
+            super().__init__(**kwargs)
+
+    # Custom DTypePolicy สำหรับ Keras เก่า
+    class DTypePolicy:
+        def __init__(self, name='float32'):
+            self.name = name
+            self._name = name
+
+        @property
+        def compute_dtype(self):
+            return self.name
+
+        @property
+        def variable_dtype(self):
+            return self.name
+
+    custom_objects = {
+        'InputLayer': CustomInputLayer,
+        'DTypePolicy': DTypePolicy,
+    }
+
+    # โหลด model
+    with keras.utils.custom_object_scope(custom_objects):
+        return keras.models.load_model(
+            path,
+            compile=False
+        )
+
+def load_numpy_model(path, dtype='float32'):
+    """โหลด weights จากไฟล์ .h5 มารันด้วย NumPy (ไม่ต้องใช้ TensorFlow)"""
+    from backend.lstm_numpy import NumpyLSTMModel
+    return NumpyLSTMModel.from_h5(path, dtype=dtype)
+
+def load_model(path=MODEL_PATH, backend='keras', precision='float32'):
+    """
+    โหลด model ตาม inference backend
+
+    Args:
+        path: path ของไฟล์ .h5
+        backend: 'keras' (TensorFlow) หรือ 'numpy'
+        precision: ความละเอียดที่ใช้คำนวณ (ดู PRECISIONS) float16 รองรับเฉพาะ NumPy backend
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown inference precision: {precision}")
+    if precision != 'float32':
+        if backend != 'numpy':
+            raise ValueError(f"INFERENCE_PRECISION={precision} requires INFERENCE_BACKEND=numpy")
+        return load_numpy_model(path, precision)
+    if backend == 'numpy':
+        return load_numpy_model(path)
+    if backend == 'keras':
+        return load_keras_model(path)
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+def load_scaler(path=SCALER_PATH):
+    """โหลด MinMaxScaler ที่ใช้ตอน train"""
+    return joblib.load(path)
+
+def as_windows(windows):
+    """แปลง input เป็น numpy array ขนาด (จำนวน window, 3) และตรวจสอบขนาด"""
+    windows = np.asarray(windows, dtype=float)
+    if windows.ndim != 2 or windows.shape[1] != WINDOW_SIZE:
+        raise ValueError(f'Each window must contain exactly {WINDOW_SIZE} values')
+    return windows
+
+def predict_windows(model, scaler, windows):
+    """
+    พยากรณ์หลาย window พร้อมกันด้วยการเรียก model ครั้งเดียว
+
+    Args:
+        model: Keras model หรือ NumpyLSTMModel
+        scaler: scaler ที่ใช้ตอน train
+        windows: list ของข้อมูล 3 วัน [[v1, v2, v3], ...]
+
+    Returns:
+        numpy array ของค่าที่พยากรณ์ (1 ค่าต่อ 1 window)
+    """
+    windows = as_windows(windows)
+
+    INFERENCE_BATCH_SIZE.observe(len(windows))
+
+    # scale ทุก window ในครั้งเดียว (scaler มี 1 feature)
+    with INFERENCE_PHASE_LATENCY.time(phase='scaler_transform'):
+        input_scaled = scaler.transform(windows.reshape(-1, 1))
+    X_input = np.reshape(input_scaled, (len(windows), WINDOW_SIZE, 1))
+
+    # forward pass ครั้งเดียวทั้ง batch
+    with INFERENCE_PHASE_LATENCY.time(phase='model_predict'):
+        prediction_scaled = model.predict(X_input, batch_size=len(windows), verbose=0)
+    with INFERENCE_PHASE_LATENCY.time(phase='inverse_transform'):
+        prediction_final = scaler.inverse_transform(prediction_scaled)
+
+    return prediction_final[:, 0]
+
+def predict_windows_cached(model, scaler, windows, cache, key_prefix=()):
+    """
+    พยากรณ์หลาย window โดยใช้ผลจาก cache ก่อน แล้วรัน model เฉพาะ window ที่ยังไม่มีใน cache
+
+    Args:
+        cache: LRUCache
+        key_prefix: tuple ที่ต่อหน้า cache key (เช่น model version)
+
+    Returns:
+        (numpy array ของค่าที่พยากรณ์, จำนวน window ที่ได้จาก cache)
+    """
+    windows = as_windows(windows)
+    keys = [key_prefix + (tuple(row),) for row in windows.tolist()]
+
+    predictions = np.empty(len(windows), dtype=float)
+    missing = []
+    for i, key in enumerate(keys):
+        value = cache.lookup(key)
+        if value is MISSING:
+            missing.append(i)
+        else:
+            predictions[i] = value
+
+    if missing:
+        computed = predict_windows(model, scaler, windows[missing])
+        predictions[missing] = computed
+        for i, value in zip(missing, computed):
+            cache.set(keys[i], float(value))
+
+    return predictions, len(windows) - len(missing)
+
+def forecast_windows(predict, windows, horizon):
+    """
+    พยากรณ์ล่วงหน้าหลายวันแบบ recursive: นำค่าที่พยากรณ์ได้ต่อท้าย window แล้วพยากรณ์วันถัดไป
+    ทุก window จะถูกพยากรณ์พร้อมกันใน forward pass เดียวต่อ 1 วัน
+
+    Args:
+        predict: function(windows) → (predictions, cache_hits)
+        windows: list ของข้อมูล 3 วัน [[v1, v2, v3], ...]
+        horizon: จำนวนวันล่วงหน้า
+
+    Returns:
+        (numpy array ขนาด (จำนวน window, horizon),
+         numpy array ขนาด (horizon, จำนวน window, 3) ของ window ที่ใช้พยากรณ์แต่ละวัน,
+         จำนวน window ที่ได้จาก cache)
+    """
+    current = as_windows(windows)
+    forecasts = np.empty((len(current), horizon), dtype=float)
+    inputs = np.empty((horizon,) + current.shape, dtype=float)
+    cache_hits = 0
+
+    for step in range(horizon):
+        inputs[step] = current
+        predictions, hits = predict(current)
+        forecasts[:, step] = predictions
+        cache_hits += hits
+        current = np.column_stack([current[:, 1:], predictions])
+
+    return forecasts, inputs, cache_hits
+
+def prediction_record(window, predicted_value, location='Nakhon Phanom', days_ahead=1,
+                      model_version=None):
+    """สร้าง arguments ของ db.save_prediction สำหรับการพยากรณ์ล่วงหน้า days_ahead วัน"""
+    today = date.today()
+
+    input_dict = {
+        "day1": float(window[0]),
+        "day2": float(window[1]),
+        "day3": float(window[2])
+    }
+
+    return dict(
+        prediction_date=today,
+        target_date=today + timedelta(days=days_ahead),
+        predicted_value=float(predicted_value),
+        input_values=input_dict,
+        model_version=model_version or os.getenv('MODEL_VERSION', 'v1.0'),
+        location=location
+    )
@@ -0,0 +1,132 @@
+"""
+Logging Module
+ตั้งค่า logging แบบมีระดับ (level) โดย request thread แค่ใส่ record ลง queue
+ส่วนการ format และเขียน stdout ทำใน thread ของ QueueListener
+
+Environment:
+    LOG_LEVEL   ระดับเริ่มต้น (DEBUG, INFO, WARNING, ERROR) ค่าเริ่มต้น INFO
+    LOG_LEVELS  ระดับแยกตาม module เช่น "backend.database=WARNING,backend.http_client=DEBUG"
+    LOG_FORMAT  text หรือ json
+    LOG_QUIET   true = production mode: ตั้ง backend.* เป็น WARNING (บันทึกเฉพาะ warning/error)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict
+
+# field มาตรฐานของ LogRecord (ที่เหลือคือ context ที่ส่งผ่าน extra=)
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Format record เป็น JSON 1 บรรทัด (รวม context จาก extra=)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ContextFormatter(logging.Formatter):
+    """Format แบบข้อความ ต่อท้ายด้วย context จาก extra= (key=value)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        context = {
+            k: v for k, v in vars(record).items()
+            if k not in _RECORD_FIELDS and not k.startswith('_')
+        }
+        if context:
+            text += ' ' + ' '.join(f'{k}={v}' for k, v in context.items())
+        return text
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler ที่ไม่ format ข้อความใน thread ที่เรียก log
+    (QueueHandler ปกติเรียก format() ก่อนใส่ queue) ให้ listener เป็นคนทำแทน
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(','):
+        name, _, level = item.strip().partition('=')
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _build_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(ContextFormatter(
+            '%(asctime)s %(levelname)-7s [%(process)d] %(name)s: %(message)s'
+        ))
+    return handler
+
+
+def _start_listener() -> None:
+    """สร้าง queue + listener thread ใหม่ (เรียกซ้ำใน process ลูกหลัง fork)"""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, _build_handler(), respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging() -> None:
+    """ตั้งค่า logging ของ process (เรียกซ้ำได้ จะตั้งค่าครั้งเดียว)"""
+    global _queue_handler
+    with _lock:
+        if _queue_handler is not None:
+            return
+
+        root = logging.getLogger()
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+        if os.getenv('LOG_QUIET', 'false').lower() == 'true':
+            logging.getLogger('backend').setLevel(logging.WARNING)
+        for name, level in _parse_levels(os.getenv('LOG_LEVELS', '')).items():
+            logging.getLogger(name).setLevel(level)
+
+        _queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+        root.handlers = [_queue_handler]
+        _start_listener()
+
+        atexit.register(_stop_listener)
+        # thread ของ listener ไม่ถูก copy ไปยัง process ลูก (gunicorn preload) จึงต้องเริ่มใหม่
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_start_listener)
@@ -0,0 +1,174 @@
+"""
+NumPy LSTM Inference Module
+รัน LSTM model (.h5) ด้วย NumPy ล้วน โดยไม่ต้อง import TensorFlow/Keras
+dtype='float16' เก็บ weights และคำนวณเป็น float16 จริง (ดูผลเทียบกับ float32 ใน benchmarks)
+"""
+
+import json
+from typing import Dict, Optional
+
+import h5py
+import numpy as np
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x: np.ndarray) -> np.ndarray:
+    return np.clip(x / 6.0 + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'linear': lambda x: x,
+}
+
+
+def _get_activation(name: str):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation: {name}")
+    return ACTIVATIONS[name]
+
+
+class NumpyLSTMModel:
+    """
+    LSTM → (Dropout) → Dense ที่รันด้วย NumPy แบบ vectorized ทั้ง batch
+
+    มี method ``predict(X, batch_size=None, verbose=0)`` แบบเดียวกับ Keras
+    จึงใช้แทน Keras model ใน server ได้ทันที
+    """
+
+    def __init__(
+        self,
+        kernel: np.ndarray,
+        recurrent_kernel: np.ndarray,
+        bias: np.ndarray,
+        dense_kernel: np.ndarray,
+        dense_bias: np.ndarray,
+        activation: str = 'tanh',
+        recurrent_activation: str = 'sigmoid',
+        dense_activation: str = 'linear',
+        dtype: str = 'float32'
+    ):
+        """
+        Args:
+            kernel: input kernel ขนาด (features, 4 * units) เรียง gate i, f, c, o
+            recurrent_kernel: recurrent kernel ขนาด (units, 4 * units)
+            bias: bias ขนาด (4 * units,)
+            dense_kernel: kernel ของ Dense layer ขนาด (units, outputs)
+            dense_bias: bias ของ Dense layer ขนาด (outputs,)
+            activation: activation ของ cell/hidden state
+            recurrent_activation: activation ของ gate
+            dense_activation: activation ของ Dense layer
+            dtype: dtype ที่ใช้คำนวณ
+        """
+        self.dtype = np.dtype(dtype)
+        self.precision = self.dtype.name
+        self.kernel = np.asarray(kernel, dtype=self.dtype)
+        self.recurrent_kernel = np.asarray(recurrent_kernel, dtype=self.dtype)
+        self.bias = np.asarray(bias, dtype=self.dtype)
+        self.dense_kernel = np.asarray(dense_kernel, dtype=self.dtype)
+        self.dense_bias = np.asarray(dense_bias, dtype=self.dtype)
+        self.units = self.recurrent_kernel.shape[0]
+        self.activation = _get_activation(activation)
+        self.recurrent_activation = _get_activation(recurrent_activation)
+        self.dense_activation = _get_activation(dense_activation)
+
+    @classmethod
+    def from_h5(cls, path: str, dtype: str = 'float32') -> 'NumpyLSTMModel':
+        """
+        อ่าน weights ของ LSTM/Dense จากไฟล์ Keras .h5 (Sequential model)
+
+        Args:
+            path: path ของไฟล์ .h5
+            dtype: dtype ที่ใช้คำนวณ
+
+        Returns:
+            NumpyLSTMModel
+        """
+        with h5py.File(path, 'r') as f:
+            config = json.loads(f.attrs['model_config'])
+            layers = {
+                layer['config']['name']: layer
+                for layer in config['config']['layers']
+            }
+            lstm_name = next(n for n, l in layers.items() if l['class_name'] == 'LSTM')
+            dense_name = next(n for n, l in layers.items() if l['class_name'] == 'Dense')
+
+            lstm_weights = cls._read_layer_weights(f['model_weights'][lstm_name])
+            dense_weights = cls._read_layer_weights(f['model_weights'][dense_name])
+
+        lstm_config = layers[lstm_name]['config']
+        dense_config = layers[dense_name]['config']
+
+        return cls(
+            kernel=lstm_weights['kernel'],
+            recurrent_kernel=lstm_weights['recurrent_kernel'],
+            bias=lstm_weights.get('bias', np.zeros(lstm_weights['kernel'].shape[1])),
+            dense_kernel=dense_weights['kernel'],
+            dense_bias=dense_weights.get('bias', np.zeros(dense_weights['kernel'].shape[1])),
+            activation=lstm_config.get('activation', 'tanh'),
+            recurrent_activation=lstm_config.get('recurrent_activation', 'sigmoid'),
+            dense_activation=dense_config.get('activation', 'linear'),
+            dtype=dtype
+        )
+
+    @staticmethod
+    def _read_layer_weights(group: h5py.Group) -> Dict[str, np.ndarray]:
+        """อ่าน weights ของ 1 layer ตามลำดับใน attribute weight_names"""
+        weights = {}
+        for name in group.attrs['weight_names']:
+            name = name.decode() if isinstance(name, bytes) else str(name)
+            # Keras 2: 'lstm/lstm_cell/kernel:0', Keras 3: 'sequential/lstm/lstm_cell/kernel'
+            key = name.rsplit('/', 1)[-1].split(':')[0]
+            weights[key] = group[name][()]
+        return weights
+
+    def predict(
+        self,
+        X: np.ndarray,
+        batch_size: Optional[int] = None,
+        verbose: int = 0
+    ) -> np.ndarray:
+        """
+        Forward pass ทั้ง batch
+
+        Args:
+            X: input ขนาด (batch, timesteps, features)
+            batch_size, verbose: รับไว้เพื่อให้เรียกแบบเดียวกับ Keras (ไม่ได้ใช้)
+
+        Returns:
+            numpy array ขนาด (batch, outputs)
+        """
+        X = np.asarray(X, dtype=self.dtype)
+        n_samples, n_steps, _ = X.shape
+        units = self.units
+
+        # คำนวณ input projection ของทุก timestep ในครั้งเดียว
+        x_proj = X @ self.kernel + self.bias
+
+        h = np.zeros((n_samples, units), dtype=self.dtype)
+        c = np.zeros((n_samples, units), dtype=self.dtype)
+        for t in range(n_steps):
+            z = x_proj[:, t, :] + h @ self.recurrent_kernel
+            i = self.recurrent_activation(z[:, :units])
+            f = self.recurrent_activation(z[:, units:2 * units])
+            g = self.activation(z[:, 2 * units:3 * units])
+            o = self.recurrent_activation(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * self.activation(c)
+
+        output = self.dense_activation(h @ self.dense_kernel + self.dense_bias)
+        # ผลลัพธ์อย่างน้อย float32 (float16 ละเอียดไม่พอหลัง inverse_transform เป็น µg/m³)
+        return output.astype(np.result_type(self.dtype, np.float32), copy=False)
+
+    @property
+    def weight_bytes(self) -> int:
+        """ขนาดของ weights ใน memory (bytes)"""
+        return sum(w.nbytes for w in (
+            self.kernel, self.recurrent_kernel, self.bias, self.dense_kernel, self.dense_bias
+        ))
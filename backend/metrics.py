@@ -0,0 +1,290 @@
+"""
+Metrics Module
+Counter / Gauge / Histogram แบบเบา (ไม่ต้องติดตั้ง prometheus_client) และ render เป็น
+Prometheus text exposition format สำหรับ endpoint /metrics
+
+หมายเหตุ: ค่าเก็บแยกตาม process (gunicorn แต่ละ worker มี metrics ของตัวเอง)
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# bucket (วินาที) สำหรับ latency ตั้งแต่ 0.1 ms ถึง 10 s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    metric_type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional['Registry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """ค่าที่เพิ่มขึ้นอย่างเดียว"""
+
+    metric_type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """ค่าที่ขึ้นลงได้ หรืออ่านจาก function ตอน render"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """อ่านค่าจาก function ทุกครั้งที่ render (ใช้กับ metric ที่ไม่มี label)"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f'{self.name} {_format_value(self._function())}']
+            except Exception:
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """การกระจายของค่า (เช่น latency) แบ่งตาม bucket"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # key → [count ต่อ bucket..., sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0.0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+                    break
+            data[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """จับเวลาของ block แล้ว observe (วินาที)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for key, data in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(data[-1])}')
+            lines.append(f'{self.name}_count{labels} {_format_value(cumulative)}')
+        return lines
+
+
+class Registry:
+    """ที่เก็บ metric ทั้งหมดของ process"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Render ทุก metric เป็น Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return '\n'.join(m.render() for m in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+# ==========================================
+# Metrics ของระบบ
+# ==========================================
+
+HTTP_REQUESTS = Counter(
+    'pm25_http_requests_total', 'HTTP requests by route and status',
+    ['method', 'route', 'status']
+)
+HTTP_LATENCY = Histogram(
+    'pm25_http_request_duration_seconds', 'HTTP request latency by route',
+    ['method', 'route']
+)
+HTTP_IN_FLIGHT = Gauge(
+    'pm25_http_requests_in_flight', 'HTTP requests currently being served'
+)
+
+INFERENCE_PHASE_LATENCY = Histogram(
+    'pm25_inference_phase_duration_seconds',
+    'Time spent in scaler_transform, model_predict and inverse_transform',
+    ['phase']
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    'pm25_inference_batch_size', 'Windows per model forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+)
+
+DB_LATENCY = Histogram(
+    'pm25_db_call_duration_seconds', 'Database method latency',
+    ['backend', 'operation']
+)
+DB_FAILURES = Counter(
+    'pm25_db_failures_total', 'Database calls that failed',
+    ['backend', 'operation']
+)
+DB_FALLBACKS = Counter(
+    'pm25_db_fallbacks_total', 'Times a slower fallback path was used',
+    ['backend', 'operation']
+)
+
+MODEL_LOADED = Gauge('pm25_model_loaded', '1 when the model and scaler are loaded')
+MODEL_GENERATION = Gauge('pm25_model_generation', 'Number of times the model has been (re)loaded')
+
+SHADOW_LATENCY = Histogram(
+    'pm25_shadow_predict_duration_seconds', 'Shadow model inference time per batch',
+    ['version']
+)
+SHADOW_ABS_DIFF = Histogram(
+    'pm25_shadow_abs_diff', 'Absolute difference between shadow and production predictions (µg/m³)',
+    ['version', 'production'],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 25)
+)
+SHADOW_DROPPED = Counter(
+    'pm25_shadow_dropped_total', 'Batches not shadow-scored because the shadow queue was full',
+    ['version']
+)
+
+
+def timed_db_call(func):
+    """Decorator สำหรับ method ของ database: บันทึก latency และนับ exception ที่หลุดออกมา"""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        backend = type(self).__name__
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        except Exception:
+            DB_FAILURES.inc(backend=backend, operation=func.__name__)
+            raise
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - start, backend=backend, operation=func.__name__)
+    return wrapper
+
+
+def db_failure(db, operation: str) -> None:
+    """นับ database call ที่ล้มเหลว (ใช้ใน except ที่คืนค่าว่างแทนการ raise)"""
+    DB_FAILURES.inc(backend=type(db).__name__, operation=operation)
+
+
+def db_fallback(db, operation: str) -> None:
+    """นับครั้งที่ใช้ fallback path"""
+    DB_FALLBACKS.inc(backend=type(db).__name__, operation=operation)
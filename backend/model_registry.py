@@ -0,0 +1,352 @@
+"""
+Model Registry Module
+โหลด model หลายเวอร์ชันตามตาราง model_versions ไว้ใน memory และสลับ production model
+โดยไม่ต้อง restart: state ใหม่ถูกสร้างเสร็จก่อนแล้วแทนที่ด้วยการ assign ครั้งเดียว
+request ที่อ่าน registry.state ครั้งเดียวจึงได้ production/shadow ที่เข้าคู่กันเสมอ
+
+หมายเหตุ: แต่ละ worker มี registry ของตัวเอง การเปลี่ยนใน database จะเห็นภายใน
+refresh_interval วินาที (worker ที่รับคำสั่ง promote จะเห็นทันที)
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel(NamedTuple):
+    """model + scaler ของ 1 เวอร์ชันที่โหลดแล้ว"""
+    version: str
+    model: Any
+    scaler: Any
+    model_path: str
+    scaler_path: str
+    load_seconds: float
+
+
+class RegistryState(NamedTuple):
+    """ภาพรวมของ registry ณ เวลาหนึ่ง (ไม่ถูกแก้ไข สร้างใหม่ทุกครั้งที่เปลี่ยน)"""
+    production: Optional[LoadedModel]
+    shadow: Optional[LoadedModel]
+    loaded: Dict[str, LoadedModel]
+    generation: int
+
+
+class ModelRegistry:
+    """model ทุกเวอร์ชันที่ is_active/is_production/is_shadow ใน model_versions"""
+
+    def __init__(
+        self,
+        load_model: Callable[[str], Any],
+        load_scaler: Callable[[str], Any],
+        fetch_versions: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+        default_version: str = 'v1.0',
+        default_model_path: str = '',
+        default_scaler_path: str = '',
+        model_dir: str = '.',
+        refresh_interval: float = 60.0,
+        on_swap: Optional[Callable[[RegistryState], None]] = None,
+        run_phase: Optional[Callable[[str, Callable[[], Any]], Any]] = None
+    ):
+        """
+        Args:
+            load_model: function(path) → model
+            load_scaler: function(path) → scaler
+            fetch_versions: function() → แถวของ model_versions (เช่น db.get_model_versions)
+                            None หรือไม่มีแถว = ใช้ default_version จากไฟล์ default
+            default_version: version ของไฟล์ default (MODEL_VERSION)
+            default_model_path: ไฟล์ model ของแถวที่ไม่ระบุ model_path
+            default_scaler_path: ไฟล์ scaler ของแถวที่ไม่ระบุ scaler_path
+            model_dir: โฟลเดอร์ที่ใช้กับ path แบบ relative
+            refresh_interval: ระยะห่างการอ่าน model_versions ซ้ำ (วินาที, 0 = ไม่อ่านซ้ำ)
+            on_swap: เรียกหลังเปลี่ยน production model (ใน thread ที่เรียก refresh)
+            run_phase: function(name, func) → ผลของ func() ใช้จับเวลาการโหลดไฟล์ model/scaler
+                       แต่ละไฟล์ (ชื่อ 'model:<version>' และ 'scaler:<version>')
+        """
+        self.load_model = load_model
+        self.load_scaler = load_scaler
+        self.fetch_versions = fetch_versions
+        self.default_version = default_version
+        self.default_model_path = default_model_path
+        self.default_scaler_path = default_scaler_path
+        self.model_dir = model_dir
+        self.refresh_interval = refresh_interval
+        self.on_swap = on_swap
+        self.run_phase = run_phase or (lambda name, func: func())
+
+        self.state = RegistryState(None, None, {}, 0)
+        self.errors: Dict[str, str] = {}
+        self.last_refresh: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self._poll_pid = None
+        self._poll_lock = threading.Lock()
+
+    # ==========================================
+    # Loading
+    # ==========================================
+
+    def _paths(self, row: Dict[str, Any]) -> Tuple[str, str]:
+        return (
+            os.path.join(self.model_dir, row.get('model_path') or self.default_model_path),
+            os.path.join(self.model_dir, row.get('scaler_path') or self.default_scaler_path),
+        )
+
+    def _load(self, version: str, model_path: str, scaler_path: str) -> LoadedModel:
+        if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
+            raise FileNotFoundError(f'Missing model or scaler files: {model_path}, {scaler_path}')
+        start = time.perf_counter()
+        model = self.run_phase(f'model:{version}', lambda: self.load_model(model_path))
+        scaler = self.run_phase(f'scaler:{version}', lambda: self.load_scaler(scaler_path))
+        seconds = round(time.perf_counter() - start, 4)
+        logger.info("✅ Loaded model %s (%s) in %.2fs", version, model_path, seconds)
+        return LoadedModel(version, model, scaler, model_path, scaler_path, seconds)
+
+    def _rows(self, use_database: bool) -> List[Dict[str, Any]]:
+        rows = self.fetch_versions() if use_database and self.fetch_versions is not None else []
+        if rows:
+            return rows
+        if self.state.production is not None:
+            # อ่าน database ไม่สำเร็จ (ได้ list ว่าง): ใช้ state เดิมต่อ
+            return []
+        return [{'version': self.default_version, 'is_active': True, 'is_production': True}]
+
+    def refresh(self, use_database: bool = True) -> bool:
+        """
+        อ่าน model_versions แล้วโหลดเวอร์ชันที่ยังไม่มีใน memory (ระหว่างโหลด request ยังใช้ state เดิม)
+        เวอร์ชันที่โหลดไม่สำเร็จจะถูกข้าม production เดิมจึงยังตอบ request ต่อไปได้
+
+        Args:
+            use_database: False = ไม่อ่าน model_versions โหลดเฉพาะไฟล์ default (ใช้ใน gunicorn master
+                          ก่อน fork แล้วให้ worker เรียก refresh() ซ้ำหลัง fork)
+
+        Returns:
+            True ถ้ามี production model พร้อมใช้งาน
+        """
+        with self._refresh_lock:
+            current = self.state
+            rows = self._rows(use_database)
+            self.last_refresh = time.time()
+            if not rows:
+                return current.production is not None
+
+            loaded = {}
+            for row in rows:
+                version = row['version']
+                paths = self._paths(row)
+                existing = current.loaded.get(version)
+                if existing is not None and (existing.model_path, existing.scaler_path) == paths:
+                    loaded[version] = existing
+                    continue
+                try:
+                    loaded[version] = self._load(version, *paths)
+                    self.errors.pop(version, None)
+                except Exception as e:
+                    self.errors[version] = str(e)
+                    logger.error("❌ Error loading model %s: %s", version, e, extra={
+                        'model_path': paths[0],
+                        'scaler_path': paths[1],
+                    })
+                    if existing is not None:
+                        loaded[version] = existing
+
+            # เก็บ error เฉพาะเวอร์ชันที่ยังต้องโหลดอยู่
+            self.errors = {v: e for v, e in self.errors.items() if any(r['version'] == v for r in rows)}
+
+            production_version = next((r['version'] for r in rows if r.get('is_production')), None)
+            production = loaded.get(production_version) or current.production
+            if production is not None:
+                # production เดิมยังอยู่ใน memory จนกว่าตัวใหม่จะโหลดสำเร็จ
+                loaded.setdefault(production.version, production)
+
+            shadow_version = next((r['version'] for r in rows if r.get('is_shadow')), None)
+            shadow = loaded.get(shadow_version)
+            if shadow is not None and production is not None and shadow.version == production.version:
+                shadow = None
+
+            swapped = production is not current.production
+            self.state = RegistryState(
+                production,
+                shadow,
+                loaded,
+                current.generation + 1 if swapped else current.generation
+            )
+
+        if swapped:
+            logger.info("🔁 Production model: %s → %s",
+                        current.production.version if current.production else None,
+                        production.version if production else None)
+            if self.on_swap is not None:
+                self.on_swap(self.state)
+        return production is not None
+
+    # ==========================================
+    # Background refresh
+    # ==========================================
+
+    def ensure_polling(self) -> None:
+        """เริ่ม thread อ่าน model_versions ซ้ำทุก refresh_interval วินาที (ครั้งเดียวต่อ process)"""
+        if not self.refresh_interval or self.fetch_versions is None or self._poll_pid == os.getpid():
+            return
+        with self._poll_lock:
+            if self._poll_pid == os.getpid():
+                return
+            self._poll_pid = os.getpid()
+            threading.Thread(target=self._poll, name='model-registry', daemon=True).start()
+
+    def _poll(self) -> None:
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("❌ Error refreshing model registry: %s", e)
+
+    # ==========================================
+    # Status
+    # ==========================================
+
+    def describe(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            'production': state.production.version if state.production else None,
+            'shadow': state.shadow.version if state.shadow else None,
+            'generation': state.generation,
+            'loaded': {
+                version: {
+                    'model_path': os.path.basename(entry.model_path),
+                    'scaler_path': os.path.basename(entry.scaler_path),
+                    'load_seconds': entry.load_seconds,
+                    'precision': getattr(entry.model, 'precision', None),
+                    'weight_bytes': getattr(entry.model, 'weight_bytes', None),
+                }
+                for version, entry in sorted(state.loaded.items())
+            },
+            'errors': dict(self.errors),
+            'refresh_interval': self.refresh_interval,
+            'last_refresh': self.last_refresh,
+        }
+
+
+class ShadowScorer:
+    """
+    รัน shadow model บน windows ชุดเดียวกับที่ production ใช้ใน request แล้วเทียบผล
+    ทำใน thread เบื้องหลัง request จึงไม่ต้องรอ shadow (ถ้างานค้างเกิน max_pending จะข้าม)
+    """
+
+    def __init__(self, predict: Callable[[LoadedModel, np.ndarray], np.ndarray], max_pending: int = 8):
+        """
+        Args:
+            predict: function(loaded_model, windows) → numpy array ของค่าที่พยากรณ์
+            max_pending: จำนวน batch ที่รอ shadow ได้สูงสุด
+        """
+        self.predict = predict
+        self.max_pending = max_pending
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _ensure_started(self) -> ThreadPoolExecutor:
+        # thread ไม่ถูก copy ไปยัง process ลูกหลัง fork จึงสร้าง executor ใหม่ต่อ process
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+                    self._pending = 0
+                    self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, shadow: LoadedModel, production_version: str,
+               windows: np.ndarray, predictions: np.ndarray) -> bool:
+        """
+        ส่ง batch ให้ shadow model (windows และ predictions ต้องไม่ถูกแก้ไขภายหลัง)
+
+        Returns:
+            True ถ้ารับงาน, False ถ้างานค้างเต็ม
+        """
+        executor = self._ensure_started()
+        with self._lock:
+            accepted = self._pending < self.max_pending
+            if accepted:
+                self._pending += 1
+        # _record ใช้ lock เดียวกัน จึงต้องเรียกหลังปล่อย lock
+        if not accepted:
+            self._record(shadow.version, dropped=1)
+            metrics.SHADOW_DROPPED.inc(version=shadow.version)
+            return False
+        executor.submit(self._score, shadow, production_version, windows, predictions)
+        return True
+
+    def _score(self, shadow, production_version, windows, predictions) -> None:
+        try:
+            start = time.perf_counter()
+            shadow_predictions = self.predict(shadow, windows)
+            seconds = time.perf_counter() - start
+            diff = np.abs(shadow_predictions - predictions)
+
+            metrics.SHADOW_LATENCY.observe(seconds, version=shadow.version)
+            for value in diff:
+                metrics.SHADOW_ABS_DIFF.observe(float(value), version=shadow.version,
+                                                production=production_version)
+            self._record(
+                shadow.version,
+                batches=1,
+                windows=len(windows),
+                abs_diff_sum=float(diff.sum()),
+                squared_diff_sum=float(np.square(diff).sum()),
+                abs_diff_max=float(diff.max()) if len(diff) else 0.0,
+                seconds=seconds
+            )
+        except Exception as e:
+            self._record(shadow.version, errors=1)
+            logger.error("❌ Shadow scoring failed: %s", e, extra={'version': shadow.version})
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(self, version: str, **values: float) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(version, dict.fromkeys((
+                'batches', 'windows', 'dropped', 'errors',
+                'abs_diff_sum', 'squared_diff_sum', 'abs_diff_max', 'seconds'
+            ), 0.0))
+            for key, value in values.items():
+                stats[key] = max(stats[key], value) if key == 'abs_diff_max' else stats[key] + value
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """รอจนไม่มีงานค้าง (ใช้ใน test)"""
+        deadline = time.monotonic() + timeout
+        while self._pending:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """ความต่างระหว่าง shadow กับ production แยกตาม shadow version"""
+        with self._lock:
+            items = {version: dict(stats) for version, stats in self._stats.items()}
+            pending = self._pending
+        result = {}
+        for version, stats in items.items():
+            windows = stats['windows']
+            result[version] = {
+                'batches': int(stats['batches']),
+                'windows': int(windows),
+                'dropped': int(stats['dropped']),
+                'errors': int(stats['errors']),
+                'mean_abs_diff': stats['abs_diff_sum'] / windows if windows else None,
+                'rms_diff': float(np.sqrt(stats['squared_diff_sum'] / windows)) if windows else None,
+                'max_abs_diff': stats['abs_diff_max'] if windows else None,
+                'mean_batch_seconds': stats['seconds'] / stats['batches'] if stats['batches'] else None,
+            }
+        return {'pending': pending, 'versions': result}
@@ -0,0 +1,392 @@
+"""
+Write-behind Persistence Module
+บันทึกผลพยากรณ์ลง database แบบเบื้องหลัง (เป็น batch) โดยไม่ให้ request ต้องรอ
+ถ้า database ใช้งานไม่ได้ จะเก็บแถวที่ค้างลงไฟล์ spool แล้วส่งซ้ำเมื่อกลับมาใช้งานได้
+"""
+
+import glob
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def _is_data_error(exc: Exception) -> bool:
+    """
+    Error จากข้อมูลเอง (PostgreSQL SQLSTATE class 22/23 เช่น constraint violation)
+    ส่งซ้ำก็ไม่สำเร็จ จึงไม่ต้องเก็บลง spool
+    """
+    if isinstance(exc, (sqlite3.IntegrityError, sqlite3.DataError)):
+        return True
+    code = getattr(exc, 'code', None)
+    return isinstance(code, str) and code[:2] in ('22', '23')
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PredictionWriter:
+    """Background writer สำหรับตาราง pm25_predictions พร้อม spool file บน disk"""
+
+    def __init__(
+        self,
+        db,
+        spool_dir: str,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        retry_interval: float = 30.0,
+        max_queue: int = 10000
+    ):
+        """
+        Args:
+            db: database instance ที่มี insert_predictions(rows)
+            spool_dir: โฟลเดอร์เก็บไฟล์ spool (append-only JSON lines)
+            batch_size: จำนวนแถวสูงสุดต่อการ insert 1 ครั้ง
+            flush_interval: เวลารอรวม batch (วินาที)
+            retry_interval: ระยะห่างการลองส่งข้อมูลใน spool ซ้ำ (วินาที)
+            max_queue: ขนาด queue สูงสุด (เกินแล้วจะเขียนลง spool ทันที)
+        """
+        self.db = db
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_queue = max_queue
+
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        # counters ถูกเพิ่มทั้งจาก thread ของ request และ thread ของ writer
+        self._stats_lock = threading.Lock()
+        self._last_replay = 0.0
+
+        self.stats_counters = {
+            'queued': 0,
+            'committed': 0,
+            'ignored': 0,
+            'spooled': 0,
+            'replayed': 0,
+            'dropped': 0,
+            'corrupt': 0,
+            'failed_batches': 0,
+        }
+        self.database_available = True
+
+    # ==========================================
+    # Public API
+    # ==========================================
+
+    def submit(self, row: Dict[str, Any]) -> str:
+        """
+        ส่งแถวเข้าคิวเพื่อบันทึกเบื้องหลัง
+
+        Returns:
+            'queued' หรือ 'spooled' (ถ้าคิวเต็ม)
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._spool([row])
+            return 'spooled'
+        self._count('queued')
+        return 'queued'
+
+    def submit_many(self, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        ส่งหลายแถวเข้าคิวในการเรียกครั้งเดียว (แถวที่เกินขนาดคิวจะถูกเก็บลง spool พร้อมกัน)
+
+        Returns:
+            จำนวนแถวตามผลลัพธ์ เช่น {'queued': 98, 'spooled': 2}
+        """
+        self._ensure_started()
+        overflow = []
+        for i, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                overflow = rows[i:]
+                break
+        if overflow:
+            self._spool(overflow)
+        queued = len(rows) - len(overflow)
+        self._count('queued', queued)
+        return {key: count for key, count in (('queued', queued), ('spooled', len(overflow))) if count}
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """รอจนคิวว่าง (ใช้ตอน shutdown หรือใน test)"""
+        if self._queue is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """บันทึกข้อมูลที่ค้างในคิว แล้วหยุด thread (ที่เหลือจะถูกเก็บลง spool)"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout)
+
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+                self._queue.task_done()
+            except queue.Empty:
+                break
+        if leftover:
+            self._spool(leftover)
+
+    def stats(self) -> Dict[str, Any]:
+        """สถิติของ writer"""
+        with self._stats_lock:
+            counters = dict(self.stats_counters)
+        return {
+            **counters,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+            'spool_files': len(self._spool_files()),
+            'database_available': self.database_available,
+        }
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats_counters[key] += amount
+
+    # ==========================================
+    # Background thread
+    # ==========================================
+
+    def _ensure_started(self) -> None:
+        # เริ่ม thread ใหม่ใน process ลูกหลัง fork (thread ของ parent ไม่ถูก copy มา)
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run,
+                name='prediction-writer',
+                daemon=True
+            )
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self) -> None:
+        first = True
+        while not self._stop.is_set():
+            try:
+                if first:
+                    # ส่งข้อมูลที่ค้างจากรอบก่อน (เช่น process เดิมตายไปก่อนส่งสำเร็จ)
+                    first = False
+                    self._replay_spool()
+                self._run_once()
+            except Exception:
+                # error ครั้งเดียวต้องไม่ทำให้ thread หยุด (ไม่งั้น request จะได้ 'queued' แต่ไม่มีการบันทึกอีกเลย)
+                logger.exception("❌ Prediction writer error, continuing")
+                self._stop.wait(self.flush_interval)
+
+    def _run_once(self) -> None:
+        batch = self._next_batch()
+        if batch:
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+        if time.monotonic() - self._last_replay >= self.retry_interval:
+            self._replay_spool()
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """รอแถวแรกแล้วรวมแถวที่ตามมาภายใน flush_interval ให้เป็น batch เดียว"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, rows: List[Dict[str, Any]], counter: str = 'committed') -> None:
+        """
+        Insert แถวเป็น batch; ถ้า database ปฏิเสธข้อมูลจะลองทีละแถวเพื่อตัดเฉพาะแถวที่ผิดออก
+        แถวที่ซ้ำกับข้อมูลเดิมนับเป็น 'ignored' ไม่ใช่ counter
+
+        Raises:
+            Exception เมื่อ database ใช้งานไม่ได้
+        """
+        try:
+            inserted = self.db.insert_predictions(rows)
+        except Exception as e:
+            if not _is_data_error(e):
+                raise
+            if len(rows) == 1:
+                self._count('dropped')
+                logger.error("❌ Dropped prediction rejected by database: %s", e)
+                return
+            for row in rows:
+                self._insert([row], counter)
+            return
+        with self._stats_lock:
+            self.stats_counters[counter] += inserted
+            self.stats_counters['ignored'] += len(rows) - inserted
+
+    def _write_batch(self, rows: List[Dict[str, Any]]) -> bool:
+        """Insert 1 batch; ถ้า database ใช้ไม่ได้ให้เก็บลง spool"""
+        try:
+            self._insert(rows)
+        except Exception as e:
+            self._count('failed_batches')
+            self.database_available = False
+            logger.warning("⚠️ Database unavailable, spooling %s predictions: %s", len(rows), e)
+            try:
+                self._spool(rows)
+            except OSError as spool_error:
+                self._count('dropped', len(rows))
+                logger.error("❌ Dropped %s predictions, spool write failed: %s", len(rows), spool_error)
+            return False
+
+        if not self.database_available:
+            # database กลับมาแล้ว ส่งข้อมูลใน spool ทันที
+            self.database_available = True
+            self._replay_spool()
+        return True
+
+    # ==========================================
+    # Spool file
+    # ==========================================
+
+    def _spool_path(self) -> str:
+        return os.path.join(self.spool_dir, f'spool-{os.getpid()}.jsonl')
+
+    def _spool_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.spool_dir, 'spool-*.jsonl')))
+
+    def _spool(self, rows: List[Dict[str, Any]]) -> None:
+        """เก็บแถวที่บันทึกไม่สำเร็จลง spool"""
+        self._append_to_spool(rows)
+        self._count('spooled', len(rows))
+
+    def _append_to_spool(self, rows: List[Dict[str, Any]]) -> None:
+        """Append แถวลงไฟล์ spool ของ process นี้ (fsync ทุกครั้ง)"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with self._spool_lock:
+            with open(self._spool_path(), 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _claim_spool_files(self) -> List[str]:
+        """
+        ย้ายไฟล์ spool มาเป็นของ process นี้ด้วย os.rename (atomic)
+        เพื่อไม่ให้หลาย worker ส่งข้อมูลชุดเดียวกันซ้ำ
+        """
+        claimed = []
+        candidates = []
+        # ไฟล์ของ process นี้ หรือของ process ที่ตายไปแล้ว (worker อื่นที่ยังทำงานอยู่จะส่งไฟล์ของตัวเอง)
+        for pattern in ('spool-*.jsonl', 'replay-*.jsonl'):
+            for path in sorted(glob.glob(os.path.join(self.spool_dir, pattern))):
+                owner = os.path.basename(path)[:-len('.jsonl')].split('-')[1]
+                if not owner.isdigit():
+                    continue
+                if int(owner) == os.getpid():
+                    # replay-* ของ process นี้ที่ยังอยู่ = รอบก่อนส่งไม่จบเพราะเกิด error
+                    candidates.append(path)
+                elif int(owner) != os.getpid() and not _pid_alive(int(owner)):
+                    candidates.append(path)
+
+        for path in candidates:
+            target = os.path.join(
+                self.spool_dir,
+                f'replay-{os.getpid()}-{time.time_ns()}.jsonl'
+            )
+            try:
+                with self._spool_lock:
+                    os.rename(path, target)
+            except OSError:
+                continue
+            claimed.append(target)
+        return claimed
+
+    def _read_spool_file(self, path: str) -> List[Dict[str, Any]]:
+        """
+        อ่านแถวจากไฟล์ spool ทีละบรรทัด บรรทัดที่อ่านไม่ได้ (เช่น เขียนไม่ครบเพราะ process ตาย)
+        จะถูกย้ายไปไฟล์ <path>.corrupt แทนที่จะทำให้ทั้งไฟล์ส่งไม่ได้
+        """
+        rows, corrupt = [], []
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                if isinstance(row, dict):
+                    rows.append(row)
+                else:
+                    corrupt.append(line.rstrip('\n') + '\n')
+
+        if corrupt:
+            self._count('corrupt', len(corrupt))
+            logger.warning("⚠️ Skipped %s unreadable lines in %s (moved to %s.corrupt)",
+                           len(corrupt), os.path.basename(path), os.path.basename(path))
+            with open(f'{path}.corrupt', 'a', encoding='utf-8') as f:
+                f.writelines(corrupt)
+        return rows
+
+    def _replay_spool(self) -> None:
+        """ส่งข้อมูลใน spool ซ้ำเป็น batch; ถ้ายังไม่สำเร็จจะถูกเก็บกลับลง spool"""
+        self._last_replay = time.monotonic()
+        if not os.path.isdir(self.spool_dir):
+            return
+
+        for path in self._claim_spool_files():
+            rows = self._read_spool_file(path)
+
+            failed = False
+            for start in range(0, len(rows), self.batch_size):
+                try:
+                    self._insert(rows[start:start + self.batch_size], counter='replayed')
+                except Exception:
+                    failed = True
+                    # ถ้าเขียน spool ไม่สำเร็จ ไฟล์ replay-* ยังอยู่และจะถูกส่งซ้ำรอบหน้า
+                    self._append_to_spool(rows[start:])
+                    break
+
+            os.remove(path)
+            self.database_available = not failed
+            if failed:
+                return
@@ -0,0 +1,176 @@
+"""
+Recent Readings Module
+Ring buffer ของค่า PM2.5 ล่าสุดแยกตามสถานที่ (เก็บใน numpy array ขนาดคงที่)
+ให้ /predict?location=X สร้าง input window จาก memory โดยไม่ต้องถาม database
+
+หมายเหตุ: buffer อยู่ใน process (gunicorn แต่ละ worker มีของตัวเอง) ข้อมูลที่เขียนจากที่อื่น
+(เช่น daily job) จะเห็นเมื่อ buffer หมดอายุตาม ttl แล้วโหลดจาก database ใหม่
+"""
+
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# เมื่อ buffer ไม่มี window ที่ใช้ได้ จะโหลดจาก database ใหม่ได้ไม่บ่อยกว่านี้ (วินาที) ต่อสถานที่
+MISS_RELOAD_SECONDS = 60.0
+
+
+class ReadingRing:
+    """Ring buffer ของ (วันที่, ค่า PM2.5) ของ 1 สถานที่ เรียงตามวันที่"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.days = np.zeros(capacity, dtype=np.int64)      # date.toordinal()
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.start = 0
+        self.size = 0
+        self.loaded_at = time.monotonic()
+
+    def _ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        index = (self.start + np.arange(self.size)) % self.capacity
+        return self.days[index], self.values[index]
+
+    def add(self, day: int, value: float) -> None:
+        """เพิ่มค่าของวัน day (ถ้ามีวันนั้นแล้วจะแทนที่ค่าเดิม)"""
+        if self.size:
+            last = (self.start + self.size - 1) % self.capacity
+            if day == self.days[last]:
+                self.values[last] = value
+                return
+            if day < self.days[last]:
+                self._insert_out_of_order(day, value)
+                return
+
+        end = (self.start + self.size) % self.capacity
+        self.days[end] = day
+        self.values[end] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def _insert_out_of_order(self, day: int, value: float) -> None:
+        # กรณีที่พบไม่บ่อย (บันทึกย้อนหลัง): เรียงใหม่ทั้ง buffer ซึ่งมีขนาดเล็ก
+        days, values = self._ordered()
+        position = np.searchsorted(days, day)
+        if position < len(days) and days[position] == day:
+            values[position] = value
+        else:
+            days = np.insert(days, position, day)[-self.capacity:]
+            values = np.insert(values, position, value)[-self.capacity:]
+        self.size = len(days)
+        self.start = 0
+        self.days[:self.size] = days
+        self.values[:self.size] = values
+
+    def latest(self, count: int, min_day: Optional[int] = None) -> Optional[Tuple[List[str], List[float]]]:
+        """
+        ค่าล่าสุด count วันติดกัน เรียงจากเก่าไปใหม่
+
+        Args:
+            count: จำนวนวัน
+            min_day: วันล่าสุดต้องไม่เก่ากว่านี้ (date.toordinal(), None = ไม่ตรวจ)
+
+        Returns:
+            None ถ้ามีไม่พอ, มีวันที่ขาดหาย หรือค่าล่าสุดเก่ากว่า min_day
+        """
+        if self.size < count:
+            return None
+        days, values = self._ordered()
+        if days[-1] - days[-count] != count - 1:
+            return None
+        if min_day is not None and days[-1] < min_day:
+            return None
+        return (
+            [date.fromordinal(int(d)).isoformat() for d in days[-count:]],
+            values[-count:].tolist()
+        )
+
+
+class RecentReadings:
+    """
+    Ring buffer ของสถานที่ที่กำหนดไว้ โหลดจาก database เมื่อยังไม่มีหรือหมดอายุ
+    (สถานที่อื่นไม่ถูกเก็บ จำนวน buffer และ query จึงไม่เพิ่มตาม location ที่ client ส่งมา)
+    """
+
+    def __init__(self, loader: Callable[[str, int], List[Dict[str, Any]]],
+                 locations: Iterable[str], capacity: int = 7, ttl: float = 3600.0,
+                 max_age_days: int = 1):
+        """
+        Args:
+            loader: function(location, limit) → list ของแถว pm25_actual_readings (เช่น db.get_actual_readings)
+            locations: สถานที่ที่เก็บใน memory
+            capacity: จำนวนวันที่เก็บต่อสถานที่
+            ttl: อายุของ buffer (วินาที) ก่อนโหลดจาก database ใหม่ (0 = ไม่หมดอายุ)
+            max_age_days: ค่าล่าสุดของ window ต้องไม่เก่ากว่าวันนี้เกินกี่วัน
+        """
+        self.loader = loader
+        self.locations = tuple(dict.fromkeys(locations))
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_age_days = max_age_days
+        self._rings: Dict[str, ReadingRing] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def warm(self, location: str) -> ReadingRing:
+        """โหลดค่าล่าสุดของสถานที่จาก database (แทนที่ buffer เดิม)"""
+        rows = self.loader(location, self.capacity)
+        ring = ReadingRing(self.capacity)
+        for row in sorted(rows, key=lambda r: str(r['reading_date'])):
+            ring.add(date.fromisoformat(str(row['reading_date'])[:10]).toordinal(), float(row['pm25_value']))
+        with self._lock:
+            self._rings[location] = ring
+            self.loads += 1
+        return ring
+
+    def tracks(self, location: str) -> bool:
+        """สถานที่นี้อยู่ใน locations หรือไม่"""
+        return location in self.locations
+
+    def _ring(self, location: str) -> ReadingRing:
+        ring = self._rings.get(location)
+        if ring is None or (self.ttl and time.monotonic() - ring.loaded_at > self.ttl):
+            ring = self.warm(location)
+        return ring
+
+    def add(self, location: str, reading_date: date, pm25_value: float) -> None:
+        """บันทึกค่าใหม่ (เรียกหลังบันทึกลง database สำเร็จ, สถานที่ที่ไม่ได้เก็บจะถูกข้าม)"""
+        if not self.tracks(location):
+            return
+        ring = self._ring(location)
+        with self._lock:
+            ring.add(reading_date.toordinal(), float(pm25_value))
+
+    def window(self, location: str, size: int) -> Optional[Tuple[List[str], List[float]]]:
+        """
+        Input window ของสถานที่จาก memory (size วันติดกัน และค่าล่าสุดไม่เก่ากว่า max_age_days)
+        ถ้า buffer ใช้ไม่ได้จะโหลดจาก database ใหม่ (ไม่บ่อยกว่า MISS_RELOAD_SECONDS เช่น daily job เขียนจาก process อื่น)
+
+        Returns:
+            (list ของวันที่, list ของค่า) เรียงจากเก่าไปใหม่
+            หรือ None ถ้าไม่มีข้อมูลที่ใช้ได้หรือไม่ได้เก็บสถานที่นี้
+        """
+        if not self.tracks(location):
+            return None
+        min_day = date.today().toordinal() - self.max_age_days
+        ring = self._ring(location)
+        with self._lock:
+            window = ring.latest(size, min_day)
+        if window is None and time.monotonic() - ring.loaded_at > MISS_RELOAD_SECONDS:
+            ring = self.warm(location)
+            with self._lock:
+                window = ring.latest(size, min_day)
+        return window
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'locations': {loc: ring.size for loc, ring in self._rings.items()},
+                'capacity': self.capacity,
+                'ttl_seconds': self.ttl,
+                'loads': self.loads,
+            }
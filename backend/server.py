@@ -1,26 +1,96 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import numpy as np
-import joblib
+import atexit
+import hmac
+import logging
 import os
+import threading
+import time
 import warnings
 from datetime import date, timedelta
+import numpy as np
+from backend import aqi, export, inference, metrics
+from backend.cache import LRUCache
+from backend.database import next_cursor
+from backend.http_cache import compress_response, conditional_json, rows_last_modified
+from backend.inference import prediction_record
+from backend.logging_setup import configure_logging
+from backend.model_registry import ModelRegistry, ShadowScorer
+from backend.persistence import PredictionWriter
+from backend.recent_readings import RecentReadings
 warnings.filterwarnings('ignore')
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # ปิด TensorFlow logging
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
-import tensorflow as tf
-from tensorflow import keras
+# เลือก inference backend: 'keras' (TensorFlow) หรือ 'numpy' (ไม่ต้องใช้ TensorFlow)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'keras').lower()
+
+# ความละเอียดที่ใช้คำนวณ: float32 หรือ float16 (เฉพาะ numpy backend)
+# ผลเทียบความแม่นยำ/memory/latency: python benchmarks/run_benchmarks.py --only precision
+INFERENCE_PRECISION = os.getenv('INFERENCE_PRECISION', 'float32').lower()
+if INFERENCE_PRECISION != 'float32' and INFERENCE_BACKEND != 'numpy':
+    if 'INFERENCE_BACKEND' in os.environ:
+        # ไม่เปลี่ยน backend ที่ตั้งไว้เอง: การโหลด model จะล้มเหลวพร้อมข้อความใน /api/ready
+        logger.warning("⚠️ INFERENCE_PRECISION=%s is not supported by INFERENCE_BACKEND=%s",
+                       INFERENCE_PRECISION, INFERENCE_BACKEND)
+    else:
+        # ไม่ได้ตั้ง backend เอง: ใช้ numpy ซึ่งเป็น backend เดียวที่รองรับ
+        INFERENCE_BACKEND = 'numpy'
+
+# วิธีโหลด model:
+#   eager      - โหลดตอน import (ค่าเดิม)
+#   preload    - โหลดใน gunicorn master ก่อน fork แล้วแชร์ให้ workers แบบ copy-on-write
+#                (ดู gunicorn.conf.py, ใช้ได้กับ INFERENCE_BACKEND=numpy เท่านั้น)
+#   background - เริ่มโหลดเบื้องหลังเมื่อมี request แรก route อื่นตอบได้ระหว่างรอ
+#   lazy       - โหลดตอนเรียก /predict ครั้งแรก
+MODEL_LOAD_MODE = os.getenv('MODEL_LOAD_MODE', 'eager').lower()
+
+if MODEL_LOAD_MODE == 'preload' and INFERENCE_BACKEND != 'numpy':
+    # TensorFlow ที่โหลดใน master จะค้างเมื่อใช้งานใน process ที่ fork ออกมา
+    logger.warning("⚠️ MODEL_LOAD_MODE=preload requires INFERENCE_BACKEND=numpy, using background loading")
+    MODEL_LOAD_MODE = 'background'
+
+# สถานะการโหลด (แสดงที่ /api/ready)
+load_status = {
+    'state': 'pending',  # pending, loading, ready, failed
+    'mode': MODEL_LOAD_MODE,
+    'inference_backend': INFERENCE_BACKEND,
+    'inference_precision': INFERENCE_PRECISION,
+    'loaded_in_pid': os.getpid(),
+    'phases': {},
+    'error': None,
+}
+
+def run_phase(name, func):
+    """รันขั้นตอนการโหลด 1 ขั้นและบันทึกเวลาที่ใช้ลง load_status"""
+    load_status['phases'][name] = {'status': 'running'}
+    start = time.perf_counter()
+    try:
+        result = func()
+    except Exception:
+        load_status['phases'][name] = {
+            'status': 'failed',
+            'seconds': round(time.perf_counter() - start, 4)
+        }
+        raise
+    load_status['phases'][name] = {
+        'status': 'done',
+        'seconds': round(time.perf_counter() - start, 4)
+    }
+    return result
 
 # Import database module
 try:
     from backend.database import get_db
-    db = get_db()
+    db = run_phase('database', get_db)
     DB_AVAILABLE = True
-    print("✅ Database module loaded successfully")
+    logger.info("✅ Database module loaded successfully")
 except Exception as e:
-    print(f"⚠️ Database module not available: {e}")
+    logger.warning("⚠️ Database module not available: %s", e)
     DB_AVAILABLE = False
 
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
@@ -28,67 +98,236 @@ CORS(app)
 
 # หา path ของไฟล์ปัจจุบัน
 base_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(base_dir, 'lstm_pm25_model (2).h5')
-scaler_path = os.path.join(base_dir, 'scaler (2).pkl')
+model_path = inference.MODEL_PATH
+scaler_path = inference.SCALER_PATH
 
+# model/scaler ของ production (สำเนาจาก model_registry.state สำหรับ code ที่อ้างถึงโดยตรง)
 model = None
 scaler = None
 
+# จำนวน window สูงสุดต่อ 1 request ของ /predict/batch
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '1000'))
+
+# จำนวนวันล่วงหน้าสูงสุดของ /forecast
+MAX_FORECAST_HORIZON = int(os.getenv('MAX_FORECAST_HORIZON', '30'))
+
+# จำนวนแถวสูงสุดต่อ 1 หน้าของ /api/predictions และ /api/readings (หน้าถัดไปใช้ cursor)
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '500'))
+
+# จำนวนค่าสูงสุดต่อ 1 request ของ /api/aqi/classify
+MAX_CLASSIFY_SIZE = int(os.getenv('MAX_CLASSIFY_SIZE', '1000000'))
+
+# Cache ผลพยากรณ์ตาม input window + production model version (PREDICTION_CACHE_SIZE=0 เพื่อปิด)
+prediction_cache = LRUCache(
+    maxsize=int(os.getenv('PREDICTION_CACHE_SIZE', '4096')),
+    ttl=float(os.getenv('PREDICTION_CACHE_TTL', '3600'))
+)
+
+# บันทึกผลพยากรณ์: 'async' = ส่งเข้าคิวให้ background writer บันทึกเป็น batch
+# (ถ้า database ล่มจะเก็บลง spool file แล้วส่งซ้ำภายหลัง), 'sync' = บันทึกก่อนตอบกลับ
+PREDICTION_WRITE_MODE = os.getenv('PREDICTION_WRITE_MODE', 'async').lower()
+
+prediction_writer = None
+if DB_AVAILABLE and PREDICTION_WRITE_MODE == 'async':
+    prediction_writer = PredictionWriter(
+        db,
+        spool_dir=os.getenv('PREDICTION_SPOOL_DIR', os.path.join(base_dir, '..', 'spool')),
+        batch_size=int(os.getenv('PREDICTION_WRITE_BATCH_SIZE', '100')),
+        flush_interval=float(os.getenv('PREDICTION_WRITE_FLUSH_INTERVAL', '1.0'))
+    )
+    atexit.register(prediction_writer.stop)
+
+# ค่าจริงล่าสุดแยกตามสถานที่ใน memory สำหรับ /predict?location=X (เฉพาะสถานที่ใน
+# RECENT_READINGS_LOCATIONS ซึ่งโหลดตอนเริ่ม worker สถานที่อื่นตอบ 404)
+recent_readings = None
+if DB_AVAILABLE:
+    recent_readings = RecentReadings(
+        lambda location, limit: db.get_actual_readings(limit=limit, location=location),
+        locations=[
+            location.strip()
+            for location in os.getenv('RECENT_READINGS_LOCATIONS', 'Nakhon Phanom').split(',')
+            if location.strip()
+        ],
+        capacity=max(inference.WINDOW_SIZE, int(os.getenv('RECENT_READINGS_SIZE', '7'))),
+        ttl=float(os.getenv('RECENT_READINGS_TTL', '3600')),
+        max_age_days=int(os.getenv('RECENT_READINGS_MAX_AGE_DAYS', '1'))
+    )
+
+# เพิ่มขึ้นทุกครั้งที่เปลี่ยน production model ทำให้ cache key เดิมใช้ไม่ได้
+model_generation = 0
+
+# Token ของ /api/models/* ที่เปลี่ยน production/shadow model (ไม่ตั้ง = ปิด)
+MODEL_ADMIN_TOKEN = os.getenv('MODEL_ADMIN_TOKEN', '')
+
+def on_model_swap(state):
+    """อัปเดต global model/scaler เมื่อ registry เปลี่ยน production model"""
+    global model, scaler, model_generation
+    model, scaler = state.production.model, state.production.scaler
+    model_generation = state.generation
+    prediction_cache.clear()
+
+# model ทุกเวอร์ชันที่ active ในตาราง model_versions (ไม่มี database = ใช้ไฟล์ของ server เป็น MODEL_VERSION)
+model_registry = ModelRegistry(
+    load_model=lambda path: inference.load_model(path, INFERENCE_BACKEND, INFERENCE_PRECISION),
+    load_scaler=inference.load_scaler,
+    fetch_versions=db.get_model_versions if DB_AVAILABLE else None,
+    default_version=os.getenv('MODEL_VERSION', 'v1.0'),
+    default_model_path=model_path,
+    default_scaler_path=scaler_path,
+    model_dir=base_dir,
+    refresh_interval=float(os.getenv('MODEL_REGISTRY_REFRESH', '60')),
+    on_swap=on_model_swap,
+    run_phase=run_phase
+)
+
+def shadow_predict(entry, windows):
+    """พยากรณ์ด้วย shadow model (ไม่นับรวมใน metrics ของ production inference)"""
+    input_scaled = entry.scaler.transform(windows.reshape(-1, 1))
+    X_input = np.reshape(input_scaled, (len(windows), inference.WINDOW_SIZE, 1))
+    prediction_scaled = entry.model.predict(X_input, batch_size=len(windows), verbose=0)
+    return entry.scaler.inverse_transform(prediction_scaled)[:, 0]
+
+shadow_scorer = ShadowScorer(shadow_predict, max_pending=int(os.getenv('MODEL_SHADOW_MAX_PENDING', '8')))
+
+_load_lock = threading.Lock()
+_loader_thread = None
+
+def load_model_and_scaler():
+    """
+    โหลด Model และ Scaler ทุกเวอร์ชันผ่าน model registry (เรียกซ้ำได้ จะโหลดจริงเมื่อยังไม่พร้อมเท่านั้น)
+
+    Returns:
+        True ถ้า model พร้อมใช้งาน
+    """
+    with _load_lock:
+        if load_status['state'] == 'ready':
+            return True
+        load_status['state'] = 'loading'
+        load_status['error'] = None
+
+        try:
+            # preload: master โหลดเฉพาะไฟล์ default ส่วน model_versions อ่านใน worker หลัง fork (init_worker)
+            if not model_registry.refresh(use_database=MODEL_LOAD_MODE != 'preload'):
+                raise FileNotFoundError(
+                    '; '.join(f'{v}: {e}' for v, e in model_registry.errors.items()) or 'No production model'
+                )
+
+            load_status['state'] = 'ready'
+            logger.info("✅ Model and Scaler loaded successfully! (production=%s, loaded=%s, backend=%s)",
+                        model_registry.state.production.version,
+                        ', '.join(model_registry.state.loaded), INFERENCE_BACKEND)
+            return True
+
+        except Exception as e:
+            load_status['state'] = 'failed'
+            load_status['error'] = str(e)
+            logger.exception("❌ Error loading model: %s (server will start but predictions will not work)", e)
+            return False
+
+def start_background_load():
+    """เริ่มโหลด model ใน thread เบื้องหลัง (ครั้งเดียวต่อ process)"""
+    global _loader_thread
+    with _load_lock:
+        if load_status['state'] != 'pending' or _loader_thread is not None:
+            return
+        _loader_thread = threading.Thread(
+            target=load_model_and_scaler,
+            name='model-loader',
+            daemon=True
+        )
+        _loader_thread.start()
+
+def model_ready():
+    """
+    ตรวจสอบว่า model พร้อมใช้งาน
+
+    lazy: โหลดทันที (request แรกจะรอ), background: เริ่มโหลดแล้วตอบว่ายังไม่พร้อม
+    """
+    if load_status['state'] == 'ready':
+        return True
+    if MODEL_LOAD_MODE == 'lazy':
+        return load_model_and_scaler()
+    if MODEL_LOAD_MODE == 'background':
+        start_background_load()
+    return False
+
+def model_unavailable():
+    """Response เมื่อ model ยังไม่พร้อม"""
+    if load_status['state'] in ('pending', 'loading'):
+        return jsonify({'error': 'Model is loading', 'load_status': load_status}), 503
+    return jsonify({'error': 'Model not loaded'}), 500
+
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+def init_worker():
+    """
+    งานเริ่มต้นที่ต้องอ่าน database (ครั้งเดียวต่อ process): โหลดค่าจริงล่าสุดของ RECENT_READINGS_LOCATIONS
+    และ (preload) อ่าน model_versions เพื่อโหลดเวอร์ชันอื่นนอกจากไฟล์ default
+
+    preload เรียกจาก gunicorn post_fork / request แรกของ worker ไม่ใช่ใน master
+    เพื่อไม่ให้ master เปิด connection ของ database ที่ worker จะได้รับต่อไปหลัง fork
+    """
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        if MODEL_LOAD_MODE == 'preload' and load_status['state'] == 'ready':
+            try:
+                run_phase('model_versions', model_registry.refresh)
+            except Exception as e:
+                logger.error("❌ Error refreshing model registry: %s", e)
+        if recent_readings is not None:
+            for location in recent_readings.locations:
+                run_phase(f'recent_readings:{location}', lambda: recent_readings.warm(location))
+
 # โหลด Model และ Scaler
-try:
-    if os.path.exists(model_path) and os.path.exists(scaler_path):
-        # สร้าง custom objects สำหรับ compatibility
-        from tensorflow.keras.layers import InputLayer
-        from tensorflow.keras.mixed_precision import Policy
-        
-        # Custom InputLayer ที่รองรับ batch_shape
-        class CustomInputLayer(InputLayer):
-            def __init__(self, batch_shape=None, **kwargs):
-                if batch_shape is not None:
-                    kwargs['batch_input_shape'] = batch_shape
-                super().__init__(**kwargs)
-        
-        # Custom DTypePolicy สำหรับ Keras เก่า
-        class DTypePolicy:
-            def __init__(self, name='float32'):
-                self.name = name
-                self._name = name
-                
-            @property
-            def compute_dtype(self):
-                return self.name
-            
-            @property
-            def variable_dtype(self):
-                return self.name
-        
-        custom_objects = {
-            'InputLayer': CustomInputLayer,
-            'DTypePolicy': DTypePolicy,
-        }
-        
-        # โหลด model
-        with keras.utils.custom_object_scope(custom_objects):
-            model = keras.models.load_model(
-                model_path,
-                compile=False
-            )
-        
-        scaler = joblib.load(scaler_path)
-        print("✅ Model and Scaler loaded successfully!")
-        print(f"Model path: {model_path}")
-    else:
-        print("❌ Error: Missing model or scaler files!")
-        print(f"Looking for model at: {model_path}")
-        print(f"Looking for scaler at: {scaler_path}")
-        print(f"Current directory: {os.getcwd()}")
-        if os.path.exists(base_dir):
-            print(f"Files in base_dir: {os.listdir(base_dir)}")
-except Exception as e:
-    print(f"❌ Error loading model: {str(e)}")
-    import traceback
-    traceback.print_exc()
-    print("Server will start but predictions will not work")
+if MODEL_LOAD_MODE in ('eager', 'preload'):
+    load_model_and_scaler()
+if MODEL_LOAD_MODE != 'preload':
+    init_worker()
+
+metrics.MODEL_LOADED.set_function(lambda: 1 if load_status['state'] == 'ready' else 0)
+metrics.MODEL_GENERATION.set_function(lambda: model_generation)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    metrics.HTTP_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' in g:
+        # ใช้ route pattern (ไม่ใช่ path จริง) เพื่อไม่ให้จำนวน label เพิ่มไม่จำกัด
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_LATENCY.observe(
+            time.perf_counter() - g.request_start,
+            method=request.method,
+            route=route
+        )
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    return response
+
+@app.after_request
+def compress(response):
+    return compress_response(response)
+
+@app.teardown_request
+def finish_request(exc):
+    if g.pop('request_start', None) is not None:
+        metrics.HTTP_IN_FLIGHT.dec()
+
+@app.before_request
+def warm_up_model():
+    init_worker()
+    # background: เริ่มโหลดเมื่อมี request แรกใน worker (หลัง fork)
+    if MODEL_LOAD_MODE == 'background' and load_status['state'] == 'pending':
+        start_background_load()
+    if load_status['state'] == 'ready':
+        model_registry.ensure_polling()
 
 @app.route('/')
 def home():
@@ -104,107 +343,545 @@ def home():
 
 @app.route('/api')
 def api_status():
-    status = "Ready" if model and scaler else "Model Missing"
+    if model and scaler:
+        status = "Ready"
+    elif load_status['state'] in ('pending', 'loading'):
+        status = "Loading"
+    else:
+        status = "Model Missing"
     return jsonify({
         'status': status,
         'message': 'PM2.5 Nakhon Phanom API',
         'database': 'Connected' if DB_AVAILABLE else 'Not Connected',
+        'inference_backend': INFERENCE_BACKEND,
+        'inference_precision': INFERENCE_PRECISION,
         'endpoints': {
-            '/predict': 'POST - Predict PM2.5 value',
-            '/api/predictions': 'GET - Get recent predictions',
-            '/api/readings': 'GET - Get actual readings',
+            '/predict': 'POST - Predict PM2.5 value (inputs in body, or ?location= to use recent readings)',
+            '/predict/batch': 'POST - Predict PM2.5 for many windows in one call',
+            '/forecast': 'POST - Multi-day forecast (?horizon=N, recursive)',
+            '/api/predictions': 'GET - Get predictions (?limit=&from=&to=&cursor=)',
+            '/api/readings': 'GET - Get actual readings (?limit=&from=&to=&cursor=)',
+            '/api/aqi/bands': 'GET - AQI band table',
+            '/api/aqi/classify': 'POST - Classify many PM2.5 values at once',
+            '/api/export/<predictions|readings>': 'GET - Stream full history (?format=ndjson|csv&location=&from=&to=)',
             '/api/stats': 'GET - Get accuracy statistics',
-            '/api/save-reading': 'POST - Save actual reading'
+            '/api/save-reading': 'POST - Save actual reading',
+            '/api/ready': 'GET - Readiness and model load progress',
+            '/api/cache/stats': 'GET - Prediction and database cache statistics',
+            '/api/recent-readings/stats': 'GET - In-memory recent readings buffer stats',
+            '/api/persistence/stats': 'GET - Background prediction writer statistics',
+            '/api/models': 'GET - Loaded model versions and shadow comparison stats',
+            '/api/models/<version>/promote': 'POST - Switch the production model (X-Admin-Token)',
+            '/api/models/<version>/shadow': 'POST/DELETE - Set or clear the shadow model (X-Admin-Token)',
+            '/metrics': 'GET - Prometheus metrics (text exposition format)'
         }
     })
 
+@app.route('/api/ready')
+def api_ready():
+    """Readiness check: 200 เมื่อ model พร้อม, 503 ระหว่างโหลด"""
+    model_ready()
+    status = dict(load_status, phases=dict(load_status['phases']))
+    ready = status['state'] == 'ready'
+    return jsonify({
+        'ready': ready,
+        'database': 'Connected' if DB_AVAILABLE else 'Not Connected',
+        'worker_pid': os.getpid(),
+        **status
+    }), 200 if ready else 503
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """สถิติของ prediction cache และ database read cache"""
+    return jsonify({
+        'predictions': prediction_cache.stats(),
+        'database': db.cache_stats() if DB_AVAILABLE else None,
+        'model_generation': model_generation
+    })
+
+@app.route('/api/recent-readings/stats')
+def recent_readings_stats():
+    """สถิติของ ring buffer ค่าจริงล่าสุด"""
+    return jsonify(recent_readings.stats() if recent_readings is not None else {'enabled': False})
+
+@app.route('/api/persistence/stats')
+def persistence_stats():
+    """สถิติของ background writer ที่บันทึกผลพยากรณ์"""
+    return jsonify({
+        'mode': PREDICTION_WRITE_MODE if prediction_writer is not None else 'sync',
+        'writer': prediction_writer.stats() if prediction_writer is not None else None
+    })
+
+def model_admin_denied():
+    """ตรวจสิทธิ์ของ /api/models/* (คืน response เมื่อไม่อนุญาต, None เมื่อผ่าน)"""
+    if not MODEL_ADMIN_TOKEN:
+        return jsonify({'error': 'Model admin API is disabled (set MODEL_ADMIN_TOKEN)'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), MODEL_ADMIN_TOKEN):
+        return jsonify({'error': 'Invalid admin token'}), 401
+    if not DB_AVAILABLE:
+        return jsonify({'error': 'Database not available'}), 503
+    if not model_ready():
+        return model_unavailable()
+    version = request.view_args['version']
+    if version not in {row['version'] for row in db.get_model_versions(active_only=False)}:
+        return jsonify({'error': f'Unknown model version: {version}'}), 404
+    return None
+
+@app.route('/api/models')
+def list_models():
+    """model ทุกเวอร์ชันใน model_versions, เวอร์ชันที่โหลดใน worker นี้ และผลเทียบของ shadow"""
+    return jsonify({
+        'worker_pid': os.getpid(),
+        'registry': model_registry.describe(),
+        'versions': db.get_model_versions(active_only=False) if DB_AVAILABLE else [],
+        'shadow': shadow_scorer.stats()
+    })
+
+@app.route('/api/models/<version>/promote', methods=['POST'])
+def promote_model(version):
+    """
+    สลับ production model ของทุก worker (worker นี้ทันที, worker อื่นภายใน MODEL_REGISTRY_REFRESH วินาที)
+    ถ้าโหลดเวอร์ชันใหม่ไม่สำเร็จจะคืนค่าเดิมใน database และใช้ model เดิมต่อ
+    """
+    denied = model_admin_denied()
+    if denied:
+        return denied
+
+    previous = model_registry.state.production.version
+    if not db.set_production_model(version):
+        return jsonify({'error': 'Failed to update model_versions'}), 500
+
+    model_registry.refresh()
+    if model_registry.state.production.version != version:
+        # คืนค่าเดิมและเลิกโหลดเวอร์ชันนี้ worker อื่นจะได้ไม่พยายามโหลดซ้ำ
+        was_active = version in model_registry.state.loaded
+        db.set_production_model(previous)
+        if not was_active:
+            db.set_model_active(version, False)
+        model_registry.refresh()
+        return jsonify({
+            'error': f'Failed to load model {version}, still serving {previous}',
+            'details': model_registry.errors.get(version)
+        }), 409
+
+    logger.info("✅ Promoted model %s (previous: %s)", version, previous)
+    return jsonify({'status': 'success', 'previous': previous, 'registry': model_registry.describe()})
+
+@app.route('/api/models/<version>/shadow', methods=['POST', 'DELETE'])
+def shadow_model(version):
+    """POST = รัน version เป็น shadow เทียบกับ production, DELETE = ยกเลิก shadow"""
+    denied = model_admin_denied()
+    if denied:
+        return denied
+    if request.method == 'POST' and version == model_registry.state.production.version:
+        return jsonify({'error': f'{version} is the production model'}), 400
+
+    if not db.set_shadow_model(version if request.method == 'POST' else None):
+        return jsonify({'error': 'Failed to update model_versions'}), 500
+
+    model_registry.refresh()
+    shadow = model_registry.state.shadow
+    if request.method == 'POST' and (shadow is None or shadow.version != version):
+        was_active = version in model_registry.state.loaded
+        db.set_shadow_model(None)
+        if not was_active:
+            db.set_model_active(version, False)
+        model_registry.refresh()
+        return jsonify({
+            'error': f'Failed to load shadow model {version}',
+            'details': model_registry.errors.get(version)
+        }), 409
+
+    return jsonify({'status': 'success', 'registry': model_registry.describe()})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metrics ของ worker นี้ในรูปแบบ Prometheus text exposition format"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+def predict_windows(windows):
+    """พยากรณ์หลาย window พร้อมกันด้วยการเรียก model ครั้งเดียว (ดู inference.predict_windows)"""
+    production = model_registry.state.production
+    return inference.predict_windows(production.model, production.scaler, windows)
+
+def predict_windows_cached(windows, state=None):
+    """
+    พยากรณ์หลาย window โดยใช้ผลจาก cache ก่อน แล้วรัน model เฉพาะ window ที่ยังไม่มีใน cache
+    ถ้ามี shadow model จะส่ง windows ชุดเดียวกันให้ shadow รันเบื้องหลัง (ไม่เพิ่ม latency)
+
+    Args:
+        windows: list ของข้อมูล 3 วัน
+        state: model_registry.state ที่ request ใช้ (None = state ปัจจุบัน)
+
+    Returns:
+        (numpy array ของค่าที่พยากรณ์, จำนวน window ที่ได้จาก cache)
+    """
+    state = state or model_registry.state
+    production = state.production
+    windows = inference.as_windows(windows)
+    key_prefix = (state.generation, production.version)
+    predictions, cache_hits = inference.predict_windows_cached(
+        production.model, production.scaler, windows, prediction_cache, key_prefix
+    )
+    if state.shadow is not None:
+        shadow_scorer.submit(state.shadow, production.version, windows, predictions)
+    return predictions, cache_hits
+
+def forecast_windows(windows, horizon, state=None):
+    """พยากรณ์ล่วงหน้าหลายวันแบบ recursive ด้วย model เดียวกันทุกวัน (ดู inference.forecast_windows)"""
+    state = state or model_registry.state
+    return inference.forecast_windows(
+        lambda current: predict_windows_cached(current, state), windows, horizon
+    )
+
+def parse_flag(value, name):
+    """
+    อ่านค่า true/false จาก JSON (bool หรือ string 'true'/'false'/'1'/'0')
+
+    Raises:
+        ValueError ถ้าค่าไม่ใช่ true/false
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', '1'):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ('false', '0'):
+        return False
+    raise ValueError(f'{name} must be true or false')
+
+def save_window_prediction(window, predicted_value, location='Nakhon Phanom', model_version=None):
+    """
+    บันทึกการพยากรณ์ของ 1 window ลง database (พยากรณ์สำหรับวันพรุ่งนี้)
+
+    Returns:
+        'queued' / 'spooled' (async) หรือ 'committed' / 'failed' (sync)
+    """
+    prediction = prediction_record(window, predicted_value, location, model_version=model_version)
+
+    if prediction_writer is not None:
+        return prediction_writer.submit(db.prediction_row(**prediction))
+
+    return 'committed' if db.save_prediction(**prediction) else 'failed'
+
+def save_window_predictions(records):
+    """
+    บันทึกการพยากรณ์หลายแถวในครั้งเดียว (async: ส่งเข้าคิวครั้งเดียว, sync: bulk write ครั้งเดียว)
+
+    Args:
+        records: list ของ dict จาก prediction_record
+
+    Returns:
+        จำนวนแถวตามผลลัพธ์ เช่น {'queued': 10} หรือ {'committed': 8, 'ignored': 1, 'failed': 1}
+        (ignored = มีการพยากรณ์ของวัน/สถานที่นั้นใน database อยู่แล้ว)
+    """
+    if prediction_writer is not None:
+        return prediction_writer.submit_many([db.prediction_row(**record) for record in records])
+
+    summary = db.save_predictions_bulk(records)
+    return {
+        key: summary[field]
+        for key, field in (('committed', 'succeeded'), ('ignored', 'ignored'), ('failed', 'failed'))
+        if summary[field]
+    }
+
 @app.route('/predict', methods=['POST'])
 def predict():
-    if model is None or scaler is None:
-        return jsonify({'error': 'Model not loaded'}), 500
+    if not model_ready():
+        return model_unavailable()
         
     try:
-        data = request.get_json()
-        # รับข้อมูล 3 วันล่าสุด [v1, v2, v3]
-        inputs = np.array(data['inputs']).reshape(-1, 1)
-        
-        # 2. ทำการ Pre-processing (เหมือนใน Colab)
-        input_scaled = scaler.transform(inputs)
-        X_input = np.reshape(input_scaled, (1, 3, 1))
-        
-        # 3. พยากรณ์
-        prediction_scaled = model.predict(X_input, verbose=0)
-        prediction_final = scaler.inverse_transform(prediction_scaled)
+        data = request.get_json(silent=True) or {}
+        location = request.args.get('location') or data.get('location')
+        input_dates = None
+
+        if 'inputs' in data:
+            # รับข้อมูล 3 วันล่าสุด [v1, v2, v3]
+            inputs = [float(v) for v in data['inputs']]
+        elif location and recent_readings is not None:
+            # ใช้ค่าจริงล่าสุดของสถานที่จาก memory
+            if not recent_readings.tracks(location):
+                return jsonify({
+                    'error': f'Unknown location: {location}',
+                    'locations': list(recent_readings.locations)
+                }), 404
+            window = recent_readings.window(location, inference.WINDOW_SIZE)
+            if window is None:
+                return jsonify({
+                    'error': f'Not enough recent readings for {location} (need {inference.WINDOW_SIZE} '
+                             f'consecutive days ending within {recent_readings.max_age_days} day(s) of today)'
+                }), 404
+            input_dates, inputs = window
+        else:
+            return jsonify({'error': 'Provide inputs or location'}), 400
         
-        predicted_value = float(prediction_final[0][0])
+        # Pre-processing + พยากรณ์ (เหมือนใน Colab) หรือใช้ผลจาก cache
+        state = model_registry.state
+        predictions, cache_hits = predict_windows_cached([inputs], state)
+        predicted_value = float(predictions[0])
+        model_version = state.production.version
         
-        # 4. บันทึกลง database (ถ้ามี)
+        # บันทึกลง database (ถ้ามี)
+        persistence = 'skipped'
         if DB_AVAILABLE:
             try:
-                today = date.today()
-                tomorrow = today + timedelta(days=1)
-                
-                input_dict = {
-                    "day1": float(inputs[0][0]),
-                    "day2": float(inputs[1][0]),
-                    "day3": float(inputs[2][0])
-                }
-                
-                db.save_prediction(
-                    prediction_date=today,
-                    target_date=tomorrow,
-                    predicted_value=predicted_value,
-                    input_values=input_dict,
-                    model_version=os.getenv('MODEL_VERSION', 'v1.0')
-                )
+                persistence = save_window_prediction(inputs, predicted_value, location or 'Nakhon Phanom',
+                                                     model_version)
             except Exception as e:
-                print(f"⚠️ Failed to save prediction to database: {e}")
+                persistence = 'failed'
+                logger.warning("⚠️ Failed to save prediction to database: %s", e)
         
-        return jsonify({
+        response = {
             'prediction': predicted_value,
             'unit': 'µg/m³',
             'status': 'success',
-            'saved_to_db': DB_AVAILABLE
+            'saved_to_db': DB_AVAILABLE,
+            'persistence': persistence,
+            'cached': cache_hits > 0,
+            'model_version': model_version
+        }
+        if input_dates is not None:
+            response.update(location=location, inputs=inputs, input_dates=input_dates)
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    พยากรณ์หลาย window ในการเรียกครั้งเดียว
+
+    Request:
+        {
+            "windows": [[22.4, 39.7, 25.0], [39.7, 25.0, 31.2]],
+            "locations": ["Nakhon Phanom", "Nakhon Phanom"],  (optional)
+            "save_to_db": false                                (optional, default true)
+        }
+    """
+    if not model_ready():
+        return model_unavailable()
+
+    try:
+        data = request.get_json()
+        windows = data['windows']
+        if not windows:
+            return jsonify({'error': 'windows must not be empty'}), 400
+        if len(windows) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many windows (max {MAX_BATCH_SIZE})'}), 400
+
+        locations = data.get('locations') or [data.get('location', 'Nakhon Phanom')] * len(windows)
+        if len(locations) != len(windows):
+            return jsonify({'error': 'locations must have the same length as windows'}), 400
+
+        state = model_registry.state
+        predictions, cache_hits = predict_windows_cached(windows, state)
+        model_version = state.production.version
+
+        # บันทึกทุกแถวในครั้งเดียว (ข้ามได้ด้วย save_to_db=false)
+        save_to_db = parse_flag(data.get('save_to_db', True), 'save_to_db') and DB_AVAILABLE
+        persistence = {}
+        if save_to_db:
+            records = [
+                prediction_record(window, float(predicted_value), location, model_version=model_version)
+                for window, predicted_value, location in zip(windows, predictions, locations)
+            ]
+            try:
+                persistence = save_window_predictions(records)
+            except Exception as e:
+                persistence = {'failed': len(records)}
+                logger.warning("⚠️ Failed to save predictions to database: %s", e)
+
+        return jsonify({
+            'predictions': [float(v) for v in predictions],
+            'count': len(predictions),
+            'unit': 'µg/m³',
+            'status': 'success',
+            'saved_to_db': save_to_db,
+            'persistence': persistence,
+            'cache_hits': cache_hits,
+            'model_version': model_version
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/forecast', methods=['POST'])
+def forecast():
+    """
+    พยากรณ์ล่วงหน้าหลายวัน (เช่น 7 วัน) สำหรับหลาย window ในการเรียกครั้งเดียว
+
+    Request:
+        POST /forecast?horizon=7
+        {
+            "windows": [[22.4, 39.7, 25.0]],                   (หรือ "inputs": [22.4, 39.7, 25.0])
+            "locations": ["Nakhon Phanom"],                    (optional)
+            "save_to_db": false                                (optional, default true)
+        }
+    """
+    if not model_ready():
+        return model_unavailable()
+
+    try:
+        horizon = request.args.get('horizon', 7, type=int)
+        if not 1 <= horizon <= MAX_FORECAST_HORIZON:
+            return jsonify({'error': f'horizon must be between 1 and {MAX_FORECAST_HORIZON}'}), 400
+
+        data = request.get_json()
+        windows = data.get('windows') or ([data['inputs']] if 'inputs' in data else [])
+        if not windows:
+            return jsonify({'error': 'windows must not be empty'}), 400
+        if len(windows) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many windows (max {MAX_BATCH_SIZE})'}), 400
+
+        locations = data.get('locations') or [data.get('location', 'Nakhon Phanom')] * len(windows)
+        if len(locations) != len(windows):
+            return jsonify({'error': 'locations must have the same length as windows'}), 400
+
+        state = model_registry.state
+        forecasts, inputs, cache_hits = forecast_windows(windows, horizon, state)
+        model_version = state.production.version
+
+        today = date.today()
+        target_dates = [(today + timedelta(days=step + 1)).isoformat() for step in range(horizon)]
+
+        # บันทึกทุกวันของทุก window ในครั้งเดียว (ผ่าน background writer เมื่อ PREDICTION_WRITE_MODE=async)
+        save_to_db = parse_flag(data.get('save_to_db', True), 'save_to_db') and DB_AVAILABLE
+        persistence = {}
+        if save_to_db:
+            records = [
+                prediction_record(inputs[step, i], forecasts[i, step], locations[i], step + 1, model_version)
+                for i in range(len(windows))
+                for step in range(horizon)
+            ]
+            try:
+                persistence = save_window_predictions(records)
+            except Exception as e:
+                persistence = {'failed': len(records)}
+                logger.warning("⚠️ Failed to save forecasts to database: %s", e)
+
+        return jsonify({
+            'horizon': horizon,
+            'target_dates': target_dates,
+            'forecasts': [
+                {
+                    'location': location,
+                    'inputs': [float(v) for v in window],
+                    'predictions': [float(v) for v in values]
+                }
+                for window, location, values in zip(windows, locations, forecasts)
+            ],
+            'count': len(windows),
+            'unit': 'µg/m³',
+            'status': 'success',
+            'saved_to_db': save_to_db,
+            'persistence': persistence,
+            'cache_hits': cache_hits,
+            'model_version': model_version
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+def page_args():
+    """
+    อ่าน query parameters ของการแบ่งหน้า: limit, location, from, to (YYYY-MM-DD) และ cursor
+
+    Raises:
+        ValueError ถ้า parameter ไม่ถูกต้อง
+    """
+    limit = request.args.get('limit', 10, type=int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    return dict(
+        limit=limit,
+        location=request.args.get('location', 'Nakhon Phanom'),
+        date_from=date.fromisoformat(date_from) if date_from else None,
+        date_to=date.fromisoformat(date_to) if date_to else None,
+        cursor=request.args.get('cursor') or None
+    )
+
 @app.route('/api/predictions', methods=['GET'])
 def get_predictions():
-    """ดึงข้อมูลการพยากรณ์ล่าสุด"""
+    """ดึงข้อมูลการพยากรณ์ (ใหม่ไปเก่า) กรองตามช่วง target_date และแบ่งหน้าด้วย cursor"""
     if not DB_AVAILABLE:
         return jsonify({'error': 'Database not available'}), 503
     
     try:
-        limit = request.args.get('limit', 10, type=int)
-        location = request.args.get('location', 'Nakhon Phanom')
-        
-        predictions = db.get_predictions(limit=limit, location=location)
-        return jsonify({
-            'data': predictions,
-            'count': len(predictions)
-        })
+        args = page_args()
+        predictions = db.get_predictions(**args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    return conditional_json({
+        'data': predictions,
+        'count': len(predictions),
+        'next_cursor': next_cursor(predictions, args['limit'], 'target_date')
+    }, last_modified=rows_last_modified(predictions))
+
 @app.route('/api/readings', methods=['GET'])
 def get_readings():
-    """ดึงข้อมูลค่าจริง"""
+    """ดึงข้อมูลค่าจริง (ใหม่ไปเก่า) กรองตามช่วง reading_date และแบ่งหน้าด้วย cursor"""
     if not DB_AVAILABLE:
         return jsonify({'error': 'Database not available'}), 503
     
     try:
-        limit = request.args.get('limit', 10, type=int)
-        location = request.args.get('location', 'Nakhon Phanom')
-        
-        readings = db.get_actual_readings(limit=limit, location=location)
-        return jsonify({
-            'data': readings,
-            'count': len(readings)
-        })
+        args = page_args()
+        readings = db.get_actual_readings(**args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    return conditional_json({
+        'data': readings,
+        'count': len(readings),
+        'next_cursor': next_cursor(readings, args['limit'], 'reading_date')
+    }, last_modified=rows_last_modified(readings))
+
+@app.route('/api/export/<dataset>', methods=['GET'])
+def export_dataset(dataset):
+    """
+    Export ข้อมูลทั้งหมดแบบ stream (NDJSON หรือ CSV)
+    dataset: predictions หรือ readings
+    query: format=ndjson|csv, location (ไม่ระบุ = ทุกสถานที่), from, to (YYYY-MM-DD)
+    """
+    if not DB_AVAILABLE:
+        return jsonify({'error': 'Database not available'}), 503
+
+    readers = {'predictions': db.iter_predictions, 'readings': db.iter_actual_readings}
+    if dataset not in readers:
+        return jsonify({'error': f'dataset must be one of {sorted(readers)}'}), 404
+
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in export.FORMATS:
+        return jsonify({'error': f'format must be one of {sorted(export.FORMATS)}'}), 400
+
+    try:
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        rows = readers[dataset](
+            location=request.args.get('location') or None,
+            date_from=date.fromisoformat(date_from) if date_from else None,
+            date_to=date.fromisoformat(date_to) if date_to else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        try:
+            yield from export.export_chunks(rows, fmt)
+        except Exception:
+            # ส่ง header ไปแล้ว เปลี่ยน status ไม่ได้ client จะได้ไฟล์ที่ไม่ครบ
+            logger.exception("❌ Export of %s failed mid-stream", dataset)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=export.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename=pm25_{dataset}.{fmt}'}
+    )
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """ดึงสถิติความแม่นยำ"""
@@ -216,10 +893,55 @@ def get_stats():
         location = request.args.get('location', 'Nakhon Phanom')
         
         stats = db.get_accuracy_stats(days=days, location=location)
-        return jsonify(stats)
+        return conditional_json(stats)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/aqi/bands', methods=['GET'])
+def aqi_bands():
+    """ตารางระดับ AQI ของ PM2.5"""
+    return conditional_json({
+        'bands': [
+            {'band': i, 'upper_bound': upper, 'level': level, 'color': color}
+            for i, (upper, level, color) in enumerate(aqi.AQI_BANDS)
+        ]
+    })
+
+@app.route('/api/aqi/classify', methods=['POST'])
+def classify_aqi():
+    """
+    จำแนกระดับ AQI ของค่า PM2.5 หลายค่าในครั้งเดียว (vectorized)
+    body: {"values": [12.0, 40.5, ...], "compact": false}
+    compact=true คืนเฉพาะ index ของระดับ (ดู /api/aqi/bands) แทน level/color ของทุกค่า
+    """
+    try:
+        data = request.get_json()
+        values = data.get('values')
+        if not isinstance(values, list) or not values:
+            return jsonify({'error': 'values must be a non-empty list'}), 400
+        if len(values) > MAX_CLASSIFY_SIZE:
+            return jsonify({'error': f'Too many values (max {MAX_CLASSIFY_SIZE})'}), 400
+
+        values = np.asarray(values, dtype=float)
+        if values.ndim != 1 or not np.isfinite(values).all():
+            return jsonify({'error': 'values must be finite numbers'}), 400
+
+        index = aqi.band_index(values)
+        counts = np.bincount(index, minlength=len(aqi.AQI_BANDS))
+        result = {
+            'count': len(values),
+            'counts': {level: int(n) for (_, level, _), n in zip(aqi.AQI_BANDS, counts)},
+        }
+        if data.get('compact'):
+            result['bands'] = index.tolist()
+        else:
+            result['levels'] = aqi.AQI_LEVELS[index].tolist()
+            result['colors'] = aqi.AQI_COLORS[index].tolist()
+        return jsonify(result)
+
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/save-reading', methods=['POST'])
 def save_reading():
     """บันทึกค่าจริง (สำหรับ cron job หรือ manual update)"""
@@ -248,6 +970,9 @@ def save_reading():
             raw_data=data.get('raw_data')
         )
         
+        if result and recent_readings is not None:
+            recent_readings.add(data.get('location', 'Nakhon Phanom'), reading_date, pm25_value)
+        
         # อัปเดตค่าจริงในตาราง predictions
         db.update_actual_value(
             target_date=reading_date,
@@ -0,0 +1,784 @@
+"""
+SQLite Database Module
+Storage backend ในเครื่องที่มี method เหมือน SupabaseDB (ตารางเดียวกับ database/schema.sql)
+ใช้เมื่อ DB_BACKEND=sqlite สำหรับ deploy แบบ local/edge หรือทดสอบประสิทธิภาพแบบ offline
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from typing import Optional, List, Dict, Any, Tuple
+
+from backend.database import AccuracyAccumulator, BaseDB, decode_cursor
+from backend.metrics import timed_db_call, db_failure
+
+logger = logging.getLogger(__name__)
+
+# คอลัมน์ที่เก็บเป็น JSON text
+JSON_COLUMNS = {'input_values', 'raw_data', 'architecture', 'metadata'}
+# คอลัมน์ที่เก็บเป็น 0/1
+BOOL_COLUMNS = {'is_accurate', 'is_active', 'is_production', 'is_shadow', 'notification_sent'}
+
+_NOW = "(strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))"
+_UUID = "(lower(hex(randomblob(16))))"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS pm25_predictions (
+    id TEXT PRIMARY KEY DEFAULT {_UUID},
+    created_at TEXT DEFAULT {_NOW},
+    updated_at TEXT DEFAULT {_NOW},
+    prediction_date TEXT NOT NULL,
+    target_date TEXT NOT NULL,
+    days_ahead INTEGER NOT NULL DEFAULT 1,
+    predicted_value REAL NOT NULL CHECK (predicted_value >= 0),
+    actual_value REAL CHECK (actual_value IS NULL OR actual_value >= 0),
+    input_values TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    location TEXT DEFAULT 'Nakhon Phanom',
+    data_source TEXT DEFAULT 'LSTM Model',
+    confidence_score REAL,
+    notes TEXT,
+    UNIQUE (prediction_date, target_date, location)
+);
+
+CREATE INDEX IF NOT EXISTS idx_predictions_location_target
+    ON pm25_predictions(location, target_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON pm25_predictions(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_predictions_pending_actual
+    ON pm25_predictions(target_date) WHERE actual_value IS NULL;
+
+CREATE TABLE IF NOT EXISTS pm25_actual_readings (
+    id TEXT PRIMARY KEY DEFAULT {_UUID},
+    created_at TEXT DEFAULT {_NOW},
+    updated_at TEXT DEFAULT {_NOW},
+    reading_date TEXT NOT NULL,
+    reading_time TEXT,
+    pm25_value REAL NOT NULL CHECK (pm25_value >= 0),
+    aqi_level TEXT,
+    aqi_color TEXT,
+    temperature REAL,
+    humidity REAL,
+    wind_speed REAL,
+    wind_direction TEXT,
+    pressure REAL,
+    location TEXT DEFAULT 'Nakhon Phanom',
+    data_source TEXT DEFAULT 'WAQI API',
+    station_id TEXT,
+    raw_data TEXT,
+    notes TEXT,
+    UNIQUE (reading_date, location)
+);
+
+CREATE INDEX IF NOT EXISTS idx_actual_location_date
+    ON pm25_actual_readings(location, reading_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_actual_created_at ON pm25_actual_readings(created_at DESC);
+
+CREATE TABLE IF NOT EXISTS prediction_accuracy_log (
+    id TEXT PRIMARY KEY DEFAULT {_UUID},
+    prediction_id TEXT REFERENCES pm25_predictions(id) ON DELETE CASCADE,
+    calculated_at TEXT DEFAULT {_NOW},
+    error_value REAL NOT NULL,
+    error_percentage REAL,
+    squared_error REAL,
+    mae REAL,
+    rmse REAL,
+    mape REAL,
+    is_accurate INTEGER,
+    accuracy_threshold REAL DEFAULT 10.0,
+    notes TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_accuracy_prediction_id ON prediction_accuracy_log(prediction_id);
+CREATE INDEX IF NOT EXISTS idx_accuracy_calculated_at ON prediction_accuracy_log(calculated_at DESC);
+
+CREATE TABLE IF NOT EXISTS daily_accuracy_rollup (
+    location TEXT NOT NULL,
+    stat_date TEXT NOT NULL,
+    total_predictions INTEGER NOT NULL DEFAULT 0,
+    accurate_count INTEGER NOT NULL DEFAULT 0,
+    error_sum REAL NOT NULL DEFAULT 0,
+    squared_error_sum REAL NOT NULL DEFAULT 0,
+    error_percentage_sum REAL NOT NULL DEFAULT 0,
+    error_percentage_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT {_NOW},
+    PRIMARY KEY (location, stat_date)
+);
+
+CREATE TABLE IF NOT EXISTS model_versions (
+    id TEXT PRIMARY KEY DEFAULT {_UUID},
+    created_at TEXT DEFAULT {_NOW},
+    version TEXT UNIQUE NOT NULL,
+    model_name TEXT NOT NULL,
+    model_type TEXT DEFAULT 'LSTM',
+    training_mae REAL,
+    training_rmse REAL,
+    validation_mae REAL,
+    validation_rmse REAL,
+    architecture TEXT,
+    training_data_size INTEGER,
+    training_date TEXT,
+    model_path TEXT,
+    scaler_path TEXT,
+    is_active INTEGER DEFAULT 0,
+    is_production INTEGER DEFAULT 0,
+    is_shadow INTEGER DEFAULT 0,
+    description TEXT,
+    notes TEXT
+);
+
+CREATE TABLE IF NOT EXISTS alert_logs (
+    id TEXT PRIMARY KEY DEFAULT {_UUID},
+    created_at TEXT DEFAULT {_NOW},
+    alert_type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    title TEXT NOT NULL,
+    message TEXT NOT NULL,
+    pm25_value REAL,
+    threshold_value REAL,
+    notification_sent INTEGER DEFAULT 0,
+    notification_channel TEXT,
+    notification_status TEXT,
+    prediction_id TEXT REFERENCES pm25_predictions(id),
+    location TEXT DEFAULT 'Nakhon Phanom',
+    metadata TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_alert_created_at ON alert_logs(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_alert_type ON alert_logs(alert_type);
+
+CREATE TRIGGER IF NOT EXISTS update_pm25_predictions_updated_at
+    AFTER UPDATE ON pm25_predictions
+    FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE pm25_predictions SET updated_at = {_NOW} WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_pm25_actual_readings_updated_at
+    AFTER UPDATE ON pm25_actual_readings
+    FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE pm25_actual_readings SET updated_at = {_NOW} WHERE id = NEW.id;
+END;
+
+-- เหมือน trigger_calculate_accuracy ใน schema.sql (นับเฉพาะการพยากรณ์ล่วงหน้า 1 วัน)
+DROP TRIGGER IF EXISTS trigger_calculate_accuracy;
+CREATE TRIGGER trigger_calculate_accuracy
+    AFTER UPDATE OF actual_value ON pm25_predictions
+    FOR EACH ROW WHEN NEW.actual_value IS NOT NULL AND OLD.actual_value IS NULL AND NEW.days_ahead = 1
+BEGIN
+    INSERT INTO prediction_accuracy_log (
+        prediction_id, error_value, error_percentage, squared_error, is_accurate
+    ) VALUES (
+        NEW.id,
+        ABS(NEW.predicted_value - NEW.actual_value),
+        ABS(NEW.predicted_value - NEW.actual_value) * 100.0 / NULLIF(NEW.actual_value, 0),
+        (NEW.predicted_value - NEW.actual_value) * (NEW.predicted_value - NEW.actual_value),
+        ABS(NEW.predicted_value - NEW.actual_value) < 10.0
+    );
+    INSERT INTO daily_accuracy_rollup (
+        location, stat_date, total_predictions, accurate_count, error_sum,
+        squared_error_sum, error_percentage_sum, error_percentage_count
+    ) VALUES (
+        NEW.location,
+        NEW.target_date,
+        1,
+        ABS(NEW.predicted_value - NEW.actual_value) < 10.0,
+        ABS(NEW.predicted_value - NEW.actual_value),
+        (NEW.predicted_value - NEW.actual_value) * (NEW.predicted_value - NEW.actual_value),
+        COALESCE(ABS(NEW.predicted_value - NEW.actual_value) * 100.0 / NULLIF(NEW.actual_value, 0), 0),
+        NEW.actual_value != 0
+    )
+    ON CONFLICT (location, stat_date) DO UPDATE SET
+        total_predictions = total_predictions + excluded.total_predictions,
+        accurate_count = accurate_count + excluded.accurate_count,
+        error_sum = error_sum + excluded.error_sum,
+        squared_error_sum = squared_error_sum + excluded.squared_error_sum,
+        error_percentage_sum = error_percentage_sum + excluded.error_percentage_sum,
+        error_percentage_count = error_percentage_count + excluded.error_percentage_count,
+        updated_at = {_NOW};
+END;
+
+INSERT OR IGNORE INTO model_versions (version, model_name, is_active, is_production, description)
+VALUES ('v1.0', 'LSTM PM2.5 Forecaster', 1, 1, 'Initial production model');
+"""
+
+
+# เติม rollup จากข้อมูลเดิม (ทำเมื่อ rollup ยังว่าง หลัง _migrate เพิ่ม days_ahead แล้ว)
+# ใช้เงื่อนไขเดียวกับ trigger: เฉพาะการพยากรณ์ล่วงหน้า 1 วัน
+ROLLUP_BACKFILL = """
+INSERT INTO daily_accuracy_rollup (
+    location, stat_date, total_predictions, accurate_count, error_sum,
+    squared_error_sum, error_percentage_sum, error_percentage_count
+)
+SELECT
+    p.location,
+    p.target_date,
+    COUNT(*),
+    SUM(a.is_accurate = 1),
+    SUM(a.error_value),
+    SUM(COALESCE(a.squared_error, a.error_value * a.error_value)),
+    COALESCE(SUM(a.error_percentage), 0),
+    COUNT(a.error_percentage)
+FROM prediction_accuracy_log a
+JOIN pm25_predictions p ON p.id = a.prediction_id
+WHERE p.days_ahead = 1
+  AND NOT EXISTS (SELECT 1 FROM daily_accuracy_rollup)
+GROUP BY p.location, p.target_date;
+"""
+
+# คอลัมน์ที่เพิ่มภายหลัง (ดู SQLiteDB._migrate)
+MODEL_VERSION_COLUMNS = {
+    'model_path': 'TEXT',
+    'scaler_path': 'TEXT',
+    'is_shadow': 'INTEGER DEFAULT 0',
+}
+PREDICTION_COLUMNS = {
+    'days_ahead': 'INTEGER NOT NULL DEFAULT 1',
+}
+
+
+def _encode(column: str, value: Any) -> Any:
+    if value is not None and column in JSON_COLUMNS:
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _decode_row(row: sqlite3.Row) -> Dict[str, Any]:
+    data = dict(row)
+    for column in JSON_COLUMNS.intersection(data):
+        if data[column] is not None:
+            data[column] = json.loads(data[column])
+    for column in BOOL_COLUMNS.intersection(data):
+        if data[column] is not None:
+            data[column] = bool(data[column])
+    return data
+
+
+class SQLiteDB(BaseDB):
+    """Class สำหรับจัดการ SQLite database (method เหมือน SupabaseDB)"""
+
+    def __init__(self, path: str = 'pm25.db'):
+        """
+        Args:
+            path: path ของไฟล์ SQLite (':memory:' สำหรับทดสอบ)
+        """
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._pid = os.getpid()
+        # :memory: แยก database ตาม connection จึงต้องใช้ connection เดียวร่วมกัน
+        self._shared_conn = self._connect() if path == ':memory:' else None
+        self._shared_lock = threading.RLock()
+
+        with self._shared_lock:
+            self._conn().executescript(SCHEMA)
+            self._migrate(self._conn())
+            self._conn().executescript(ROLLUP_BACKFILL)
+        logger.info("✅ Connected to SQLite: %s", self.path)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """เพิ่มคอลัมน์ที่ไม่มีในไฟล์ database ที่สร้างจาก schema รุ่นก่อน"""
+        for table, table_columns in (('model_versions', MODEL_VERSION_COLUMNS),
+                                     ('pm25_predictions', PREDICTION_COLUMNS)):
+            columns = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            for column, definition in table_columns.items():
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+                    if column == 'days_ahead':
+                        conn.execute(
+                            'UPDATE pm25_predictions '
+                            'SET days_ahead = CAST(julianday(target_date) - julianday(prediction_date) AS INTEGER)'
+                        )
+                        # rollup เดิมรวมทุก horizon: ล้างให้ ROLLUP_BACKFILL สร้างใหม่เฉพาะ days_ahead = 1
+                        conn.execute('DELETE FROM daily_accuracy_rollup')
+
+    # ==========================================
+    # Connection
+    # ==========================================
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if self.path != ':memory:':
+            conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connection ของ thread ปัจจุบัน (WAL ให้หลาย connection อ่านพร้อมกันได้)"""
+        if self._shared_conn is not None:
+            return self._shared_conn
+        if self._pid != os.getpid():
+            # connection ที่เปิดก่อน fork (gunicorn preload) ห้ามใช้ใน process ลูก
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction แบบ BEGIN IMMEDIATE (commit เมื่อสำเร็จ, rollback เมื่อเกิด error)"""
+        with self._shared_lock if self._shared_conn is not None else nullcontext():
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        if self._shared_conn is not None:
+            with self._shared_lock:
+                rows = self._shared_conn.execute(sql, params).fetchall()
+        else:
+            rows = self._conn().execute(sql, params).fetchall()
+        return [_decode_row(r) for r in rows]
+
+    # ==========================================
+    # PM2.5 Predictions
+    # ==========================================
+
+    @timed_db_call
+    def save_prediction(
+        self,
+        prediction_date: date,
+        target_date: date,
+        predicted_value: float,
+        input_values: Dict[str, float],
+        model_version: str = "v1.0",
+        location: str = "Nakhon Phanom",
+        confidence_score: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """บันทึกการพยากรณ์ PM2.5 (เหมือน SupabaseDB.save_prediction)"""
+        try:
+            data = self.prediction_row(
+                prediction_date=prediction_date,
+                target_date=target_date,
+                predicted_value=predicted_value,
+                input_values=input_values,
+                model_version=model_version,
+                location=location,
+                confidence_score=confidence_score
+            )
+
+            with self._transaction() as conn:
+                row_id = self._insert(conn, 'pm25_predictions', data)
+            self._invalidate_reads('get_predictions', location=location)
+            logger.debug("✅ Saved prediction: %s for %s", predicted_value, target_date)
+            return self._get_by_id('pm25_predictions', row_id)
+
+        except Exception as e:
+            db_failure(self, 'save_prediction')
+            logger.error("❌ Error saving prediction: %s", e,
+                         extra={'location': location, 'target_date': target_date})
+            return {}
+
+    @timed_db_call
+    def get_predictions(
+        self,
+        limit: int = 10,
+        location: str = "Nakhon Phanom",
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        cursor: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """ดึงข้อมูลการพยากรณ์ (เหมือน SupabaseDB.get_predictions)"""
+        after = decode_cursor(cursor) if cursor else None
+        try:
+            return self._cached_read(
+                ('get_predictions', location, limit, date_from, date_to, after),
+                lambda: self._page_query(
+                    'pm25_predictions', 'target_date', limit, location, date_from, date_to, after
+                )
+            )
+
+        except Exception as e:
+            db_failure(self, 'get_predictions')
+            logger.error("❌ Error getting predictions: %s", e)
+            return []
+
+    @timed_db_call
+    def update_actual_value(
+        self,
+        target_date: date,
+        actual_value: float,
+        location: str = "Nakhon Phanom"
+    ) -> bool:
+        """อัปเดตค่าจริงของการพยากรณ์ (trigger จะบันทึก accuracy log)"""
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    'UPDATE pm25_predictions SET actual_value = ? '
+                    'WHERE target_date = ? AND location = ?',
+                    (actual_value, str(target_date), location)
+                )
+
+            self._invalidate_reads('get_predictions', 'get_accuracy_stats', location=location)
+            logger.debug("✅ Updated actual value: %s for %s", actual_value, target_date)
+            return True
+
+        except Exception as e:
+            db_failure(self, 'update_actual_value')
+            logger.error("❌ Error updating actual value: %s", e,
+                         extra={'location': location, 'target_date': target_date})
+            return False
+
+    # ==========================================
+    # PM2.5 Actual Readings
+    # ==========================================
+
+    @timed_db_call
+    def save_actual_reading(
+        self,
+        reading_date: date,
+        pm25_value: float,
+        aqi_level: str,
+        aqi_color: str,
+        location: str = "Nakhon Phanom",
+        temperature: Optional[float] = None,
+        humidity: Optional[float] = None,
+        wind_speed: Optional[float] = None,
+        data_source: str = "WAQI API",
+        raw_data: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """บันทึกค่า PM2.5 จริง (upsert ตาม reading_date + location)"""
+        try:
+            data = self.reading_row(
+                reading_date=reading_date,
+                pm25_value=pm25_value,
+                aqi_level=aqi_level,
+                aqi_color=aqi_color,
+                location=location,
+                temperature=temperature,
+                humidity=humidity,
+                wind_speed=wind_speed,
+                data_source=data_source,
+                raw_data=raw_data
+            )
+
+            self._write_chunk('pm25_actual_readings', [data], on_conflict='reading_date,location')
+            self._invalidate_reads('get_actual_readings', location=location)
+            logger.debug("✅ Saved actual reading: %s for %s", pm25_value, reading_date)
+            rows = self._query(
+                'SELECT * FROM pm25_actual_readings WHERE reading_date = ? AND location = ?',
+                (str(reading_date), location)
+            )
+            return rows[0] if rows else {}
+
+        except Exception as e:
+            db_failure(self, 'save_actual_reading')
+            logger.error("❌ Error saving actual reading: %s", e,
+                         extra={'location': location, 'reading_date': reading_date})
+            return {}
+
+    @timed_db_call
+    def get_actual_readings(
+        self,
+        limit: int = 10,
+        location: str = "Nakhon Phanom",
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        cursor: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """ดึงข้อมูลค่าจริง (เหมือน SupabaseDB.get_actual_readings)"""
+        after = decode_cursor(cursor) if cursor else None
+        try:
+            return self._cached_read(
+                ('get_actual_readings', location, limit, date_from, date_to, after),
+                lambda: self._page_query(
+                    'pm25_actual_readings', 'reading_date', limit, location, date_from, date_to, after
+                )
+            )
+
+        except Exception as e:
+            db_failure(self, 'get_actual_readings')
+            logger.error("❌ Error getting actual readings: %s", e)
+            return []
+
+    def _page_query(
+        self,
+        table: str,
+        date_column: str,
+        limit: int,
+        location: Optional[str],
+        date_from: Optional[date],
+        date_to: Optional[date],
+        after: Optional[Tuple[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """ดึง 1 หน้าแบบ keyset (เหมือน SupabaseDB._page_query)"""
+        where, params = ['1 = 1'], []
+        if location:
+            where.append('location = ?')
+            params.append(location)
+        if date_from:
+            where.append(f'{date_column} >= ?')
+            params.append(date_from.isoformat())
+        if date_to:
+            where.append(f'{date_column} <= ?')
+            params.append(date_to.isoformat())
+        if after:
+            where.append(f'({date_column}, id) < (?, ?)')
+            params.extend(after)
+        return self._query(
+            f'SELECT * FROM {table} WHERE {" AND ".join(where)} '
+            f'ORDER BY {date_column} DESC, id DESC LIMIT ?',
+            tuple(params) + (limit,)
+        )
+
+    # ==========================================
+    # Accuracy & Analytics
+    # ==========================================
+
+    @timed_db_call
+    def _load_accuracy_stats(
+        self,
+        days: int,
+        location: str
+    ) -> Dict[str, Any]:
+        """
+        รวมสถิติความแม่นยำจาก daily_accuracy_rollup (ไม่เกิน days แถว)
+
+        Raises:
+            sqlite3.Error เมื่อ query ไม่สำเร็จ (get_accuracy_stats จะไม่ cache ผลนี้)
+        """
+        since = str(date.today() - timedelta(days=days))
+        stats = AccuracyAccumulator()
+        for row in self._query(
+            'SELECT * FROM daily_accuracy_rollup WHERE location = ? AND stat_date >= ?',
+            (location, since)
+        ):
+            stats.add_daily(row)
+        return stats.result()
+
+    @timed_db_call
+    def get_recent_predictions_with_actual(
+        self,
+        days: int = 7,
+        location: str = "Nakhon Phanom"
+    ) -> List[Dict[str, Any]]:
+        """ดึงข้อมูลพยากรณ์พร้อมค่าจริง (เหมือน view v_predictions_with_actual)"""
+        try:
+            return self._query(
+                """
+                SELECT
+                    p.id, p.prediction_date, p.target_date, p.predicted_value,
+                    p.actual_value, p.model_version, p.location,
+                    a.error_value, a.error_percentage, a.is_accurate,
+                    CASE
+                        WHEN p.actual_value IS NULL THEN 'pending'
+                        WHEN a.is_accurate THEN 'accurate'
+                        ELSE 'inaccurate'
+                    END AS status
+                FROM pm25_predictions p
+                LEFT JOIN prediction_accuracy_log a ON p.id = a.prediction_id
+                WHERE p.location = ?
+                ORDER BY p.target_date DESC
+                LIMIT ?
+                """,
+                (location, days)
+            )
+
+        except Exception as e:
+            db_failure(self, 'get_recent_predictions_with_actual')
+            logger.error("❌ Error getting predictions with actual: %s", e)
+            return []
+
+    # ==========================================
+    # Model Versions
+    # ==========================================
+
+    @timed_db_call
+    def get_model_versions(self, active_only: bool = True) -> List[Dict[str, Any]]:
+        """ดึงรายการ model (เหมือน SupabaseDB.get_model_versions)"""
+        try:
+            where = 'WHERE is_active OR is_production OR is_shadow' if active_only else ''
+            return self._query(f'SELECT * FROM model_versions {where} ORDER BY version')
+
+        except Exception as e:
+            db_failure(self, 'get_model_versions')
+            logger.error("❌ Error getting model versions: %s", e)
+            return []
+
+    @timed_db_call
+    def set_production_model(self, version: str) -> bool:
+        """ตั้ง production model ใน UPDATE เดียว (เหมือน function set_production_model ใน schema.sql)"""
+        return self._set_model_flag(
+            """
+            UPDATE model_versions
+            SET is_production = (version = :version),
+                is_active = (is_active OR version = :version),
+                is_shadow = (is_shadow AND version <> :version)
+            WHERE is_production OR version = :version
+            """,
+            version
+        )
+
+    @timed_db_call
+    def set_shadow_model(self, version: Optional[str]) -> bool:
+        """ตั้ง shadow model (None = ยกเลิก shadow)"""
+        return self._set_model_flag(
+            """
+            UPDATE model_versions
+            SET is_shadow = COALESCE(version = :version, 0),
+                is_active = (is_active OR COALESCE(version = :version, 0))
+            WHERE is_shadow OR version = :version
+            """,
+            version
+        )
+
+    @timed_db_call
+    def set_model_active(self, version: str, active: bool) -> bool:
+        """โหลดหรือเลิกโหลด model ใน memory ของทุก worker"""
+        try:
+            with self._transaction() as conn:
+                conn.execute('UPDATE model_versions SET is_active = ? WHERE version = ?', (int(active), version))
+            return True
+
+        except Exception as e:
+            db_failure(self, 'set_model_active')
+            logger.error("❌ Error updating model versions: %s", e, extra={'version': version})
+            return False
+
+    def _set_model_flag(self, sql: str, version: Optional[str]) -> bool:
+        try:
+            with self._transaction() as conn:
+                if version is not None and conn.execute(
+                    'SELECT 1 FROM model_versions WHERE version = ?', (version,)
+                ).fetchone() is None:
+                    return False
+                conn.execute(sql, {'version': version})
+            return True
+
+        except Exception as e:
+            db_failure(self, 'set_model_flag')
+            logger.error("❌ Error updating model versions: %s", e, extra={'version': version})
+            return False
+
+    # ==========================================
+    # Alert Logs
+    # ==========================================
+
+    @timed_db_call
+    def save_alert(
+        self,
+        alert_type: str,
+        severity: str,
+        title: str,
+        message: str,
+        pm25_value: Optional[float] = None,
+        threshold_value: Optional[float] = None,
+        location: str = "Nakhon Phanom"
+    ) -> Dict[str, Any]:
+        """บันทึก alert log (เหมือน SupabaseDB.save_alert)"""
+        try:
+            data = self.alert_row(
+                alert_type=alert_type,
+                severity=severity,
+                title=title,
+                message=message,
+                pm25_value=pm25_value,
+                threshold_value=threshold_value,
+                location=location
+            )
+
+            with self._transaction() as conn:
+                row_id = self._insert(conn, 'alert_logs', data)
+            logger.debug("✅ Saved alert: %s", title)
+            return self._get_by_id('alert_logs', row_id)
+
+        except Exception as e:
+            db_failure(self, 'save_alert')
+            logger.error("❌ Error saving alert: %s", e,
+                         extra={'location': location, 'alert_type': alert_type})
+            return {}
+
+    # ==========================================
+    # Bulk Helpers
+    # ==========================================
+
+    def _insert(self, conn: sqlite3.Connection, table: str, data: Dict[str, Any]) -> str:
+        """Insert 1 แถว คืน id"""
+        columns = list(data)
+        row = conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)}) RETURNING id",
+            [_encode(c, data[c]) for c in columns]
+        ).fetchone()
+        return row['id']
+
+    def _get_by_id(self, table: str, row_id: str) -> Dict[str, Any]:
+        rows = self._query(f'SELECT * FROM {table} WHERE id = ?', (row_id,))
+        return rows[0] if rows else {}
+
+    @timed_db_call
+    def _write_chunk(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False
+    ) -> int:
+        """
+        เขียน 1 chunk ใน transaction เดียว (upsert ถ้ากำหนด on_conflict, ไม่งั้น insert)
+
+        Returns:
+            จำนวนแถวที่ insert/update จริง (แถวที่ถูกข้ามด้วย DO NOTHING ไม่นับ)
+
+        Raises:
+            Exception เมื่อเขียนไม่สำเร็จ (ทั้ง chunk จะถูก rollback)
+        """
+        # แถวที่มีคอลัมน์ชุดเดียวกันใช้ executemany ร่วมกันได้
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(row)
+
+        written = 0
+        with self._transaction() as conn:
+            for columns, group in groups.items():
+                sql = (
+                    f"INSERT INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})"
+                )
+                if on_conflict:
+                    keys = on_conflict.split(',')
+                    updates = [c for c in columns if c not in keys]
+                    if ignore_duplicates or not updates:
+                        sql += f" ON CONFLICT ({on_conflict}) DO NOTHING"
+                    else:
+                        sql += (
+                            f" ON CONFLICT ({on_conflict}) DO UPDATE SET "
+                            + ', '.join(f"{c} = excluded.{c}" for c in updates)
+                        )
+                written += conn.executemany(
+                    sql,
+                    [[_encode(c, row[c]) for c in columns] for row in group]
+                ).rowcount
+        return written
+
+    # ==========================================
+    # Utility Functions
+    # ==========================================
+
+    @timed_db_call
+    def test_connection(self) -> bool:
+        """ทดสอบการเชื่อมต่อ"""
+        try:
+            self._query('SELECT id FROM pm25_predictions LIMIT 1')
+            logger.info("✅ Database connection test: SUCCESS")
+            return True
+        except Exception as e:
+            logger.error("❌ Database connection test: FAILED - %s", e)
+            return False
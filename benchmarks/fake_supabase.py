@@ -0,0 +1,189 @@
+"""
+Fake Supabase Client
+Client จำลองแบบ in-memory ที่มี method chain เหมือน supabase-py (table/select/eq/.../execute)
+ใช้วัด overhead ของ SupabaseDB โดยไม่ต้องมี database จริง และจำลอง network latency ได้
+"""
+
+import threading
+import time
+import uuid
+from typing import Any, Dict, List
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """Query builder 1 ครั้ง (รองรับเฉพาะ filter ที่ SupabaseDB ใช้)"""
+
+    def __init__(self, client: 'FakeSupabaseClient', table: str):
+        self.client = client
+        self.table = table
+        self.action = 'select'
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.count = None
+        self.filters = []
+        self.order_by = []
+        self.limit_count = None
+
+    # ---- actions ----
+    def select(self, *columns, **kwargs):
+        self.action = 'select'
+        return self
+
+    def insert(self, data, count=None, **kwargs):
+        self.action, self.payload = 'insert', data
+        self.count = count
+        return self
+
+    def upsert(self, data, on_conflict=None, ignore_duplicates=False, count=None, **kwargs):
+        self.action, self.payload = 'upsert', data
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        self.count = count
+        return self
+
+    def update(self, data, **kwargs):
+        self.action, self.payload = 'update', data
+        return self
+
+    # ---- filters ----
+    def eq(self, column, value):
+        self.filters.append((column, lambda v: v == value))
+        return self
+
+    def neq(self, column, value):
+        self.filters.append((column, lambda v: v != value))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append((column, lambda v: v is not None and v >= value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append((column, lambda v: v is not None and v > value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append((column, lambda v: v is not None and v < value))
+        return self
+
+    def lte(self, column, value):
+        self.filters.append((column, lambda v: v is not None and v <= value))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def range(self, start, end):
+        self.limit_count = end + 1
+        return self
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        # filter บน embedded resource (เช่น 'pm25_predictions.location') ไม่ได้จำลอง
+        return all(test(row.get(column)) for column, test in self.filters if '.' not in column)
+
+    def execute(self) -> FakeResponse:
+        self.client.simulate_latency()
+        with self.client.lock:
+            rows = self.client.tables.setdefault(self.table, [])
+
+            if self.action in ('insert', 'upsert'):
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                index = self.client.conflict_index(self.table, self.on_conflict)
+                written = []
+                for item in payload:
+                    row = {'id': uuid.uuid4().hex, **item}
+                    if index is not None:
+                        key = tuple(row.get(k) for k in self.on_conflict.split(','))
+                        existing = index.get(key)
+                        if existing is not None:
+                            if not self.ignore_duplicates:
+                                existing.update(item)
+                                written.append(existing)
+                            continue
+                    rows.append(row)
+                    self.client.index_row(self.table, row)
+                    written.append(row)
+                return FakeResponse(written, len(written) if self.count else None)
+
+            matched = [r for r in rows if self._matches(r)]
+            if self.action == 'update':
+                for row in matched:
+                    row.update(self.payload)
+                return FakeResponse(matched)
+
+            # sort ตาม column รองก่อน (sort ของ Python เป็น stable)
+            for column, desc in reversed(self.order_by):
+                matched.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            if self.limit_count is not None:
+                matched = matched[:self.limit_count]
+            return FakeResponse([dict(r) for r in matched])
+
+
+class FakeRPC:
+    def __init__(self, client: 'FakeSupabaseClient', name: str, params: Dict[str, Any]):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> FakeResponse:
+        self.client.simulate_latency()
+        if not self.client.rpc_available:
+            raise RuntimeError(f"function {self.name} does not exist")
+        return FakeResponse([])
+
+
+class FakeSupabaseClient:
+    """Client จำลองที่เก็บข้อมูลใน memory และหน่วงเวลาทุก execute() ตาม latency"""
+
+    def __init__(self, latency: float = 0.0, rpc_available: bool = True):
+        """
+        Args:
+            latency: เวลาหน่วงต่อ request (วินาที) จำลอง round trip ไป Supabase
+            rpc_available: False เพื่อทดสอบ path ที่ RPC ใช้ไม่ได้ (fallback)
+        """
+        self.latency = latency
+        self.rpc_available = rpc_available
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        # (table, on_conflict) → {key: row} เพื่อให้ upsert ไม่ต้อง scan ทั้งตาราง
+        self.indexes: Dict[tuple, Dict[tuple, Dict[str, Any]]] = {}
+
+    def conflict_index(self, table: str, on_conflict: str):
+        """Index ของตารางตาม on_conflict (สร้างครั้งแรกที่ใช้) คืน None ถ้าไม่มี on_conflict"""
+        if not on_conflict:
+            return None
+        if (table, on_conflict) not in self.indexes:
+            keys = on_conflict.split(',')
+            self.indexes[(table, on_conflict)] = {
+                tuple(r.get(k) for k in keys): r for r in self.tables.get(table, [])
+            }
+        return self.indexes[(table, on_conflict)]
+
+    def index_row(self, table: str, row: Dict[str, Any]) -> None:
+        for (indexed_table, on_conflict), index in self.indexes.items():
+            if indexed_table == table:
+                index[tuple(row.get(k) for k in on_conflict.split(','))] = row
+
+    def simulate_latency(self) -> None:
+        self.requests += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> FakeRPC:
+        return FakeRPC(self, name, params)
@@ -0,0 +1,368 @@
+"""
+Benchmark Suite - วัดประสิทธิภาพของ prediction และ persistence path
+ผลลัพธ์เป็น JSON (p50/p95/p99, ops/s, peak RSS) เพื่อเทียบระหว่าง commit
+
+ตัวอย่าง:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --latency-ms 20 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# เพิ่ม path เพื่อ import backend modules
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.fake_supabase import FakeSupabaseClient
+
+# ค่าที่ใช้เปรียบเทียบกับ baseline
+COMPARE_METRIC = 'p50_ms'
+
+def measure(func, iterations, warmup=5, ops_per_call=1):
+    """
+    เรียก func ซ้ำแล้วคำนวณ latency
+
+    Args:
+        func: function ที่ไม่มี argument
+        iterations: จำนวนครั้งที่วัด
+        warmup: จำนวนครั้งที่เรียกก่อนเริ่มวัด
+        ops_per_call: จำนวน operation ต่อ 1 ครั้ง (เช่นขนาด batch) ใช้คำนวณ ops/s
+
+    Returns:
+        Dict ของ p50/p95/p99/mean (ms) และ ops/s
+    """
+    for _ in range(warmup):
+        func()
+
+    latencies = np.empty(iterations)
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        latencies[i] = time.perf_counter() - t0
+    total = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        'iterations': iterations,
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'mean_ms': round(float(latencies.mean() * 1000), 4),
+        'ops_per_sec': round(iterations * ops_per_call / total, 2),
+    }
+
+def peak_rss_mb():
+    """Peak RSS ของ process นี้ (MB)"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux คืนค่าเป็น KB, macOS เป็น bytes
+    return round(rss / 1024 / (1024 if sys.platform == 'darwin' else 1), 2)
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+def random_windows(rng, count):
+    return rng.uniform(3.0, 180.0, size=(count, 3)).round(1)
+
+# ==========================================
+# Benchmarks
+# ==========================================
+
+def bench_inference(results, rng, iterations, batch_sizes):
+    """แยกเวลา scaler transform กับ model forward pass"""
+    from backend import server
+
+    for batch in batch_sizes:
+        windows = random_windows(rng, batch)
+        scaled = server.scaler.transform(windows.reshape(-1, 1))
+        X = scaled.reshape(batch, 3, 1)
+        prediction_scaled = server.model.predict(X, batch_size=batch, verbose=0)
+
+        results[f'inference.scaler_transform[batch={batch}]'] = measure(
+            lambda: server.scaler.transform(windows.reshape(-1, 1)), iterations, ops_per_call=batch
+        )
+        results[f'inference.model_forward[batch={batch}]'] = measure(
+            lambda: server.model.predict(X, batch_size=batch, verbose=0), iterations, ops_per_call=batch
+        )
+        results[f'inference.inverse_transform[batch={batch}]'] = measure(
+            lambda: server.scaler.inverse_transform(prediction_scaled), iterations, ops_per_call=batch
+        )
+
+# วัด memory ของ 1 worker ใน process ใหม่: import + โหลด model + พยากรณ์ 1 ครั้ง แล้วพิมพ์ peak RSS (KB)
+# (Linux ใช้ VmHWM เพราะ ru_maxrss ของ process ที่ fork มานับ RSS ของ process แม่ด้วย)
+_WORKER_RSS_SCRIPT = """
+import resource, sys
+from backend import inference
+model = inference.load_model(inference.MODEL_PATH, sys.argv[1], sys.argv[2])
+scaler = inference.load_scaler(inference.SCALER_PATH)
+inference.predict_windows(model, scaler, [[22.4, 39.7, 25.0]])
+try:
+    with open('/proc/self/status') as f:
+        print(next(line.split()[1] for line in f if line.startswith('VmHWM:')))
+except (OSError, StopIteration):
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def worker_rss_mb(backend, precision):
+    """Peak RSS (MB) ของ process ที่โหลด model ด้วย backend/precision (None ถ้าโหลดไม่ได้ เช่นไม่มี TensorFlow)"""
+    result = subprocess.run(
+        [sys.executable, '-c', _WORKER_RSS_SCRIPT, backend, precision],
+        cwd=ROOT_DIR, capture_output=True, text=True,
+        env=dict(os.environ, PYTHONPATH=ROOT_DIR, TF_CPP_MIN_LOG_LEVEL='3')
+    )
+    if result.returncode != 0:
+        return None
+    return round(int(result.stdout.strip().splitlines()[-1]) / 1024, 2)
+
+def bench_precision(results, rng, iterations, batch_sizes):
+    """
+    เทียบ NumPy float16 กับ float32: ความต่างของผลพยากรณ์, ขนาด weights, latency
+    และ peak RSS ต่อ worker (วัดแยก process รวม Keras float32 เพื่อเทียบ backend)
+    """
+    from backend import aqi, inference
+
+    scaler = inference.load_scaler(inference.SCALER_PATH)
+    windows = random_windows(rng, 4096)
+    X = scaler.transform(windows.reshape(-1, 1)).reshape(len(windows), 3, 1)
+
+    reference = inference.load_numpy_model(inference.MODEL_PATH, 'float32')
+    expected = scaler.inverse_transform(reference.predict(X))[:, 0]
+    expected_bands = aqi.band_index(expected)
+
+    for precision in inference.PRECISIONS:
+        model = inference.load_numpy_model(inference.MODEL_PATH, precision)
+        actual = scaler.inverse_transform(model.predict(X))[:, 0]
+        diff = np.abs(actual - expected)
+        results[f'precision.accuracy[{precision}]'] = {
+            'windows': len(windows),
+            'max_abs_diff': round(float(diff.max()), 4),
+            'mean_abs_diff': round(float(diff.mean()), 4),
+            'aqi_band_changes': int(np.count_nonzero(aqi.band_index(actual) != expected_bands)),
+            'weight_bytes': model.weight_bytes,
+        }
+        for batch in batch_sizes:
+            results[f'precision.model_forward[{precision},batch={batch}]'] = measure(
+                lambda: model.predict(X[:batch]), iterations, ops_per_call=batch
+            )
+
+    for backend, precision in [('keras', 'float32')] + [('numpy', p) for p in inference.PRECISIONS]:
+        results[f'precision.worker_rss[{backend},{precision}]'] = {
+            'peak_rss_mb': worker_rss_mb(backend, precision)
+        }
+
+    print(f"\n{'precision':<10} {'max Δ µg/m³':>12} {'mean Δ':>10} {'AQI Δ':>7} {'weights':>10}")
+    for precision in inference.PRECISIONS:
+        r = results[f'precision.accuracy[{precision}]']
+        print(f"{precision:<10} {r['max_abs_diff']:>12.4f} {r['mean_abs_diff']:>10.4f} "
+              f"{r['aqi_band_changes']:>7} {r['weight_bytes'] / 1024:>8.1f}KB")
+    rss = {name: r['peak_rss_mb'] for name, r in results.items() if name.startswith('precision.worker_rss')}
+    for name, value in rss.items():
+        print(f"💾 {name}: {value if value is not None else 'n/a'} MB")
+
+def bench_http(results, rng, iterations, batch_sizes):
+    """Latency ของ /predict และ /predict/batch ผ่าน Flask test client"""
+    from backend import server
+
+    client = server.app.test_client()
+
+    # window ไม่ซ้ำกันทุกครั้ง จึงไม่โดน cache
+    windows = iter(random_windows(rng, iterations * 2 + 100).tolist())
+    results['http.predict[uncached]'] = measure(
+        lambda: client.post('/predict', json={'inputs': next(windows)}), iterations
+    )
+
+    window = random_windows(rng, 1)[0].tolist()
+    results['http.predict[cached]'] = measure(
+        lambda: client.post('/predict', json={'inputs': window}), iterations
+    )
+
+    for batch in batch_sizes:
+        batches = [random_windows(rng, batch).tolist() for _ in range(iterations + 5)]
+        payloads = iter(batches)
+        results[f'http.predict_batch[batch={batch}]'] = measure(
+            lambda: client.post('/predict/batch', json={'windows': next(payloads), 'save_to_db': False}),
+            iterations,
+            ops_per_call=batch
+        )
+
+    if server.prediction_writer is not None:
+        server.prediction_writer.flush()
+
+def bench_database(results, rng, iterations, latency):
+    """Overhead ของ method ใน SupabaseDB เทียบกับ fake client ที่หน่วงเวลาตาม latency"""
+    from backend.database import SupabaseDB
+
+    client = FakeSupabaseClient(latency=latency, rpc_available=False)
+    db = SupabaseDB(client=client)
+    today = date.today()
+    counter = iter(range(10 ** 9))
+
+    def save_prediction():
+        i = next(counter)
+        db.save_prediction(today, today + timedelta(days=i + 1), 25.0, {'day1': 1, 'day2': 2, 'day3': 3},
+                           location='bench')
+
+    results['db.save_prediction'] = measure(save_prediction, iterations)
+    results['db.get_predictions[uncached]'] = measure(
+        lambda: (db.read_cache.clear(), db.get_predictions(limit=10, location='bench')), iterations
+    )
+    results['db.get_predictions[cached]'] = measure(
+        lambda: db.get_predictions(limit=10, location='bench'), iterations
+    )
+
+    bulk_size = 500
+    def save_bulk():
+        start = next(counter) * bulk_size
+        db.save_predictions_bulk(
+            dict(prediction_date=today, target_date=today + timedelta(days=start + i),
+                 predicted_value=25.0, input_values={}, location='bulk')
+            for i in range(bulk_size)
+        )
+
+    results[f'db.save_predictions_bulk[rows={bulk_size}]'] = measure(
+        save_bulk, max(3, iterations // 20), warmup=1, ops_per_call=bulk_size
+    )
+
+    client.tables['prediction_accuracy_log'] = [
+        {'id': f'{i:08d}', 'error_value': float(i % 20), 'error_percentage': 5.0,
+         'squared_error': float((i % 20) ** 2), 'is_accurate': i % 20 < 10}
+        for i in range(5000)
+    ]
+    results['db.get_accuracy_stats[log fallback, rows=5000]'] = measure(
+        lambda: db._get_accuracy_stats_fallback(days=30, location='bench'),
+        max(3, iterations // 20),
+        warmup=1
+    )
+
+    client.tables['daily_accuracy_rollup'] = [
+        {'location': 'bench', 'stat_date': (today - timedelta(days=d)).isoformat(),
+         'total_predictions': 3, 'accurate_count': 2, 'error_sum': 15.0, 'squared_error_sum': 90.0,
+         'error_percentage_sum': 30.0, 'error_percentage_count': 3}
+        for d in range(30)
+    ]
+    results['db.get_accuracy_stats[rollup, days=30]'] = measure(
+        lambda: (db.read_cache.clear(), db.get_accuracy_stats(days=30, location='bench')),
+        iterations
+    )
+    results['db.fake_client_requests'] = {'total': client.requests}
+
+# ==========================================
+# Main
+# ==========================================
+
+def compare(results, baseline_path, threshold):
+    """เทียบกับผลเดิม คืน list ของ benchmark ที่ช้าลงเกิน threshold"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    print(f"\n📊 Compared with {baseline_path} ({COMPARE_METRIC}):")
+    for name, current in results.items():
+        before = baseline.get(name, {}).get(COMPARE_METRIC)
+        now = current.get(COMPARE_METRIC)
+        if before is None or now is None or before == 0:
+            continue
+        change = (now - before) / before
+        flag = '❌' if change > threshold else '✅'
+        print(f"   {flag} {name:<50} {before:>10.3f} → {now:>10.3f} ms ({change:+.1%})")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Benchmark prediction and persistence hot paths')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--batch-sizes', default='1,8,64,256')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='latency ที่จำลองต่อ request ของ fake Supabase')
+    parser.add_argument('--backend', default=os.getenv('INFERENCE_BACKEND', 'numpy'), choices=['numpy', 'keras'])
+    parser.add_argument('--precision', default=os.getenv('INFERENCE_PRECISION', 'float32'),
+                        choices=['float32', 'float16'], help='ความละเอียดที่ใช้คำนวณ (float16 เฉพาะ numpy)')
+    parser.add_argument('--only', default='inference,http,database',
+                        help='กลุ่มที่จะรัน คั่นด้วย comma (inference, http, database, precision)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='ไฟล์ JSON สำหรับบันทึกผล')
+    parser.add_argument('--compare', help='ไฟล์ JSON ผลเดิมสำหรับตรวจหา regression')
+    parser.add_argument('--threshold', type=float, default=0.2, help='สัดส่วนที่ช้าลงได้ก่อนถือว่า regression')
+    args = parser.parse_args()
+
+    # ตั้งค่าก่อน import server: ใช้ fake database, โหลด model ทันที, บันทึกแบบ sync ให้วัดได้คงที่
+    os.environ['INFERENCE_BACKEND'] = args.backend
+    os.environ['INFERENCE_PRECISION'] = args.precision
+    os.environ['MODEL_LOAD_MODE'] = 'eager'
+    os.environ.setdefault('PREDICTION_WRITE_MODE', 'sync')
+    import backend.database as database
+    from backend.database import SupabaseDB
+    database._db_instance = SupabaseDB(client=FakeSupabaseClient(latency=args.latency_ms / 1000))
+
+    rng = np.random.default_rng(args.seed)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',') if b]
+    groups = set(args.only.split(','))
+    results = {}
+
+    started = time.perf_counter()
+    if 'inference' in groups:
+        print("⏱️ Benchmarking inference...")
+        bench_inference(results, rng, args.iterations, batch_sizes)
+    if 'http' in groups:
+        print("⏱️ Benchmarking HTTP endpoints...")
+        bench_http(results, rng, args.iterations, batch_sizes)
+    if 'database' in groups:
+        print("⏱️ Benchmarking database layer...")
+        bench_database(results, rng, args.iterations, args.latency_ms / 1000)
+    if 'precision' in groups:
+        print("⏱️ Benchmarking float16 vs float32 inference...")
+        bench_precision(results, rng, args.iterations, batch_sizes)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'inference_backend': args.backend,
+            'inference_precision': args.precision,
+            'iterations': args.iterations,
+            'latency_ms': args.latency_ms,
+            'duration_seconds': round(time.perf_counter() - started, 2),
+            'peak_rss_mb': peak_rss_mb(),
+        },
+        'results': results,
+    }
+
+    print(f"\n{'benchmark':<52} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>12}")
+    for name, r in results.items():
+        if 'p50_ms' in r:
+            print(f"{name:<52} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f} {r['ops_per_sec']:>12.1f}")
+    print(f"\n💾 Peak RSS: {report['meta']['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions over {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+if __name__ == "__main__":
+    main()
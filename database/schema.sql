@@ -18,6 +18,7 @@ CREATE TABLE IF NOT EXISTS pm25_predictions (
     -- วันที่ข้อมูล
     prediction_date DATE NOT NULL,  -- วันที่ทำการพยากรณ์
     target_date DATE NOT NULL,      -- วันที่พยากรณ์ไว้ (พรุ่งนี้)
+    days_ahead INTEGER NOT NULL DEFAULT 1,  -- target_date - prediction_date (/forecast บันทึก 1..N)
     
     -- ค่า PM2.5
     predicted_value FLOAT NOT NULL,  -- ค่าที่พยากรณ์
@@ -44,6 +45,13 @@ CREATE INDEX idx_predictions_target_date ON pm25_predictions(target_date);
 CREATE INDEX idx_predictions_created_at ON pm25_predictions(created_at DESC);
 CREATE INDEX idx_predictions_location ON pm25_predictions(location);
 CREATE INDEX idx_predictions_pending_actual ON pm25_predictions(target_date) WHERE actual_value IS NULL;
+-- keyset pagination ของ /api/predictions (location, target_date, id)
+CREATE INDEX idx_predictions_location_target ON pm25_predictions(location, target_date DESC, id DESC);
+
+-- สำหรับ database ที่สร้างก่อนมีคอลัมน์ days_ahead
+ALTER TABLE pm25_predictions ADD COLUMN IF NOT EXISTS days_ahead INTEGER NOT NULL DEFAULT 1;
+UPDATE pm25_predictions SET days_ahead = target_date - prediction_date
+WHERE days_ahead <> target_date - prediction_date;
 
 -- ============================================
 -- Table 2: pm25_actual_readings
@@ -88,6 +96,7 @@ CREATE TABLE IF NOT EXISTS pm25_actual_readings (
 CREATE INDEX idx_actual_reading_date ON pm25_actual_readings(reading_date DESC);
 CREATE INDEX idx_actual_location ON pm25_actual_readings(location);
 CREATE INDEX idx_actual_created_at ON pm25_actual_readings(created_at DESC);
+CREATE INDEX idx_actual_location_date ON pm25_actual_readings(location, reading_date DESC, id DESC);
 
 -- ============================================
 -- Table 3: prediction_accuracy_log
@@ -121,6 +130,25 @@ CREATE INDEX idx_accuracy_prediction_id ON prediction_accuracy_log(prediction_id
 CREATE INDEX idx_accuracy_calculated_at ON prediction_accuracy_log(calculated_at DESC);
 CREATE INDEX idx_accuracy_is_accurate ON prediction_accuracy_log(is_accurate);
 
+-- ============================================
+-- Table 3b: daily_accuracy_rollup
+-- สรุปความแม่นยำรายวันต่อสถานที่ (1 แถวต่อวันต่อสถานที่)
+-- อัปเดตทีละแถวโดย calculate_prediction_accuracy ทำให้การดึงสถิติใช้เวลาตามจำนวนวัน ไม่ใช่จำนวนข้อมูลทั้งหมด
+-- เก็บเป็นผลรวมเพื่อให้บวกเพิ่มได้ MAE/RMSE/accuracy rate คำนวณจากผลรวม
+-- ============================================
+CREATE TABLE IF NOT EXISTS daily_accuracy_rollup (
+    location TEXT NOT NULL,
+    stat_date DATE NOT NULL,                        -- target_date ของการพยากรณ์
+    total_predictions INTEGER NOT NULL DEFAULT 0,
+    accurate_count INTEGER NOT NULL DEFAULT 0,
+    error_sum FLOAT NOT NULL DEFAULT 0,             -- Σ|predicted - actual|
+    squared_error_sum FLOAT NOT NULL DEFAULT 0,     -- Σ(predicted - actual)^2
+    error_percentage_sum FLOAT NOT NULL DEFAULT 0,
+    error_percentage_count INTEGER NOT NULL DEFAULT 0,  -- แถวที่ actual = 0 ไม่มี error_percentage
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (location, stat_date)
+);
+
 -- ============================================
 -- Table 4: model_versions
 -- เก็บข้อมูลเวอร์ชันของ Model
@@ -144,15 +172,27 @@ CREATE TABLE IF NOT EXISTS model_versions (
     training_data_size INTEGER,
     training_date DATE,
     
+    -- ไฟล์ของ model (NULL = ใช้ MODEL_PATH / SCALER_PATH ของ server)
+    model_path TEXT,
+    scaler_path TEXT,
+    
     -- Status
+    -- is_active: โหลดไว้ใน memory ของทุก worker (สลับเป็น production ได้ทันที)
+    -- is_production: model ที่ตอบ request, is_shadow: model ที่รันเทียบกับ production
     is_active BOOLEAN DEFAULT FALSE,
     is_production BOOLEAN DEFAULT FALSE,
+    is_shadow BOOLEAN DEFAULT FALSE,
     
     -- Metadata
     description TEXT,
     notes TEXT
 );
 
+-- สำหรับ database ที่สร้างก่อนมี model registry
+ALTER TABLE model_versions ADD COLUMN IF NOT EXISTS model_path TEXT;
+ALTER TABLE model_versions ADD COLUMN IF NOT EXISTS scaler_path TEXT;
+ALTER TABLE model_versions ADD COLUMN IF NOT EXISTS is_shadow BOOLEAN DEFAULT FALSE;
+
 CREATE INDEX idx_model_versions_active ON model_versions(is_active) WHERE is_active = TRUE;
 CREATE INDEX idx_model_versions_production ON model_versions(is_production) WHERE is_production = TRUE;
 
@@ -215,28 +255,34 @@ CREATE TRIGGER update_pm25_actual_readings_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
--- Function: คำนวณ AQI Level จาก PM2.5 value
+-- Table: ระดับ AQI ของ PM2.5 (ค่าเดียวกับ AQI_BANDS ใน backend/aqi.py)
+CREATE TABLE IF NOT EXISTS aqi_bands (
+    band SMALLINT PRIMARY KEY,      -- ลำดับจากน้อยไปมาก
+    upper_bound FLOAT,              -- ขอบบนแบบรวมค่าขอบ (NULL = ไม่มีขอบบน)
+    level TEXT NOT NULL,
+    color TEXT NOT NULL
+);
+
+INSERT INTO aqi_bands (band, upper_bound, level, color) VALUES
+    (0, 15.0, 'ดีมาก', '#28b4d8'),
+    (1, 25.0, 'ดี', '#2ecc71'),
+    (2, 37.5, 'ปานกลาง', '#f1c40f'),
+    (3, 75.0, 'เริ่มมีผลกระทบ', '#e67e22'),
+    (4, NULL, 'มีผลกระทบต่อสุขภาพ', '#e74c3c')
+ON CONFLICT (band) DO UPDATE SET
+    upper_bound = EXCLUDED.upper_bound,
+    level = EXCLUDED.level,
+    color = EXCLUDED.color;
+
+-- Function: คำนวณ AQI Level จาก PM2.5 value (อ่านจากตาราง aqi_bands)
 CREATE OR REPLACE FUNCTION calculate_aqi_level(pm25_value FLOAT)
 RETURNS TABLE(level TEXT, color TEXT) AS $$
-BEGIN
-    RETURN QUERY
-    SELECT 
-        CASE 
-            WHEN pm25_value <= 15.0 THEN 'ดีมาก'
-            WHEN pm25_value <= 25.0 THEN 'ดี'
-            WHEN pm25_value <= 37.5 THEN 'ปานกลาง'
-            WHEN pm25_value <= 75.0 THEN 'เริ่มมีผลกระทบ'
-            ELSE 'มีผลกระทบต่อสุขภาพ'
-        END,
-        CASE 
-            WHEN pm25_value <= 15.0 THEN '#28b4d8'
-            WHEN pm25_value <= 25.0 THEN '#2ecc71'
-            WHEN pm25_value <= 37.5 THEN '#f1c40f'
-            WHEN pm25_value <= 75.0 THEN '#e67e22'
-            ELSE '#e74c3c'
-        END;
-END;
-$$ LANGUAGE plpgsql;
+    SELECT b.level, b.color
+    FROM aqi_bands b
+    WHERE b.upper_bound IS NULL OR pm25_value <= b.upper_bound
+    ORDER BY b.band
+    LIMIT 1;
+$$ LANGUAGE sql STABLE;
 
 -- Function: คำนวณความแม่นยำเมื่อมีค่าจริง
 CREATE OR REPLACE FUNCTION calculate_prediction_accuracy()
@@ -246,8 +292,9 @@ DECLARE
     error_pct FLOAT;
     sq_error FLOAT;
 BEGIN
-    -- คำนวณเมื่อมีการอัปเดต actual_value
-    IF NEW.actual_value IS NOT NULL AND OLD.actual_value IS NULL THEN
+    -- คำนวณเมื่อมีการอัปเดต actual_value (เฉพาะการพยากรณ์ล่วงหน้า 1 วัน ซึ่งเป็นสิ่งที่ model วัดความแม่นยำ
+    -- ผลของ /forecast วันที่ 2..N อยู่ใน target_date เดียวกันแต่ไม่นับรวม)
+    IF NEW.actual_value IS NOT NULL AND OLD.actual_value IS NULL AND NEW.days_ahead = 1 THEN
         error_val := ABS(NEW.predicted_value - NEW.actual_value);
         error_pct := (error_val / NULLIF(NEW.actual_value, 0)) * 100;
         sq_error := POWER(NEW.predicted_value - NEW.actual_value, 2);
@@ -266,6 +313,35 @@ BEGIN
             sq_error,
             error_val < 10.0  -- ถือว่าแม่นยำถ้า error < 10
         );
+        
+        -- เพิ่มเข้า rollup รายวัน
+        INSERT INTO daily_accuracy_rollup AS r (
+            location,
+            stat_date,
+            total_predictions,
+            accurate_count,
+            error_sum,
+            squared_error_sum,
+            error_percentage_sum,
+            error_percentage_count
+        ) VALUES (
+            NEW.location,
+            NEW.target_date,
+            1,
+            CASE WHEN error_val < 10.0 THEN 1 ELSE 0 END,
+            error_val,
+            sq_error,
+            COALESCE(error_pct, 0),
+            CASE WHEN error_pct IS NULL THEN 0 ELSE 1 END
+        )
+        ON CONFLICT (location, stat_date) DO UPDATE SET
+            total_predictions = r.total_predictions + EXCLUDED.total_predictions,
+            accurate_count = r.accurate_count + EXCLUDED.accurate_count,
+            error_sum = r.error_sum + EXCLUDED.error_sum,
+            squared_error_sum = r.squared_error_sum + EXCLUDED.squared_error_sum,
+            error_percentage_sum = r.error_percentage_sum + EXCLUDED.error_percentage_sum,
+            error_percentage_count = r.error_percentage_count + EXCLUDED.error_percentage_count,
+            updated_at = NOW();
     END IF;
     
     RETURN NEW;
@@ -273,12 +349,89 @@ END;
 $$ LANGUAGE plpgsql;
 
 -- Trigger: คำนวณความแม่นยำอัตโนมัติ
+DROP TRIGGER IF EXISTS trigger_calculate_accuracy ON pm25_predictions;
 CREATE TRIGGER trigger_calculate_accuracy
     AFTER UPDATE ON pm25_predictions
     FOR EACH ROW
-    WHEN (NEW.actual_value IS NOT NULL AND OLD.actual_value IS NULL)
+    WHEN (NEW.actual_value IS NOT NULL AND OLD.actual_value IS NULL AND NEW.days_ahead = 1)
     EXECUTE FUNCTION calculate_prediction_accuracy();
 
+-- สร้าง rollup ใหม่จาก accuracy log (สำหรับ database ที่มีข้อมูลก่อนมีตาราง rollup หรือก่อนมี days_ahead)
+-- ใช้เงื่อนไขเดียวกับ trigger: เฉพาะการพยากรณ์ล่วงหน้า 1 วัน
+DELETE FROM daily_accuracy_rollup;
+INSERT INTO daily_accuracy_rollup (
+    location, stat_date, total_predictions, accurate_count, error_sum,
+    squared_error_sum, error_percentage_sum, error_percentage_count
+)
+SELECT
+    p.location,
+    p.target_date,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE a.is_accurate = TRUE),
+    SUM(a.error_value),
+    SUM(COALESCE(a.squared_error, POWER(a.error_value, 2))),
+    COALESCE(SUM(a.error_percentage), 0),
+    COUNT(a.error_percentage)
+FROM prediction_accuracy_log a
+JOIN pm25_predictions p ON p.id = a.prediction_id
+WHERE p.days_ahead = 1
+GROUP BY p.location, p.target_date;
+
+-- Function: สถิติความแม่นยำ (รวมจาก daily_accuracy_rollup ไม่เกิน days_back แถว)
+-- เรียกผ่าน RPC: client.rpc('get_accuracy_stats', {'days_back': 30, 'loc': 'Nakhon Phanom'})
+CREATE OR REPLACE FUNCTION get_accuracy_stats(days_back INTEGER DEFAULT 30, loc TEXT DEFAULT 'Nakhon Phanom')
+RETURNS TABLE (
+    total_predictions BIGINT,
+    avg_error FLOAT,
+    rmse FLOAT,
+    mape FLOAT,
+    accuracy_rate FLOAT
+) AS $$
+    SELECT
+        SUM(total_predictions)::BIGINT,
+        SUM(error_sum) / SUM(total_predictions),
+        SQRT(SUM(squared_error_sum) / SUM(total_predictions)),
+        SUM(error_percentage_sum) / NULLIF(SUM(error_percentage_count), 0),
+        SUM(accurate_count)::FLOAT / SUM(total_predictions) * 100
+    FROM daily_accuracy_rollup
+    WHERE location = loc
+      AND stat_date >= CURRENT_DATE - days_back
+    HAVING SUM(total_predictions) > 0;
+$$ LANGUAGE sql STABLE;
+
+-- Function: ตั้ง production model (UPDATE เดียว ทุก worker จึงไม่เห็นสถานะที่มี production 0 หรือ 2 ตัว)
+-- เรียกผ่าน RPC: client.rpc('set_production_model', {'p_version': 'v1.1'})
+CREATE OR REPLACE FUNCTION set_production_model(p_version TEXT)
+RETURNS BOOLEAN AS $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM model_versions WHERE version = p_version) THEN
+        RETURN FALSE;
+    END IF;
+    UPDATE model_versions
+    SET is_production = (version = p_version),
+        is_active = is_active OR version = p_version,
+        is_shadow = is_shadow AND version <> p_version
+    WHERE is_production OR version = p_version;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function: ตั้ง shadow model (p_version = NULL เพื่อยกเลิก shadow)
+CREATE OR REPLACE FUNCTION set_shadow_model(p_version TEXT)
+RETURNS BOOLEAN AS $$
+BEGIN
+    IF p_version IS NOT NULL
+       AND NOT EXISTS (SELECT 1 FROM model_versions WHERE version = p_version) THEN
+        RETURN FALSE;
+    END IF;
+    UPDATE model_versions
+    SET is_shadow = (version = p_version) IS TRUE,
+        is_active = is_active OR (version = p_version) IS TRUE
+    WHERE is_shadow OR version = p_version;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
 -- ============================================
 -- Views สำหรับ Query ที่ใช้บ่อย
 -- ============================================
@@ -305,24 +458,23 @@ FROM pm25_predictions p
 LEFT JOIN prediction_accuracy_log a ON p.id = a.prediction_id
 ORDER BY p.target_date DESC;
 
--- View: สถิติความแม่นยำรายวัน
+-- View: สถิติความแม่นยำรายวัน (อ่านจาก daily_accuracy_rollup)
 CREATE OR REPLACE VIEW v_daily_accuracy_stats AS
 SELECT 
-    DATE(p.target_date) as date,
-    COUNT(*) as total_predictions,
-    COUNT(p.actual_value) as predictions_with_actual,
-    AVG(a.error_value) as avg_error,
-    AVG(a.error_percentage) as avg_error_percentage,
-    COUNT(*) FILTER (WHERE a.is_accurate = TRUE) as accurate_count,
+    stat_date as date,
+    SUM(total_predictions) as total_predictions,
+    SUM(total_predictions) as predictions_with_actual,
+    SUM(error_sum) / SUM(total_predictions) as avg_error,
+    SQRT(SUM(squared_error_sum) / SUM(total_predictions)) as rmse,
+    SUM(error_percentage_sum) / NULLIF(SUM(error_percentage_count), 0) as avg_error_percentage,
+    SUM(accurate_count) as accurate_count,
     ROUND(
-        (COUNT(*) FILTER (WHERE a.is_accurate = TRUE)::FLOAT / 
-         NULLIF(COUNT(p.actual_value), 0) * 100)::NUMERIC, 
+        (SUM(accurate_count)::FLOAT / 
+         NULLIF(SUM(total_predictions), 0) * 100)::NUMERIC, 
         2
     ) as accuracy_rate
-FROM pm25_predictions p
-LEFT JOIN prediction_accuracy_log a ON p.id = a.prediction_id
-WHERE p.actual_value IS NOT NULL
-GROUP BY DATE(p.target_date)
+FROM daily_accuracy_rollup
+GROUP BY stat_date
 ORDER BY date DESC;
 
 -- View: ข้อมูลล่าสุด 7 วัน
@@ -363,12 +515,16 @@ ON CONFLICT (version) DO NOTHING;
 ALTER TABLE pm25_predictions ENABLE ROW LEVEL SECURITY;
 ALTER TABLE pm25_actual_readings ENABLE ROW LEVEL SECURITY;
 ALTER TABLE prediction_accuracy_log ENABLE ROW LEVEL SECURITY;
+ALTER TABLE daily_accuracy_rollup ENABLE ROW LEVEL SECURITY;
+ALTER TABLE aqi_bands ENABLE ROW LEVEL SECURITY;
 ALTER TABLE alert_logs ENABLE ROW LEVEL SECURITY;
 
 -- Policy: อนุญาตให้ทุกคนอ่านได้
 CREATE POLICY "Allow public read access" ON pm25_predictions FOR SELECT USING (true);
 CREATE POLICY "Allow public read access" ON pm25_actual_readings FOR SELECT USING (true);
 CREATE POLICY "Allow public read access" ON prediction_accuracy_log FOR SELECT USING (true);
+CREATE POLICY "Allow public read access" ON daily_accuracy_rollup FOR SELECT USING (true);
+CREATE POLICY "Allow public read access" ON aqi_bands FOR SELECT USING (true);
 
 -- Policy: เฉพาะ authenticated users เท่านั้นที่เขียนได้
 CREATE POLICY "Allow authenticated insert" ON pm25_predictions FOR INSERT WITH CHECK (auth.role() = 'authenticated');
@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration (gunicorn โหลดไฟล์นี้อัตโนมัติจาก working directory)
+
+MODEL_LOAD_MODE=preload: import app และโหลด model ครั้งเดียวใน master ก่อน fork
+ทำให้ทุก worker ใช้ weights ชุดเดียวกันแบบ copy-on-write
+(master ไม่อ่าน database งานที่ต้องใช้ database ทำใน worker หลัง fork)
+"""
+
+import gc
+import os
+import sys
+
+preload_app = os.getenv('MODEL_LOAD_MODE', 'eager').lower() == 'preload'
+
+
+def pre_fork(server, worker):
+    # ย้าย object ที่โหลดแล้วไป permanent generation เพื่อไม่ให้ GC
+    # ของ worker เขียนทับ memory page ที่แชร์กับ master
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # อ่าน model_versions / ค่าจริงล่าสุดด้วย connection ของ worker เองก่อนรับ request แรก
+    app_module = sys.modules.get('backend.server')
+    if preload_app and app_module is not None:
+        app_module.init_worker()
@@ -0,0 +1,259 @@
+"""
+Backfill Script - นำเข้าข้อมูล PM2.5 ย้อนหลังจากไฟล์ CSV
+อ่านไฟล์ทีละ chunk (ไม่โหลดทั้งไฟล์เข้า memory), upsert ลง pm25_actual_readings
+และบันทึก checkpoint หลังทุก chunk เพื่อรันต่อจากจุดเดิมได้เมื่อถูกขัดจังหวะ
+
+ตัวอย่าง:
+    python scripts/backfill_history.py nakhon-phanom-air-quality.csv --location "Nakhon Phanom"
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+# เพิ่ม path เพื่อ import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.aqi import classify_pm25_array
+from backend.database import get_db
+from backend.logging_setup import configure_logging
+
+# โหลด environment variables
+load_dotenv()
+
+def parse_dates(values):
+    """
+    แปลงวันที่ทั้ง chunk เป็น ISO format ด้วย NumPy
+    รองรับ YYYY-MM-DD, YYYY/M/D (ไฟล์ export ของ WAQI), DD/MM/YYYY และ YYYY-MM-DDTHH:MM:SS
+
+    Returns:
+        (numpy array ของ ISO string, mask ของแถวที่อ่านได้)
+    """
+    text = np.char.strip(np.asarray(values, dtype=str))
+    text = np.char.partition(text, 'T')[:, 0]  # ตัดเวลาของ %Y-%m-%dT%H:%M:%S
+    slash = np.char.find(text, '/') >= 0
+    first, _, rest = np.moveaxis(np.char.partition(np.char.replace(text, '/', '-'), '-'), -1, 0)
+    month, _, last = np.moveaxis(np.char.partition(rest, '-'), -1, 0)
+
+    # %d/%m/%Y: ปีอยู่ท้าย (เฉพาะแบบคั่นด้วย /)
+    day_first = slash & (np.char.str_len(last) == 4)
+    parts = (np.where(day_first, last, first), month, np.where(day_first, first, last))
+
+    valid = np.char.str_len(parts[0]) == 4
+    for part in parts:
+        valid &= np.char.isdecimal(part) & (np.char.str_len(part) <= 4)
+    year, month, day = (np.where(valid, part, '1').astype(np.int64) for part in parts)
+    valid &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)
+
+    month_start = ((np.where(valid, year, 1970) - 1970) * 12 + np.where(valid, month, 1) - 1).astype('datetime64[M]')
+    days_in_month = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    valid &= day <= days_in_month
+
+    dates = month_start.astype('datetime64[D]') + np.where(valid, day - 1, 0)
+    return np.datetime_as_string(dates), valid
+
+def parse_values(values):
+    """
+    แปลงค่า PM2.5 ทั้ง chunk เป็น float ด้วย NumPy (ค่าที่ไม่ใช่ตัวเลขทศนิยมปกติจะเป็น NaN)
+
+    Returns:
+        numpy array ของค่า PM2.5
+    """
+    text = np.char.strip(np.asarray(values, dtype=str))
+    numeric = np.char.isdecimal(np.char.replace(text, '.', '', count=1))
+    parsed = np.full(len(text), np.nan)
+    parsed[numeric] = text[numeric].astype(np.float64)
+    return parsed
+
+def normalize_chunk(records, date_column, value_column, location, data_source):
+    """
+    แปลงแถวจาก CSV เป็น arguments ของ db.save_actual_reading (แปลงทั้ง chunk ด้วย NumPy)
+
+    แถวที่วันที่อ่านไม่ได้หรือค่า PM2.5 ไม่ถูกต้องจะถูกข้าม และถ้าวันที่ซ้ำกันจะใช้แถวสุดท้าย
+
+    Returns:
+        (list ของ readings, จำนวนแถวที่ข้าม)
+    """
+    if not records:
+        return [], 0
+
+    dates, valid_dates = parse_dates([r.get(date_column) or '' for r in records])
+    values = parse_values([r.get(value_column) or '' for r in records])
+
+    valid = valid_dates & np.isfinite(values) & (values >= 0)
+    levels, colors = classify_pm25_array(np.where(valid, values, 0.0))
+
+    readings = {}
+    for i in np.flatnonzero(valid):
+        readings[dates[i]] = dict(
+            reading_date=dates[i],
+            pm25_value=float(values[i]),
+            aqi_level=str(levels[i]),
+            aqi_color=str(colors[i]),
+            location=location,
+            data_source=data_source,
+            reading_time=f"{dates[i]}T00:00:00"
+        )
+
+    return list(readings.values()), int(len(records) - valid.sum())
+
+def load_checkpoint(path, csv_path):
+    """อ่าน checkpoint ของไฟล์นี้ (None ถ้าไม่มีหรือเป็นของไฟล์อื่น)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('file') != os.path.abspath(csv_path):
+        print(f"⚠️ Checkpoint {path} belongs to {checkpoint.get('file')}, ignoring")
+        return None
+    return checkpoint
+
+def save_checkpoint(path, checkpoint):
+    """บันทึก checkpoint แบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename)"""
+    checkpoint['updated_at'] = datetime.now().isoformat()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_record(f):
+    """
+    อ่าน 1 record ของ CSV (อาจยาวหลายบรรทัดถ้ามี field ในเครื่องหมายคำพูดที่มีขึ้นบรรทัดใหม่)
+    อ่านต่อจนจำนวน " เป็นเลขคู่ จึงจบที่ขอบ record เสมอและใช้ tell() เป็น checkpoint ได้
+
+    Returns:
+        ข้อความของ record ('' เมื่อจบไฟล์)
+    """
+    record = f.readline()
+    while record.count('"') % 2:
+        line = f.readline()
+        if not line:
+            raise ValueError(f"Unterminated quoted field at end of file: {record[:80]!r}")
+        record += line
+    return record
+
+def read_chunks(f, header, chunk_size):
+    """อ่านไฟล์ CSV ทีละ chunk คืน (records, byte offset หลัง chunk)"""
+    while True:
+        lines = []
+        while len(lines) < chunk_size:
+            line = read_record(f)
+            if not line:
+                break
+            if line.strip():
+                lines.append(line)
+        if not lines:
+            return
+        records = [dict(zip(header, (v.strip() for v in row))) for row in csv.reader(lines)]
+        yield records, f.tell()
+
+def backfill(db, csv_path, location, checkpoint_path, chunk_size=1000,
+             date_column='date', value_column='pm25', data_source='CSV Backfill'):
+    """
+    นำเข้าข้อมูลจากไฟล์ CSV ลง pm25_actual_readings (รันต่อจาก checkpoint ถ้ามี)
+
+    Returns:
+        Dict สรุปจำนวนแถวที่อ่าน/บันทึก/ข้าม
+    """
+    checkpoint = load_checkpoint(checkpoint_path, csv_path) or {
+        'file': os.path.abspath(csv_path),
+        'location': location,
+        'offset': 0,
+        'rows_read': 0,
+        'rows_written': 0,
+        'rows_skipped': 0,
+        'completed': False
+    }
+    if checkpoint.get('completed'):
+        print(f"✅ {csv_path} already imported ({checkpoint['rows_written']} rows)")
+        return checkpoint
+
+    # newline='' ตามที่ csv module แนะนำ; เปิดแบบ text แต่อ่านด้วย readline() (read_record) เพื่อให้ใช้ tell() ได้
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        header = [h.strip().lower() for h in next(csv.reader([read_record(f)]))]
+        for column in (date_column, value_column):
+            if column not in header:
+                raise ValueError(f"Column '{column}' not found in {csv_path} (columns: {header})")
+
+        if checkpoint['offset']:
+            f.seek(checkpoint['offset'])
+            print(f"⏩ Resuming from row {checkpoint['rows_read']} (byte {checkpoint['offset']})")
+
+        start = time.perf_counter()
+        for records, offset in read_chunks(f, header, chunk_size):
+            readings, skipped = normalize_chunk(records, date_column, value_column, location, data_source)
+
+            if readings:
+                summary = db.save_actual_readings_bulk(readings, batch_size=chunk_size)
+                if summary['failed']:
+                    # ไม่เลื่อน checkpoint เพื่อให้รันใหม่แล้วเริ่มจาก chunk นี้
+                    raise RuntimeError(f"Failed to write {summary['failed']} rows; checkpoint kept at row {checkpoint['rows_read']}")
+
+            checkpoint['offset'] = offset
+            checkpoint['rows_read'] += len(records)
+            checkpoint['rows_written'] += len(readings)
+            checkpoint['rows_skipped'] += skipped
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            rate = checkpoint['rows_read'] / max(time.perf_counter() - start, 1e-9)
+            print(f"📥 {checkpoint['rows_read']} rows read, {checkpoint['rows_written']} written, "
+                  f"{checkpoint['rows_skipped']} skipped ({rate:.0f} rows/s)")
+
+    checkpoint['completed'] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Backfill historical PM2.5 readings from a CSV file')
+    parser.add_argument('csv_path', help='ไฟล์ CSV (เช่นไฟล์ export จาก WAQI)')
+    parser.add_argument('--location', default=os.getenv('LOCATION', 'Nakhon Phanom'))
+    parser.add_argument('--date-column', default='date')
+    parser.add_argument('--value-column', default='pm25')
+    parser.add_argument('--chunk-size', type=int, default=int(os.getenv('DB_BULK_BATCH_SIZE', '500')))
+    parser.add_argument('--checkpoint', help='ไฟล์ checkpoint (ค่าเริ่มต้น <csv_path>.checkpoint.json)')
+    parser.add_argument('--restart', action='store_true', help='เริ่มใหม่ตั้งแต่ต้นไฟล์ (ไม่ใช้ checkpoint เดิม)')
+    args = parser.parse_args()
+    configure_logging()
+
+    checkpoint_path = args.checkpoint or f"{args.csv_path}.checkpoint.json"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    print("\n" + "=" * 70)
+    print("📚 BACKFILL HISTORY - PM2.5 Forecasting System")
+    print(f"📄 File: {args.csv_path}")
+    print(f"📍 Location: {args.location}")
+    print("=" * 70 + "\n")
+
+    db = get_db()
+    try:
+        result = backfill(
+            db,
+            args.csv_path,
+            args.location,
+            checkpoint_path,
+            chunk_size=args.chunk_size,
+            date_column=args.date_column.lower(),
+            value_column=args.value_column.lower()
+        )
+    except Exception as e:
+        print(f"\n❌ Backfill stopped: {e}")
+        print(f"   Run the same command again to resume from {checkpoint_path}")
+        sys.exit(1)
+
+    print("\n" + "=" * 70)
+    print(f"✅ Backfill completed: {result['rows_written']} readings written, {result['rows_skipped']} rows skipped")
+    print("=" * 70 + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,20 @@ Daily Update Script - รันอัตโนมัติทุกวัน
 
 import os
 import sys
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 
 # เพิ่ม path เพื่อ import backend modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from backend.aqi import classify_pm25
 from backend.database import get_db
+from backend.http_client import get_http_client
+from backend.logging_setup import configure_logging
+from backend import inference
 
 # โหลด environment variables
 load_dotenv()
@@ -22,120 +28,174 @@ WAQI_API_TOKEN = os.getenv('WAQI_API_TOKEN', '6e19dc4d73747ab27c397b590fdbd504f1
 LOCATION = os.getenv('LOCATION', 'Nakhon Phanom')
 WAQI_STATION_ID = '@9696'  # Nakhon Phanom station ID
 
-def fetch_waqi_data():
+# รายการสถานี: "station_id=สถานที่" คั่นด้วย comma เช่น "@9696=Nakhon Phanom,@5775=Chiang Mai"
+WAQI_STATIONS = os.getenv('WAQI_STATIONS', f'{WAQI_STATION_ID}={LOCATION}')
+
+# จำนวน thread สูงสุดที่ดึงข้อมูลพร้อมกัน
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', '8'))
+
+# วิธีพยากรณ์: local = รัน model ใน process นี้แล้วบันทึกลง database เอง,
+# http = เรียก /predict/batch ของ API_URL, auto = local ถ้าไม่สำเร็จค่อยใช้ http
+PREDICTION_MODE = os.getenv('PREDICTION_MODE', 'local').lower()
+
+# inference backend ของ script (numpy ไม่ต้องติดตั้ง TensorFlow)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'numpy').lower()
+INFERENCE_PRECISION = os.getenv('INFERENCE_PRECISION', 'float32').lower()
+
+# เวลาที่ใช้ในแต่ละขั้นตอน (วินาที)
+phase_timings = {}
+
+@contextmanager
+def timed_phase(name):
+    """จับเวลาของ 1 ขั้นตอน แล้วเก็บไว้ใน phase_timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase_timings[name] = time.perf_counter() - start
+        print(f"⏱️ {name}: {phase_timings[name]:.2f}s")
+
+def parse_stations(spec):
+    """
+    แปลงค่า WAQI_STATIONS เป็น list ของ (station_id, location)
+    
+    ถ้าไม่ระบุสถานที่ (เช่น "@9696") จะใช้ LOCATION
+    
+    Raises:
+        ValueError: ถ้ามีหลายสถานีใช้สถานที่เดียวกัน (ผลลัพธ์ถูกเก็บตาม location จึงจะทับกันเอง)
+    """
+    stations = []
+    seen = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        station_id, _, location = item.partition('=')
+        station_id, location = station_id.strip(), location.strip() or LOCATION
+        if location in seen:
+            raise ValueError(
+                f"WAQI_STATIONS: location '{location}' is used by both "
+                f"{seen[location]} and {station_id}"
+            )
+        seen[location] = station_id
+        stations.append((station_id, location))
+    return stations
+
+def run_concurrently(func, items):
+    """เรียก func กับทุก item พร้อมกันด้วย thread pool (คืนผลตามลำดับเดิม)"""
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, len(items)))) as executor:
+        return list(executor.map(func, items))
+
+def fetch_waqi_data(station_id=WAQI_STATION_ID):
     """ดึงข้อมูล PM2.5 จาก WAQI API"""
     try:
-        url = f'https://api.waqi.info/feed/{WAQI_STATION_ID}/?token={WAQI_API_TOKEN}'
+        url = f'https://api.waqi.info/feed/{station_id}/?token={WAQI_API_TOKEN}'
         
-        print(f"🌐 Fetching data from WAQI API...")
-        print(f"   URL: {url}")
+        print(f"🌐 Fetching data from WAQI API ({station_id})...")
         
-        response = requests.get(url, timeout=10)
+        # timeout ตาม HTTP_HOST_TIMEOUTS และลองซ้ำเมื่อ error ชั่วคราว
+        response = get_http_client().get(url)
         response.raise_for_status()
         
         data = response.json()
         
         if data.get('status') != 'ok':
-            print(f"❌ WAQI API error: {data.get('data', 'Unknown error')}")
+            print(f"❌ WAQI API error ({station_id}): {data.get('data', 'Unknown error')}")
             return None
         
         return data.get('data')
         
     except Exception as e:
-        print(f"❌ Error fetching WAQI data: {e}")
+        print(f"❌ Error fetching WAQI data ({station_id}): {e}")
         return None
 
-def calculate_aqi_level(pm25_value):
-    """คำนวณระดับ AQI"""
-    if pm25_value <= 15.0:
-        return ('ดีมาก', '#28b4d8')
-    elif pm25_value <= 25.0:
-        return ('ดี', '#2ecc71')
-    elif pm25_value <= 37.5:
-        return ('ปานกลาง', '#f1c40f')
-    elif pm25_value <= 75.0:
-        return ('เริ่มมีผลกระทบ', '#e67e22')
-    else:
-        return ('มีผลกระทบต่อสุขภาพ', '#e74c3c')
+def fetch_all_stations(stations):
+    """
+    ดึงข้อมูลทุกสถานีพร้อมกัน
+    
+    Returns:
+        Dict ของ location → ข้อมูลจาก WAQI (เฉพาะสถานีที่ดึงสำเร็จ)
+    """
+    results = run_concurrently(lambda station: fetch_waqi_data(station[0]), stations)
+    return {
+        location: data
+        for (station_id, location), data in zip(stations, results)
+        if data
+    }
 
-def save_actual_reading(db, waqi_data):
-    """บันทึกค่า PM2.5 จริงลง Supabase"""
-    try:
-        # ดึงค่า PM2.5
-        pm25_value = waqi_data.get('iaqi', {}).get('pm25', {}).get('v')
-        
-        if pm25_value is None:
-            print("❌ No PM2.5 data available")
-            return False
-        
-        # ดึงข้อมูลเพิ่มเติม
-        iaqi = waqi_data.get('iaqi', {})
-        temperature = iaqi.get('t', {}).get('v')
-        humidity = iaqi.get('h', {}).get('v')
-        wind_speed = iaqi.get('w', {}).get('v')
-        
-        # คำนวณ AQI level
-        aqi_level, aqi_color = calculate_aqi_level(pm25_value)
-        
-        today = date.today()
-        
-        print(f"\n📝 Saving actual reading:")
-        print(f"   Date: {today}")
-        print(f"   PM2.5: {pm25_value} µg/m³")
-        print(f"   AQI Level: {aqi_level}")
-        print(f"   Temperature: {temperature}°C")
-        print(f"   Humidity: {humidity}%")
-        
-        # บันทึกลง database
-        result = db.save_actual_reading(
-            reading_date=today,
-            pm25_value=pm25_value,
-            aqi_level=aqi_level,
-            aqi_color=aqi_color,
-            temperature=temperature,
-            humidity=humidity,
-            wind_speed=wind_speed,
-            location=LOCATION,
-            data_source='WAQI API',
-            raw_data=waqi_data
-        )
-        
-        if result:
-            print(f"✅ Actual reading saved successfully!")
-            
-            # อัปเดตค่าจริงในตาราง predictions (ถ้ามีการพยากรณ์ไว้)
-            db.update_actual_value(
-                target_date=today,
-                actual_value=pm25_value,
-                location=LOCATION
-            )
-            print(f"✅ Updated actual value in predictions table")
-            
-            return True
-        else:
-            print(f"❌ Failed to save actual reading")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Error saving actual reading: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+def reading_from_waqi(waqi_data, location, station_id=None):
+    """แปลงข้อมูลจาก WAQI เป็น arguments ของ db.save_actual_reading (None ถ้าไม่มีค่า PM2.5)"""
+    iaqi = waqi_data.get('iaqi', {})
+    pm25_value = iaqi.get('pm25', {}).get('v')
+    if pm25_value is None:
+        return None
+    
+    aqi_level, aqi_color = classify_pm25(pm25_value)
+    reading = dict(
+        reading_date=date.today(),
+        pm25_value=pm25_value,
+        aqi_level=aqi_level,
+        aqi_color=aqi_color,
+        temperature=iaqi.get('t', {}).get('v'),
+        humidity=iaqi.get('h', {}).get('v'),
+        wind_speed=iaqi.get('w', {}).get('v'),
+        location=location,
+        data_source='WAQI API',
+        raw_data=waqi_data,
+        station_id=station_id
+    )
+    return reading
 
-def get_recent_pm25_values(db):
+def save_actual_readings(db, readings):
+    """
+    บันทึกค่า PM2.5 จริงของทุกสถานีด้วย bulk upsert ครั้งเดียว
+    แล้วอัปเดตค่าจริงในตาราง predictions ของแต่ละสถานี
+    
+    Returns:
+        จำนวนสถานีที่บันทึกสำเร็จ
+    """
+    if not readings:
+        return 0
+    
+    summary = db.save_actual_readings_bulk(readings)
+    if summary['failed']:
+        print(f"❌ Failed to save {summary['failed']}/{summary['total']} readings")
+    if not summary['succeeded']:
+        return 0
+    
+    for reading in readings:
+        print(f"   {reading['location']}: {reading['pm25_value']} µg/m³ ({reading['aqi_level']})")
+    
+    # อัปเดตค่าจริงในตาราง predictions (ถ้ามีการพยากรณ์ไว้)
+    run_concurrently(
+        lambda reading: db.update_actual_value(
+            target_date=reading['reading_date'],
+            actual_value=reading['pm25_value'],
+            location=reading['location']
+        ),
+        readings
+    )
+    print(f"✅ Updated actual values in predictions table")
+    
+    return summary['succeeded']
+
+def get_recent_pm25_values(db, location=LOCATION):
     """ดึงค่า PM2.5 ล่าสุด 3 วัน สำหรับพยากรณ์"""
     try:
-        readings = db.get_actual_readings(limit=3, location=LOCATION)
+        readings = db.get_actual_readings(limit=3, location=location)
         
         if len(readings) < 3:
-            print(f"⚠️ Not enough data for prediction (need 3 days, have {len(readings)})")
+            print(f"⚠️ Not enough data for prediction in {location} (need 3 days, have {len(readings)})")
             return None
         
         # เรียงจากเก่าไปใหม่
         readings = sorted(readings, key=lambda x: x['reading_date'])
         
         values = [r['pm25_value'] for r in readings]
-        print(f"\n📊 Recent 3 days PM2.5 values:")
+        print(f"\n📊 Recent 3 days PM2.5 values ({location}):")
         for i, r in enumerate(readings, 1):
             print(f"   Day {i} ({r['reading_date']}): {r['pm25_value']} µg/m³")
         
@@ -145,131 +205,209 @@ def get_recent_pm25_values(db):
         print(f"❌ Error getting recent values: {e}")
         return None
 
-def make_prediction(db, input_values):
-    """ทำการพยากรณ์ PM2.5 วันพรุ่งนี้"""
+def make_predictions_local(db, windows, locations):
+    """
+    พยากรณ์ PM2.5 วันพรุ่งนี้ของทุกสถานีด้วย model ใน process นี้ (forward pass เดียว)
+    แล้วบันทึกลง database ด้วย bulk write
+    
+    Returns:
+        list ของค่าที่พยากรณ์ (ตามลำดับ windows)
+    
+    Raises:
+        Exception เมื่อโหลด model หรือพยากรณ์ไม่สำเร็จ
+    """
+    print(f"\n🔮 Making predictions for {len(windows)} stations (local, {INFERENCE_BACKEND})...")
+    
+    model = inference.load_model(inference.MODEL_PATH, INFERENCE_BACKEND, INFERENCE_PRECISION)
+    scaler = inference.load_scaler(inference.SCALER_PATH)
+    predictions = inference.predict_windows(model, scaler, windows).tolist()
+    
+    print(f"✅ Prediction successful!")
+    for location, predicted_value in zip(locations, predictions):
+        print(f"   {location}: {predicted_value:.2f} µg/m³")
+    
+    summary = db.save_predictions_bulk(
+        inference.prediction_record(window, value, location)
+        for window, value, location in zip(windows, predictions, locations)
+    )
+    if summary['failed']:
+        print(f"❌ Failed to save {summary['failed']}/{summary['total']} predictions")
+    
+    return predictions
+
+def make_predictions(db, windows, locations):
+    """
+    พยากรณ์ PM2.5 วันพรุ่งนี้ของทุกสถานีตาม PREDICTION_MODE
+    
+    Returns:
+        list ของค่าที่พยากรณ์ (ตามลำดับ windows) หรือ None ถ้าไม่สำเร็จ
+    """
+    if PREDICTION_MODE == 'http':
+        return make_predictions_http(windows, locations)
+    
+    try:
+        return make_predictions_local(db, windows, locations)
+    except Exception as e:
+        print(f"❌ Local prediction failed: {e}")
+        if PREDICTION_MODE == 'auto':
+            print("↪️ Falling back to prediction API")
+            return make_predictions_http(windows, locations)
+        return None
+
+def make_predictions_http(windows, locations):
+    """
+    พยากรณ์ PM2.5 วันพรุ่งนี้ของทุกสถานีด้วยการเรียก /predict/batch ครั้งเดียว (API บันทึกลง database เอง)
+    
+    Returns:
+        list ของค่าที่พยากรณ์ (ตามลำดับ windows) หรือ None ถ้าไม่สำเร็จ
+    """
     try:
-        # เรียก prediction API
         api_url = os.getenv('API_URL', 'https://project-pm25-1.onrender.com')
         
-        print(f"\n🔮 Making prediction for tomorrow...")
-        print(f"   Input values: {input_values}")
+        print(f"\n🔮 Making predictions for {len(windows)} stations...")
         
-        response = requests.post(
-            f'{api_url}/predict',
-            json={'inputs': input_values},
-            timeout=30
+        response = get_http_client().post(
+            f'{api_url}/predict/batch',
+            json={'windows': windows, 'locations': locations}
         )
         
         if response.status_code == 200:
-            result = response.json()
-            predicted_value = result.get('prediction')
-            
+            predictions = response.json().get('predictions')
             print(f"✅ Prediction successful!")
-            print(f"   Predicted PM2.5 for tomorrow: {predicted_value:.2f} µg/m³")
-            
-            # บันทึกการพยากรณ์ (API จะบันทึกอัตโนมัติ)
-            return predicted_value
+            for location, predicted_value in zip(locations, predictions):
+                print(f"   {location}: {predicted_value:.2f} µg/m³")
+            return predictions
         else:
             print(f"❌ Prediction failed: {response.status_code}")
             print(f"   Response: {response.text}")
             return None
             
     except Exception as e:
-        print(f"❌ Error making prediction: {e}")
+        print(f"❌ Error making predictions: {e}")
         import traceback
         traceback.print_exc()
         return None
 
-def check_and_send_alert(db, pm25_value):
-    """ตรวจสอบและส่ง alert ถ้าค่า PM2.5 สูง"""
+def build_alert(pm25_value, location=LOCATION):
+    """สร้าง alert ถ้าค่า PM2.5 สูง (arguments ของ db.save_alert) คืน None ถ้าอยู่ในระดับปกติ"""
+    # เกณฑ์การแจ้งเตือน
+    if pm25_value > 75.0:
+        severity = 'critical'
+        title = '🚨 PM2.5 สูงมาก!'
+        message = f'ค่า PM2.5 = {pm25_value:.1f} µg/m³ อยู่ในระดับ "มีผลกระทบต่อสุขภาพ" กรุณาหลีกเลี่ยงกิจกรรมกลางแจ้ง'
+        threshold = 75.0
+    elif pm25_value > 37.5:
+        severity = 'warning'
+        title = '⚠️ PM2.5 สูงกว่าปกติ'
+        message = f'ค่า PM2.5 = {pm25_value:.1f} µg/m³ อยู่ในระดับ "เริ่มมีผลกระทบ" ควรระวังสุขภาพ'
+        threshold = 37.5
+    else:
+        return None
+    
+    return dict(
+        alert_type='high_pm25',
+        severity=severity,
+        title=title,
+        message=message,
+        pm25_value=pm25_value,
+        threshold_value=threshold,
+        location=location
+    )
+
+def send_alerts(db, readings):
+    """ตรวจสอบค่า PM2.5 ของทุกสถานี แล้วบันทึก alert ด้วย bulk insert ครั้งเดียว"""
     try:
-        # เกณฑ์การแจ้งเตือน
-        if pm25_value > 75.0:
-            severity = 'critical'
-            title = '🚨 PM2.5 สูงมาก!'
-            message = f'ค่า PM2.5 = {pm25_value:.1f} µg/m³ อยู่ในระดับ "มีผลกระทบต่อสุขภาพ" กรุณาหลีกเลี่ยงกิจกรรมกลางแจ้ง'
-            threshold = 75.0
-        elif pm25_value > 37.5:
-            severity = 'warning'
-            title = '⚠️ PM2.5 สูงกว่าปกติ'
-            message = f'ค่า PM2.5 = {pm25_value:.1f} µg/m³ อยู่ในระดับ "เริ่มมีผลกระทบ" ควรระวังสุขภาพ'
-            threshold = 37.5
-        else:
-            print(f"✅ PM2.5 level is normal ({pm25_value:.1f} µg/m³)")
-            return
-        
-        print(f"\n🔔 Sending alert:")
-        print(f"   Severity: {severity}")
-        print(f"   Title: {title}")
-        
-        # บันทึก alert log
-        db.save_alert(
-            alert_type='high_pm25',
-            severity=severity,
-            title=title,
-            message=message,
-            pm25_value=pm25_value,
-            threshold_value=threshold,
-            location=LOCATION
-        )
-        
-        print(f"✅ Alert saved to database")
+        alerts = []
+        for reading in readings:
+            alert = build_alert(reading['pm25_value'], reading['location'])
+            if alert is None:
+                print(f"✅ PM2.5 level is normal in {reading['location']} ({reading['pm25_value']:.1f} µg/m³)")
+            else:
+                print(f"🔔 {alert['severity']}: {reading['location']} - {alert['title']}")
+                alerts.append(alert)
+        
+        if alerts:
+            db.save_alerts_bulk(alerts)
+            print(f"✅ {len(alerts)} alerts saved to database")
         
         # TODO: ส่ง LINE Notify (เพิ่มในอนาคต)
-        # send_line_notify(message)
         
     except Exception as e:
-        print(f"❌ Error sending alert: {e}")
+        print(f"❌ Error sending alerts: {e}")
 
 def main():
     """Main function - รันทุกวัน"""
+    configure_logging()
     print("\n" + "=" * 70)
     print("🤖 DAILY UPDATE SCRIPT - PM2.5 Forecasting System")
     print(f"📅 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 70 + "\n")
     
+    job_start = time.perf_counter()
+    
     try:
+        stations = parse_stations(WAQI_STATIONS)
+        print(f"📍 Stations: {len(stations)}\n")
+        
         # 1. เชื่อมต่อ database
         print("Step 1: Connecting to database...")
-        db = get_db()
-        if not db.test_connection():
+        with timed_phase('connect'):
+            db = get_db()
+            connected = db.test_connection()
+        if not connected:
             print("❌ Database connection failed. Exiting.")
             return
         print("✅ Database connected\n")
         
-        # 2. ดึงข้อมูลจาก WAQI API
+        # 2. ดึงข้อมูลจาก WAQI API ทุกสถานีพร้อมกัน
         print("Step 2: Fetching data from WAQI API...")
-        waqi_data = fetch_waqi_data()
-        if not waqi_data:
+        with timed_phase('fetch'):
+            waqi_by_location = fetch_all_stations(stations)
+        if not waqi_by_location:
             print("❌ Failed to fetch WAQI data. Exiting.")
             return
-        print("✅ WAQI data fetched\n")
-        
-        # 3. บันทึกค่าจริง
-        print("Step 3: Saving actual reading to database...")
-        if not save_actual_reading(db, waqi_data):
-            print("❌ Failed to save actual reading. Exiting.")
+        print(f"✅ WAQI data fetched ({len(waqi_by_location)}/{len(stations)} stations)\n")
+        
+        # 3. บันทึกค่าจริงทุกสถานีด้วย bulk upsert
+        print("Step 3: Saving actual readings to database...")
+        with timed_phase('save'):
+            readings = []
+            for station_id, location in stations:
+                if location not in waqi_by_location:
+                    continue
+                reading = reading_from_waqi(waqi_by_location[location], location, station_id)
+                if reading is None:
+                    print(f"❌ No PM2.5 data available for {location}")
+                    continue
+                readings.append(reading)
+            saved = save_actual_readings(db, readings)
+        if not saved:
+            print("❌ Failed to save actual readings. Exiting.")
             return
         
-        pm25_value = waqi_data.get('iaqi', {}).get('pm25', {}).get('v')
-        
         # 4. ตรวจสอบและส่ง alert
         print("\nStep 4: Checking alert conditions...")
-        check_and_send_alert(db, pm25_value)
+        with timed_phase('alerts'):
+            send_alerts(db, readings)
         
-        # 5. ดึงข้อมูล 3 วันล่าสุดสำหรับพยากรณ์
+        # 5. ดึงข้อมูล 3 วันล่าสุดของทุกสถานีสำหรับพยากรณ์
         print("\nStep 5: Getting recent data for prediction...")
-        input_values = get_recent_pm25_values(db)
-        
-        if input_values:
-            # 6. ทำการพยากรณ์
-            print("\nStep 6: Making prediction for tomorrow...")
-            predicted_value = make_prediction(db, input_values)
+        with timed_phase('history'):
+            locations = [reading['location'] for reading in readings]
+            recent = run_concurrently(lambda location: get_recent_pm25_values(db, location), locations)
+            windows = [values for values in recent if values]
+            window_locations = [loc for loc, values in zip(locations, recent) if values]
+        
+        if windows:
+            # 6. พยากรณ์ทุกสถานีในการเรียกครั้งเดียว
+            print("\nStep 6: Making predictions for tomorrow...")
+            with timed_phase('predict'):
+                predictions = make_predictions(db, windows, window_locations)
             
-            if predicted_value:
+            for location, predicted_value in zip(window_locations, predictions or []):
                 # ตรวจสอบว่าการพยากรณ์สูงหรือไม่
                 if predicted_value > 37.5:
-                    print(f"\n⚠️ Tomorrow's prediction is high: {predicted_value:.2f} µg/m³")
+                    print(f"\n⚠️ Tomorrow's prediction is high in {location}: {predicted_value:.2f} µg/m³")
         else:
             print("\n⚠️ Skipping prediction (not enough historical data)")
         
@@ -281,6 +419,13 @@ def main():
         print(f"\n❌ Error in main function: {e}")
         import traceback
         traceback.print_exc()
+    
+    finally:
+        print("⏱️ Phase timings:")
+        for name, seconds in phase_timings.items():
+            print(f"   {name:<10} {seconds:.2f}s")
+        print(f"   {'total':<10} {time.perf_counter() - job_start:.2f}s")
+        print(f"🌐 HTTP: {get_http_client().stats()}")
 
 if __name__ == "__main__":
     main()
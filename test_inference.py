@@ -0,0 +1,156 @@
+"""
+Test script สำหรับเทียบผลพยากรณ์ของ NumPy inference กับ Keras
+"""
+
+import os
+import numpy as np
+import joblib
+
+from backend.lstm_numpy import NumpyLSTMModel
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+model_path = os.path.join(base_dir, 'lstm_pm25_model (2).h5')
+scaler_path = os.path.join(base_dir, 'scaler (2).pkl')
+
+# window ตัวอย่าง (ค่า PM2.5 3 วัน) ครอบคลุมตั้งแต่ค่าต่ำจนถึงค่าสูง
+SAMPLE_WINDOWS = np.array([
+    [22.4, 39.7, 25.0],
+    [5.0, 6.5, 4.0],
+    [15.0, 25.0, 37.5],
+    [80.2, 120.4, 95.1],
+    [178.9, 150.0, 160.3],
+])
+
+def _scaled_input(scaler, windows):
+    input_scaled = scaler.transform(windows.reshape(-1, 1))
+    return input_scaled.reshape(len(windows), 3, 1)
+
+def test_numpy_matches_keras():
+    """ทดสอบว่า NumPy LSTM ให้ผลเท่ากับ Keras"""
+    print("=" * 60)
+    print("🧪 Test: NumPy LSTM vs Keras parity")
+    print("=" * 60)
+
+    try:
+        from backend.inference import load_keras_model
+        keras_model = load_keras_model(model_path)
+    except ImportError as e:
+        print(f"⚠️ TensorFlow not installed, skipping parity test: {e}\n")
+        return
+
+    scaler = joblib.load(scaler_path)
+    numpy_model = NumpyLSTMModel.from_h5(model_path)
+
+    # สุ่ม window เพิ่มเพื่อทดสอบแบบ batch
+    rng = np.random.default_rng(42)
+    windows = np.vstack([SAMPLE_WINDOWS, rng.uniform(3.0, 180.0, size=(256, 3))])
+    X = _scaled_input(scaler, windows)
+
+    expected = scaler.inverse_transform(keras_model.predict(X, verbose=0))
+    actual = scaler.inverse_transform(numpy_model.predict(X))
+
+    max_diff = float(np.max(np.abs(expected - actual)))
+    print(f"📊 Compared {len(windows)} windows")
+    print(f"   Max absolute difference: {max_diff:.2e} µg/m³")
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-3)
+    print("✅ NumPy output matches Keras\n")
+
+def test_numpy_batch_matches_single():
+    """ทดสอบว่าผลแบบ batch เท่ากับการพยากรณ์ทีละ window"""
+    print("=" * 60)
+    print("🧪 Test: NumPy batch vs single window")
+    print("=" * 60)
+
+    scaler = joblib.load(scaler_path)
+    numpy_model = NumpyLSTMModel.from_h5(model_path)
+
+    X = _scaled_input(scaler, SAMPLE_WINDOWS)
+    batch = numpy_model.predict(X)
+    single = np.vstack([numpy_model.predict(X[i:i + 1]) for i in range(len(X))])
+
+    np.testing.assert_allclose(batch, single, rtol=1e-6)
+    print("✅ Batch output matches single-window output\n")
+
+# ความต่างสูงสุดของ float16 ที่ยอมรับได้เทียบกับ float32 (µg/m³)
+FLOAT16_TOLERANCE = 0.25
+
+def test_float16_matches_float32():
+    """
+    ทดสอบว่า float16 ให้ผลใกล้ float32 และไม่เปลี่ยนระดับ AQI ยกเว้นค่าที่ห่างจากขอบระดับไม่เกิน tolerance
+    (memory/latency ดู python benchmarks/run_benchmarks.py --only precision)
+    """
+    print("=" * 60)
+    print("🧪 Test: NumPy float16 vs float32")
+    print("=" * 60)
+
+    from backend import aqi
+
+    scaler = joblib.load(scaler_path)
+    float32_model = NumpyLSTMModel.from_h5(model_path)
+    float16_model = NumpyLSTMModel.from_h5(model_path, dtype='float16')
+
+    rng = np.random.default_rng(7)
+    windows = np.vstack([SAMPLE_WINDOWS, rng.uniform(3.0, 180.0, size=(512, 3))])
+    X = _scaled_input(scaler, windows)
+
+    expected = scaler.inverse_transform(float32_model.predict(X))[:, 0]
+    actual = scaler.inverse_transform(float16_model.predict(X))[:, 0]
+
+    max_diff = float(np.max(np.abs(actual - expected)))
+    print(f"📊 Compared {len(windows)} windows, max absolute difference: {max_diff:.4f} µg/m³")
+    assert max_diff <= FLOAT16_TOLERANCE, max_diff
+
+    changed = aqi.band_index(actual) != aqi.band_index(expected)
+    assert not changed[:len(SAMPLE_WINDOWS)].any(), "AQI band changed for a sample window"
+    distance_to_edge = np.min(np.abs(expected[changed, None] - aqi.AQI_BREAKPOINTS), axis=1)
+    assert (distance_to_edge <= FLOAT16_TOLERANCE).all(), expected[changed]
+    print(f"✅ float16 within {FLOAT16_TOLERANCE} µg/m³, {int(changed.sum())} AQI band changes (all at band edges)\n")
+
+def test_shadow_scorer_drops_when_full():
+    """ทดสอบว่า shadow ที่มีงานค้างเต็ม max_pending จะข้าม batch ใหม่ทันที (ไม่ค้าง)"""
+    print("=" * 60)
+    print("🧪 Test: Shadow scorer drops batches when full")
+    print("=" * 60)
+
+    import threading
+    from backend.model_registry import LoadedModel, ShadowScorer
+
+    release = threading.Event()
+
+    def slow_predict(entry, windows):
+        release.wait(5)
+        return windows[:, -1]
+
+    scorer = ShadowScorer(slow_predict, max_pending=1)
+    shadow = LoadedModel('v-shadow', None, None, '', '', 0.0)
+    windows = SAMPLE_WINDOWS.copy()
+
+    results = []
+    submitter = threading.Thread(target=lambda: results.extend(
+        scorer.submit(shadow, 'v1.0', windows, windows[:, -1]) for _ in range(3)
+    ), daemon=True)
+    submitter.start()
+    submitter.join(5)
+    assert not submitter.is_alive(), "submit() blocked while the shadow queue was full"
+    assert results == [True, False, False], results
+
+    release.set()
+    assert scorer.flush(5)
+    stats = scorer.stats()['versions']['v-shadow']
+    assert stats['batches'] == 1 and stats['dropped'] == 2, stats
+    print(f"✅ Accepted 1 batch, dropped {stats['dropped']} without blocking\n")
+
+def main():
+    """รัน test ทั้งหมด"""
+    test_numpy_matches_keras()
+    test_numpy_batch_matches_single()
+    test_float16_matches_float32()
+    test_shadow_scorer_drops_when_full()
+
+    print("=" * 60)
+    print("✅ All tests completed!")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()